@@ -1,17 +1,34 @@
 # backend/admin/routes.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from backend.database import SessionLocal
 from backend.auth.models import User
-from backend.chat.models import Conversation, Message
+from backend.chat.models import Conversation, Message, ArchivedConversation
+from backend.chat import crud as chat_crud
+from backend.chat.archive import archive_inactive_conversations, archive_stats, archived_messages, archiver_status
 
 from backend.auth.routes import get_current_user
-from backend.knowledge_base_processor import create_index_from_files
-from backend.qa_handler import reload_vector_db
-from backend.config import UPLOAD_FOLDER
+from backend.knowledge_base_processor import (
+    create_index_from_files, load_processed_files, load_tombstones, tombstone_source_file,
+)
+from backend.qa_handler import (
+    get_vector_db, reload_vector_db, answer_cache_stats, clear_answer_caches, loaded_collections,
+)
+from backend.index_compaction import compact_collection, compaction_status, maybe_compact_in_background
+from backend.upload_watcher import upload_watcher_status
+from backend import profiling
+from backend.config import PROFILE_SAMPLE_INTERVAL_MS, ARCHIVE_INACTIVE_DAYS
+from backend import etags
+from backend.kb_collections import (
+    DEFAULT_COLLECTION, InvalidCollectionName, validate_collection_name, collection_exists,
+    collection_upload_folder, ensure_collection, list_collections, index_disk_bytes,
+)
 
-from typing import List
+from typing import List, Optional
+import hashlib
 import shutil
 from pathlib import Path
 import os
@@ -37,6 +54,23 @@ def admin_required(
         raise HTTPException(status_code=403, detail="无管理员权限")
     return current_user
 
+# ==== 知识库集合参数 ====
+def require_collection(collection: str, must_exist: bool = True) -> str:
+    """校验集合名（400），must_exist 时集合不存在返回 404。问答接口也使用该函数。"""
+    try:
+        validate_collection_name(collection)
+    except InvalidCollectionName as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if must_exist and not collection_exists(collection):
+        raise HTTPException(status_code=404, detail=f"知识库集合 '{collection}' 不存在")
+    return collection
+
+def existing_collection(collection: str = Query(DEFAULT_COLLECTION, description="知识库集合名")) -> str:
+    return require_collection(collection)
+
+def new_or_existing_collection(collection: str = Query(DEFAULT_COLLECTION, description="知识库集合名，不存在时自动创建")) -> str:
+    return require_collection(collection, must_exist=False)
+
 # ==== 1. 获取所有用户列表 ====
 @router.get("/users", response_model=List[dict])
 def list_users(
@@ -77,7 +111,7 @@ def conversation_messages(
     db: Session = Depends(get_db),
     admin: User = Depends(admin_required)
 ):
-    messages = db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.created_at).all()
+    messages = chat_crud.get_messages_by_conversation_id(db, conversation_id)
     return [
         {
             "id": m.id,
@@ -87,6 +121,142 @@ def conversation_messages(
         } for m in messages
     ]
 
+# ==== 分页 / 排序辅助 ====
+def _paginate(query, sort_columns: dict, sort_by: str, order: str, page: int, page_size: int, tiebreaker):
+    """tiebreaker 为主键：排序字段相同（或为 NULL）的行按主键定序，翻页时不会重复或遗漏。"""
+    if sort_by not in sort_columns:
+        raise HTTPException(status_code=400, detail=f"不支持的排序字段: {sort_by}，可选: {', '.join(sort_columns)}")
+    orderings = [sort_columns[sort_by]]
+    if orderings[0] is not tiebreaker:
+        orderings.append(tiebreaker)
+    orderings = [column.desc() if order == "desc" else column.asc() for column in orderings]
+    return query.order_by(*orderings).offset((page - 1) * page_size).limit(page_size).all()
+
+# ==== 3.1 用户列表（分页 + 会话数 / 消息数 / 最后活跃时间） ====
+@router.get("/users/stats", summary="分页获取用户列表及聊天聚合统计（仅管理员）")
+def list_users_with_stats(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=200),
+    sort_by: str = Query("last_message_at"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    db: Session = Depends(get_db),
+    admin: User = Depends(admin_required)
+):
+    """
+    聚合统计通过一次 GROUP BY 子查询完成，避免前端逐个会话拉取消息（N+1）。
+    消息数 / 最后消息时间合并热表与冷存储（已归档消息总是早于热表中的消息）。
+    """
+    hot = (
+        db.query(
+            Message.conversation_id.label("conversation_id"),
+            func.count(Message.id).label("message_count"),
+            func.max(Message.created_at).label("last_message_at"),
+        )
+        .group_by(Message.conversation_id)
+        .subquery()
+    )
+    stats = (
+        db.query(
+            Conversation.user_id.label("user_id"),
+            func.count(Conversation.id).label("conversation_count"),
+            func.sum(
+                func.coalesce(hot.c.message_count, 0) + func.coalesce(ArchivedConversation.message_count, 0)
+            ).label("message_count"),
+            func.max(func.coalesce(hot.c.last_message_at, ArchivedConversation.last_message_at)).label("last_message_at"),
+        )
+        .outerjoin(hot, hot.c.conversation_id == Conversation.id)
+        .outerjoin(ArchivedConversation, ArchivedConversation.conversation_id == Conversation.id)
+        .group_by(Conversation.user_id)
+        .subquery()
+    )
+    conversation_count = func.coalesce(stats.c.conversation_count, 0)
+    message_count = func.coalesce(stats.c.message_count, 0)
+    query = (
+        db.query(User, conversation_count, message_count, stats.c.last_message_at)
+        .outerjoin(stats, stats.c.user_id == User.id)
+    )
+    sort_columns = {
+        "id": User.id,
+        "username": User.username,
+        "created_at": User.created_at,
+        "conversation_count": conversation_count,
+        "message_count": message_count,
+        "last_message_at": stats.c.last_message_at,
+    }
+    rows = _paginate(query, sort_columns, sort_by, order, page, page_size, tiebreaker=User.id)
+    total = db.query(func.count(User.id)).scalar()
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "items": [
+            {
+                "id": u.id,
+                "username": u.username,
+                "email": u.email,
+                "is_admin": u.is_admin,
+                "created_at": u.created_at,
+                "conversation_count": conv_count,
+                "message_count": msg_count,
+                "last_message_at": last_at,
+            } for u, conv_count, msg_count, last_at in rows
+        ],
+    }
+
+# ==== 3.2 指定用户的会话列表（分页 + 消息数 / 最后消息时间） ====
+@router.get("/users/{user_id}/conversations/stats", summary="分页获取用户会话及消息聚合统计（仅管理员）")
+def user_conversations_with_stats(
+    user_id: int,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=200),
+    sort_by: str = Query("last_message_at"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    db: Session = Depends(get_db),
+    admin: User = Depends(admin_required)
+):
+    stats = (
+        db.query(
+            Message.conversation_id.label("conversation_id"),
+            func.count(Message.id).label("message_count"),
+            func.max(Message.created_at).label("last_message_at"),
+        )
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .filter(Conversation.user_id == user_id)
+        .group_by(Message.conversation_id)
+        .subquery()
+    )
+    # 合并冷存储中已归档的消息数 / 最后消息时间
+    message_count = func.coalesce(stats.c.message_count, 0) + func.coalesce(ArchivedConversation.message_count, 0)
+    last_message_at = func.coalesce(stats.c.last_message_at, ArchivedConversation.last_message_at)
+    query = (
+        db.query(Conversation, message_count, last_message_at)
+        .outerjoin(stats, stats.c.conversation_id == Conversation.id)
+        .outerjoin(ArchivedConversation, ArchivedConversation.conversation_id == Conversation.id)
+        .filter(Conversation.user_id == user_id)
+    )
+    sort_columns = {
+        "id": Conversation.id,
+        "created_at": Conversation.created_at,
+        "message_count": message_count,
+        "last_message_at": last_message_at,
+    }
+    rows = _paginate(query, sort_columns, sort_by, order, page, page_size, tiebreaker=Conversation.id)
+    total = db.query(func.count(Conversation.id)).filter(Conversation.user_id == user_id).scalar()
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "items": [
+            {
+                "id": c.id,
+                "title": c.title,
+                "created_at": c.created_at,
+                "message_count": msg_count,
+                "last_message_at": last_at,
+            } for c, msg_count, last_at in rows
+        ],
+    }
+
 import re  # 新增导入
 
 def normalize_filename(filename: str) -> str:
@@ -118,18 +288,21 @@ def resolve_filename_conflict(base_dir: Path, filename: str) -> str:
 @router.post("/upload-documents/", summary="上传文件并更新知识库索引（仅管理员）")
 async def admin_upload_documents(
     files: List[UploadFile] = File(...),
+    collection: str = Depends(new_or_existing_collection),
     admin: User = Depends(admin_required)
 ):
     if not files:
         raise HTTPException(status_code=400, detail="未选择文件")
-    
+    ensure_collection(collection)
+    upload_folder = collection_upload_folder(collection)
+
     processed_files_info = []
     files_to_index = []
 
     for file in files:
         cleaned = normalize_filename(file.filename)
-        final_name = resolve_filename_conflict(Path(UPLOAD_FOLDER), cleaned)
-        file_path = Path(UPLOAD_FOLDER) / final_name
+        final_name = resolve_filename_conflict(Path(upload_folder), cleaned)
+        file_path = Path(upload_folder) / final_name
         try:
             with open(file_path, "wb+") as buffer:
                 shutil.copyfileobj(file.file, buffer)
@@ -140,16 +313,18 @@ async def admin_upload_documents(
         finally:
             file.file.close()
     
-    if not files_to_index:
+    if files_to_index:
+        etags.uploads_changed(collection)
+    else:
         raise HTTPException(status_code=400, detail="文件保存失败，无法建立索引。")
 
     # 上传后重新构建所有文件的索引（不是只针对新上传的文件，而是全部）
     all_files = [
-        f for f in os.listdir(UPLOAD_FOLDER)
-        if os.path.isfile(os.path.join(UPLOAD_FOLDER, f)) and f.lower().endswith((".pdf", ".txt"))
+        f for f in os.listdir(upload_folder)
+        if os.path.isfile(os.path.join(upload_folder, f)) and f.lower().endswith((".pdf", ".txt"))
     ]
-    if create_index_from_files(all_files):
-        reload_vector_db()
+    if create_index_from_files(all_files, collection):
+        reload_vector_db(collection)
         return {
             "message": f"{len(files_to_index)} 个文件已成功上传，索引已基于所有上传文件刷新。",
             "processed_files_details": processed_files_info,
@@ -160,16 +335,30 @@ async def admin_upload_documents(
 
 # ==== 5. 获取所有已上传文件列表 ====
 @router.get("/uploaded-files", summary="列出所有已上传的知识库文件", response_model=List[dict])
-def list_uploaded_files(admin: User = Depends(admin_required)):
-    file_list = []
-    for file in Path(UPLOAD_FOLDER).iterdir():
-        if file.is_file():
-            stat = file.stat()
-            file_list.append({
-                "filename": file.name,
-                "size": stat.st_size,
-                "modified_at": int(stat.st_mtime)
-            })
+def list_uploaded_files(
+    request: Request,
+    response: Response,
+    collection: str = Depends(existing_collection),
+    admin: User = Depends(admin_required)
+):
+    upload_folder = collection_upload_folder(collection)
+    # ETag = 本进程的上传 / 删除计数 + 各文件 (文件名, 大小, 修改时间) 的摘要：同步工具原地覆盖文件时目录 mtime
+    # 不变，只看目录 mtime 会一直返回 304 与过期的大小 / 修改时间。未变化时返回 304，不再序列化与传输文件列表
+    stats = []
+    for entry in os.scandir(upload_folder):
+        if entry.is_file():
+            stat = entry.stat()
+            stats.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    stats.sort()
+    fingerprint = hashlib.blake2b(repr(stats).encode("utf-8"), digest_size=8).hexdigest()
+    etag = etags.make_etag("u", collection, etags.versions.version(("uploads", collection)), fingerprint)
+    not_modified = etags.not_modified_or_tag(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    file_list = [
+        {"filename": name, "size": size, "modified_at": int(mtime_ns // 1_000_000_000)}
+        for name, size, mtime_ns in stats
+    ]
     file_list.sort(key=lambda x: x["modified_at"], reverse=True)
     return file_list
 
@@ -177,41 +366,47 @@ def list_uploaded_files(admin: User = Depends(admin_required)):
 @router.delete("/uploaded-files/{filename}", summary="删除已上传的知识库文件（仅管理员）")
 def delete_uploaded_file(
     filename: str,
+    collection: str = Depends(existing_collection),
     admin: User = Depends(admin_required)
 ):
-    file_path = Path(UPLOAD_FOLDER) / filename
+    upload_folder = collection_upload_folder(collection)
+    file_path = Path(upload_folder) / filename
     if not file_path.exists() or not file_path.is_file():
         raise HTTPException(status_code=404, detail="文件不存在")
     try:
         file_path.unlink()
-        # 删除后，重新构建索引
-        all_files = [f for f in os.listdir(UPLOAD_FOLDER) if os.path.isfile(os.path.join(UPLOAD_FOLDER, f))]
-        if all_files:
-            if not create_index_from_files(all_files):
-                raise HTTPException(status_code=500, detail="文件已删除，但索引重建失败")
-            reload_vector_db()
-        else:
-            # 若删除后文件夹已空，可以考虑清空向量库，暂不处理
-            reload_vector_db()
-        return {"message": f"文件 {filename} 已删除，索引已刷新。"}
+        etags.uploads_changed(collection)
+        # 删除后不重建索引：该文件的片段记为墓碑，检索时排除；已删除向量占比过高时在后台压缩索引
+        removed = tombstone_source_file(get_vector_db(collection), filename, collection)
+        reload_vector_db(collection)
+        compacting = maybe_compact_in_background(collection)
+        return {
+            "message": f"文件 {filename} 已删除，索引已刷新。",
+            "removed_chunks": removed,
+            "compaction_started": compacting,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"删除文件失败: {e}")
 
 # ==== 7. 热词统计（返回所有消息中的高频词） ====
 from collections import Counter
-import jieba  # 中文分词，若只考虑英文可直接 split
+from backend import segmenter  # 中文分词（jieba 延迟加载），若只考虑英文可直接 split
 
 @router.get("/hot-words", summary="聊天内容热词统计（高频词）", tags=["admin"])
 def get_hot_words(
     top_n: int = 30,
+    include_archived: bool = Query(False, description="同时统计已归档（不活跃会话）的消息，需逐个解压冷存储"),
     db: Session = Depends(get_db),
     admin: User = Depends(admin_required)
 ):
-    # 拉取所有聊天消息
+    # 拉取热表中的聊天消息（默认只统计近期活跃会话）
     messages = db.query(Message.content).all()
     all_text = " ".join([m[0] for m in messages if m and m[0]])
+    if include_archived:
+        for archive in db.query(ArchivedConversation).yield_per(100):
+            all_text += " " + " ".join(m.content for m in archived_messages(archive) if m.content)
     # 分词
-    words = list(jieba.cut(all_text))
+    words = segmenter.cut(all_text)
     # 停用词表
     stop_words = set(["的", "了", "是", "我", "你", "吗", "和", "有", "在", "我们", "他们", "它", "这", "那", "会", "吧", "请", "能", "为", "就", "不", "也", "但", "要", "与", "对", "到", "其", "等", "与", "及", "或", "一个", "如何", "是什么", "可以", "请问"])
     # 过滤
@@ -222,15 +417,19 @@ def get_hot_words(
 
 # ==== 8. 主动刷新全部索引 ====
 @router.post("/refresh-index", summary="刷新知识库索引（基于当前所有文件）", tags=["admin"])
-def refresh_index(admin: User = Depends(admin_required)):
+def refresh_index(
+    collection: str = Depends(existing_collection),
+    admin: User = Depends(admin_required)
+):
     """
-    主动刷新 FAISS 索引（不上传，仅重新读取 uploads 文件夹内容）。
+    主动刷新 FAISS 索引（不上传，仅重新读取集合上传目录的内容）。
     """
     try:
-        # 读取 uploads 文件夹中所有合法后缀的文件
+        upload_folder = collection_upload_folder(collection)
+        # 读取上传目录中所有合法后缀的文件
         all_files = [
-            f for f in os.listdir(UPLOAD_FOLDER)
-            if os.path.isfile(os.path.join(UPLOAD_FOLDER, f))
+            f for f in os.listdir(upload_folder)
+            if os.path.isfile(os.path.join(upload_folder, f))
             and f.lower().endswith((".txt", ".pdf"))
         ]
 
@@ -238,8 +437,8 @@ def refresh_index(admin: User = Depends(admin_required)):
             raise HTTPException(status_code=404, detail="知识库中没有可索引文件")
 
         # 重新构建索引并保存
-        if create_index_from_files(all_files):
-            reload_vector_db()
+        if create_index_from_files(all_files, collection):
+            reload_vector_db(collection)
             return {
                 "success": True,
                 "message": f"索引刷新成功，共处理 {len(all_files)} 个文件。",
@@ -249,3 +448,135 @@ def refresh_index(admin: User = Depends(admin_required)):
             raise HTTPException(status_code=500, detail="索引刷新失败，请检查后端日志")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"索引刷新出错：{str(e)}")
+
+# ==== 9. 语义答案缓存统计 / 清空 ====
+@router.get("/answer-cache", summary="语义答案缓存命中统计", tags=["admin"])
+def get_answer_cache_stats(admin: User = Depends(admin_required)):
+    return answer_cache_stats()
+
+@router.delete("/answer-cache", summary="清空语义答案缓存", tags=["admin"])
+def clear_answer_cache(admin: User = Depends(admin_required)):
+    clear_answer_caches()
+    return {"message": "语义答案缓存已清空。"}
+
+# ==== 10. 知识库集合列表与索引内存占用 ====
+@router.get("/collections", summary="列出知识库集合及索引 LRU 的内存占用", tags=["admin"])
+def get_collections(admin: User = Depends(admin_required)):
+    lru = loaded_collections()
+    loaded = {item["collection"] for item in lru["loaded"] if not item["empty"]}
+    return {
+        "collections": [
+            {
+                "name": name,
+                "files": len(load_processed_files(name)),
+                "index_mb": round(index_disk_bytes(name) / 2**20, 3),
+                "dead_vectors": len(load_tombstones(name)),
+                "loaded": name in loaded,
+            }
+            for name in list_collections()
+        ],
+        "memory": lru,
+    }
+
+# ==== 11. 索引压缩 ====
+@router.post("/compact-index", summary="压缩知识库索引，物理删除已删除文件的片段", tags=["admin"])
+def compact_index_endpoint(
+    collection: str = Depends(existing_collection),
+    admin: User = Depends(admin_required)
+):
+    report = compact_collection(collection)
+    if report is None:
+        raise HTTPException(status_code=409, detail="该集合的索引正在压缩中")
+    return report
+
+@router.get("/compact-index", summary="索引压缩状态（已删除向量占比、最近一次压缩报告）", tags=["admin"])
+def get_compaction_status(
+    collection: str = Depends(existing_collection),
+    admin: User = Depends(admin_required)
+):
+    return compaction_status(collection)
+
+# ==== 12. 上传目录监视状态 ====
+@router.get("/upload-watcher", summary="上传目录监视状态（最近一次应用到索引的增量）", tags=["admin"])
+def get_upload_watcher_status(admin: User = Depends(admin_required)):
+    return upload_watcher_status()
+
+
+# ==== 13. 在线采样剖析（折叠栈输出，可生成火焰图） ====
+@router.post("/profile", summary="开始采样剖析：接下来 N 个 /ask / send_message 请求，或一段时间窗口", tags=["admin"])
+def start_profile(
+    route: str = Query("any", description="ask / send_message / any（二者皆可）/ all（全部线程，仅时间窗口）"),
+    requests: Optional[int] = Query(None, ge=1, description="剖析接下来 N 个匹配的请求"),
+    seconds: Optional[float] = Query(None, gt=0, description="时间窗口（秒）；与 requests 同时指定时先到者结束"),
+    interval_ms: float = Query(PROFILE_SAMPLE_INTERVAL_MS, ge=0.5, le=1000),
+    wait: bool = Query(False, description="等待剖析结束并直接返回折叠栈文本"),
+    admin: User = Depends(admin_required),
+):
+    try:
+        session = profiling.start_profile(route, requests=requests, seconds=seconds, interval_ms=interval_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except profiling.ProfileBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if wait:
+        session.wait(session.seconds + 1)
+        return PlainTextResponse(session.collapsed())
+    return session.status()
+
+@router.get("/profile", summary="进行中或最近一次采样剖析的状态", tags=["admin"])
+def get_profile_status(admin: User = Depends(admin_required)):
+    session = profiling.last_profile()
+    if session is None:
+        raise HTTPException(status_code=404, detail="尚未进行过采样剖析")
+    return session.status()
+
+@router.get("/profile/collapsed", summary="最近一次采样剖析的折叠栈（flamegraph.pl / speedscope 格式）", tags=["admin"])
+def get_profile_collapsed(admin: User = Depends(admin_required)):
+    session = profiling.last_profile()
+    if session is None:
+        raise HTTPException(status_code=404, detail="尚未进行过采样剖析")
+    if not session.finished:
+        raise HTTPException(status_code=409, detail=f"采样剖析 #{session.id} 仍在进行")
+    return PlainTextResponse(session.collapsed())
+
+@router.delete("/profile", summary="提前结束进行中的采样剖析", tags=["admin"])
+def stop_profile(admin: User = Depends(admin_required)):
+    session = profiling.stop_profile()
+    if session is None:
+        raise HTTPException(status_code=404, detail="没有进行中的采样剖析")
+    session.wait(5)
+    return session.status()
+
+# ==== 14. 内存快照（索引 / docstore / 缓存占用 + tracemalloc） ====
+@router.post("/memory/tracemalloc", summary="开启 tracemalloc 内存分配追踪（有额外开销，排查后请关闭）", tags=["admin"])
+def start_tracemalloc(frames: int = Query(25, ge=1, le=100), admin: User = Depends(admin_required)):
+    return profiling.start_tracemalloc(frames)
+
+@router.delete("/memory/tracemalloc", summary="关闭 tracemalloc", tags=["admin"])
+def stop_tracemalloc(admin: User = Depends(admin_required)):
+    return profiling.stop_tracemalloc()
+
+@router.get("/memory/snapshot", summary="内存快照：各集合 FAISS 索引 / docstore / 缓存占用与 Python 分配热点", tags=["admin"])
+def get_memory_snapshot(
+    top: int = Query(20, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    format: str = Query("json", pattern="^(json|collapsed)$", description="collapsed：tracemalloc 分配的折叠栈（值为字节）"),
+    admin: User = Depends(admin_required),
+):
+    if format == "collapsed":
+        if not profiling.tracemalloc_status()["tracing"]:
+            raise HTTPException(status_code=409, detail="tracemalloc 未开启（POST /admin/memory/tracemalloc）")
+        return PlainTextResponse(profiling.memory_snapshot_collapsed())
+    return profiling.memory_snapshot(top=top, group_by=group_by)
+
+# ==== 15. 不活跃会话归档（消息冷热分层） ====
+@router.post("/archive-conversations", summary="把长期不活跃会话的消息压缩移入冷存储", tags=["admin"])
+def archive_conversations(
+    inactive_days: float = Query(ARCHIVE_INACTIVE_DAYS, gt=0, description="最后一条消息早于多少天的会话（须大于 0，避免归档正在进行的会话）"),
+    admin: User = Depends(admin_required),
+):
+    return archive_inactive_conversations(inactive_days)
+
+@router.get("/archive-conversations", summary="冷热消息数量、冷存储大小与后台归档状态", tags=["admin"])
+def get_archive_status(db: Session = Depends(get_db), admin: User = Depends(admin_required)):
+    return {**archive_stats(db), "archiver": archiver_status()}
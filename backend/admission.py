@@ -0,0 +1,142 @@
+# backend/admission.py
+# 准入控制：限制全局与单用户同时进行的问答请求数，超出时有界排队，排队超时或队列已满则快速返回 429
+
+import math
+import time
+import threading
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from .metrics import ADMISSION_REJECTIONS
+from .config import (
+    ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_PER_USER,
+    ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT, TRUSTED_PROXIES,
+)
+
+logger = logging.getLogger("gadgetguide_ai.admission")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    - 全局同时执行数不超过 max_in_flight，超出的请求进入有界等待队列（最多 max_queue 个）；
+    - 单个用户（执行中 + 排队中）不超过 max_per_user；
+    - 排队超过 queue_timeout 秒仍未获得执行名额则拒绝。
+    """
+
+    def __init__(self, max_in_flight: int, max_per_user: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._per_user = defaultdict(int)
+        self._avg_service_time = 1.0  # 秒，指数滑动平均，用于估算 Retry-After
+
+    def _retry_after(self) -> int:
+        backlog = (self._waiting + 1) / max(self.max_in_flight, 1)
+        return max(1, math.ceil(self._avg_service_time * backlog))
+
+    def _reject(self, user_key: str, reason: str):
+        self._per_user[user_key] -= 1
+        if self._per_user[user_key] <= 0:
+            del self._per_user[user_key]
+        retry_after = self._retry_after()
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        logger.warning(f"准入拒绝 ({reason}) user={user_key} in_flight={self._in_flight} waiting={self._waiting}")
+        raise AdmissionRejected(reason, retry_after)
+
+    def acquire(self, user_key: str):
+        with self._cond:
+            if self._per_user[user_key] >= self.max_per_user:
+                ADMISSION_REJECTIONS.inc(reason="per_user_limit")
+                raise AdmissionRejected("per_user_limit", self._retry_after())
+            self._per_user[user_key] += 1
+            if self._in_flight < self.max_in_flight and self._waiting == 0:
+                self._in_flight += 1
+                return
+            if self._waiting >= self.max_queue:
+                self._reject(user_key, "queue_full")
+            self._waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(user_key, "queue_timeout")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+
+    def release(self, user_key: str, service_time: Optional[float] = None):
+        with self._cond:
+            self._in_flight -= 1
+            self._per_user[user_key] -= 1
+            if self._per_user[user_key] <= 0:
+                del self._per_user[user_key]
+            if service_time is not None:
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * service_time
+            self._cond.notify()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "active_users": len(self._per_user),
+            }
+
+
+# --- 问答（/ask 与聊天发送消息）共用的准入控制器 ---
+qa_admission = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+    max_per_user=ADMISSION_MAX_PER_USER,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+)
+
+
+def client_admission_key(request: Request) -> str:
+    """
+    匿名接口的准入键：客户端 IP。直连地址是可信代理时，取 X-Forwarded-For 中从右往左第一个非可信代理的地址
+    （更靠左的部分可由客户端伪造）；未配置 TRUSTED_PROXIES 时忽略该请求头。
+    """
+    host = request.client.host if request.client else "unknown"
+    if host in TRUSTED_PROXIES:
+        hops = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if hop not in TRUSTED_PROXIES:
+                host = hop
+                break
+    return f"ip:{host}"
+
+
+@contextmanager
+def admit_or_429(user_key: str, controller: AdmissionController = qa_admission):
+    """路由中使用：获得执行名额后进入，被拒绝时抛出带 Retry-After 的 429。"""
+    try:
+        controller.acquire(user_key)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="请求过多，请稍后再试。",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        controller.release(user_key, time.monotonic() - started)
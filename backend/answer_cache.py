@@ -0,0 +1,146 @@
+# backend/answer_cache.py
+# 语义答案缓存：已回答问题的向量存入一个小型 FAISS 内积索引，新问题与某个已缓存问题足够相似时直接复用其答案。
+# 缓存与知识库索引版本绑定（版本变化即清空），按存活时间与 LRU 淘汰。
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+logger = logging.getLogger("gadgetguide_ai.answer_cache")
+
+
+@dataclass
+class _Entry:
+    question: str
+    answer: str
+    scope: Hashable
+    created_at: float
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    近似重复问题的答案缓存。scope 为额外的精确匹配条件（如问题中识别出的产品），
+    避免“iPhone 15 电池”与“iPhone 16 电池”这类向量很接近但答案不同的问题互相命中。
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._index = None
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # 按最近使用排序，最旧的在前
+        self._next_id = 0
+        self._version = None
+        self._counts = {"hits": 0, "misses": 0, "stores": 0, "evicted_lru": 0, "evicted_ttl": 0, "invalidations": 0}
+
+    @staticmethod
+    def _as_matrix(vector):
+        import faiss
+        import numpy as np
+
+        matrix = np.asarray([vector], dtype=np.float32)
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self._counts["invalidations"] += 1
+                logger.info(f"知识库版本变化（{self._version} → {version}），清空 {len(self._entries)} 条缓存答案。")
+            self._reset()
+            self._version = version
+
+    def _reset(self):
+        self._index = None
+        self._entries.clear()
+
+    def _remove(self, ids):
+        import faiss
+        import numpy as np
+
+        for entry_id in ids:
+            self._entries.pop(entry_id, None)
+        if self._index is not None and ids:
+            self._index.remove_ids(faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64)))
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at > self.ttl_seconds
+
+    def lookup(self, vector, version, scope: Hashable = None) -> Optional[str]:
+        """返回相似度不低于阈值、scope 相同且未过期的缓存答案；未命中返回 None。"""
+        with self._lock:
+            self._check_version(version)
+            if self._index is None or self._index.ntotal == 0:
+                self._counts["misses"] += 1
+                return None
+            scores, ids = self._index.search(self._as_matrix(vector), min(8, self._index.ntotal))
+            now, expired, found = time.time(), [], None
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.similarity:
+                    break
+                entry = self._entries.get(int(entry_id))
+                if entry is None:
+                    continue
+                if self._expired(entry, now):
+                    expired.append(int(entry_id))
+                    continue
+                if entry.scope == scope:
+                    found = (int(entry_id), entry, float(score))
+                    break
+            if expired:
+                self._counts["evicted_ttl"] += len(expired)
+                self._remove(expired)
+            if found is None:
+                self._counts["misses"] += 1
+                return None
+            entry_id, entry, score = found
+            entry.hits += 1
+            self._entries.move_to_end(entry_id)
+            self._counts["hits"] += 1
+        logger.info(f"语义缓存命中（相似度 {score:.3f}）：复用问题 '{entry.question}' 的答案。")
+        return entry.answer
+
+    def store(self, question: str, vector, answer: str, version, scope: Hashable = None):
+        import faiss
+        import numpy as np
+
+        if self.max_entries <= 0:
+            return
+        matrix = self._as_matrix(vector)
+        with self._lock:
+            if version != self._version:
+                # 答案是在旧版本知识库上生成的，不再缓存
+                return
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(matrix.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(matrix, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = _Entry(question, answer, scope, time.time())
+            self._counts["stores"] += 1
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._counts["evicted_lru"] += overflow
+                self._remove(list(self._entries)[:overflow])
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "entries": len(self._entries),
+                "hit_rate": round(self._counts["hits"] / lookups, 4) if lookups else 0.0,
+                "kb_version": self._version,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity": self.similarity,
+            }
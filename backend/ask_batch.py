@@ -0,0 +1,54 @@
+# backend/ask_batch.py
+"""
+离线批量问答：不经过 HTTP，直接在进程内批量嵌入、批量检索并发调用 LLM，结果按完成顺序逐行写出 JSONL。
+
+用法（项目根目录）：
+    python -m backend.ask_batch questions.txt -o answers.jsonl --concurrency 8 [--collection phones]
+输入为每行一个问题的文本文件，或每行含 "question" 字段的 JSONL；输出每行
+{"index", "question", "answer"} 或 {"index", "question", "error"}。
+"""
+
+import argparse
+import json
+import sys
+
+from backend.config import BATCH_LLM_CONCURRENCY
+from backend.qa_handler import answer_batch
+from backend.kb_collections import DEFAULT_COLLECTION
+
+
+def load_questions(path: str) -> list[str]:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GadgetGuide 离线批量问答")
+    parser.add_argument("input", help="问题文件（TXT 每行一个问题，或 JSONL）")
+    parser.add_argument("-o", "--output", help="结果 JSONL 路径，缺省输出到标准输出")
+    parser.add_argument("--concurrency", type=int, default=BATCH_LLM_CONCURRENCY, help="同时进行的 LLM 调用数")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION, help="知识库集合名")
+    args = parser.parse_args()
+
+    questions = load_questions(args.input)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    try:
+        for index, result in answer_batch(questions, concurrency=args.concurrency, collection=args.collection):
+            failed += "error" in result
+            out.write(json.dumps({"index": index, "question": questions[index], **result}, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"完成 {len(questions)} 个问题，失败 {failed} 个。", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,42 @@
 # backend/auth/auth_utils.py
 
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES,
+    BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING,
+)
 import logging
 
 logger = logging.getLogger("gadgetguide_ai")
 
 # --- 密码加密上下文 ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max 与 default 相同：代价不一致的旧哈希在校验时会被标记为需要更新
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# --- 专用密码哈希线程池 ---
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_pending_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+class PasswordHasherBusy(Exception):
+    """密码哈希线程池排队已满。"""
+
 
 # --- 加密密码 ---
 def hash_password(password: str) -> str:
@@ -19,6 +46,27 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# --- 验证密码，并在 bcrypt 代价变化时返回新哈希（无需更新则为 None） ---
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# --- 在专用线程池中执行哈希运算 ---
+async def _run_in_password_executor(func, *args):
+    if not _pending_slots.acquire(blocking=False):
+        logger.warning("Password hash executor is saturated, rejecting request.")
+        raise PasswordHasherBusy()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _pending_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_password_executor(hash_password, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run_in_password_executor(verify_and_update_password, plain_password, hashed_password)
+
 # --- 创建访问 Token ---
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
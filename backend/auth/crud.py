@@ -1,8 +1,26 @@
 # backend/auth/crud.py
 
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from sqlalchemy.orm import Session
 from .models import User
-from .auth_utils import hash_password, verify_password
+from .auth_utils import hash_password, verify_and_update_password_async
+from ..config import AUTH_DB_WORKERS
+
+logger = logging.getLogger("gadgetguide_ai")
+
+# --- 登录/注册数据库操作的专用线程池 ---
+# 这些操作很短，但默认线程池可能被等待 LLM 的同步接口占满；与密码哈希线程池一样单独隔离
+_auth_db_executor = ThreadPoolExecutor(
+    max_workers=AUTH_DB_WORKERS,
+    thread_name_prefix="auth-db",
+)
+
+async def run_in_auth_db_executor(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_auth_db_executor, func, *args)
 
 # --- 通过用户名查找用户 ---
 def get_user_by_username(db: Session, username: str):
@@ -12,17 +30,18 @@ def get_user_by_username(db: Session, username: str):
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-# --- 创建新用户 ---
-def create_user(db: Session, username: str, email: str, password: str):
-    hashed_pw = hash_password(password)
+# --- 创建新用户（已在专用线程池中算好哈希时可直接传入 password_hash） ---
+def create_user(db: Session, username: str, email: str, password: Optional[str] = None,
+                password_hash: Optional[str] = None):
+    hashed_pw = password_hash or hash_password(password)
     user = User(username=username, email=email, password_hash=hashed_pw)
     db.add(user)
     db.commit()
     db.refresh(user)
     return user
 
-# --- 验证用户身份（支持用户名或邮箱登录） ---
-def authenticate_user(db: Session, username_or_email: str, password: str):
+# --- 按用户名或邮箱查找用户，并结束读事务归还连接（返回脱离 Session 的对象） ---
+def get_user_for_login(db: Session, username_or_email: str):
     user = (
         db.query(User)
         .filter(
@@ -30,6 +49,31 @@ def authenticate_user(db: Session, username_or_email: str, password: str):
         )
         .first()
     )
-    if not user or not verify_password(password, user.password_hash):
+    if user:
+        db.expunge(user)
+    db.rollback()
+    return user
+
+# --- 更新密码哈希 ---
+def update_password_hash(db: Session, user_id: int, password_hash: str):
+    db.query(User).filter(User.id == user_id).update({User.password_hash: password_hash})
+    db.commit()
+
+# --- 验证用户身份（支持用户名或邮箱登录） ---
+async def authenticate_user(db: Session, username_or_email: str, password: str):
+    """
+    bcrypt 校验在专用线程池中执行；若 BCRYPT_ROUNDS 已调整，则顺带把哈希升级为新代价。
+    数据库读写（可能等待 SQLite 写锁 / 连接池）在登录专用线程池中执行，不阻塞事件循环。
+    """
+    # 读完即归还连接，避免在等待 bcrypt 期间占用连接池
+    user = await run_in_auth_db_executor(get_user_for_login, db, username_or_email)
+    if not user:
+        return None
+    valid, new_hash = await verify_and_update_password_async(password, user.password_hash)
+    if not valid:
         return None
+    if new_hash:
+        await run_in_auth_db_executor(update_password_hash, db, user.id, new_hash)
+        user.password_hash = new_hash
+        logger.info(f"Password hash upgraded to current bcrypt cost for: {user.username}")
     return user
@@ -2,11 +2,12 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from .schemas import UserCreate, UserLogin, UserOut
-from .crud import get_user_by_username, get_user_by_email, create_user, authenticate_user
-from .auth_utils import create_access_token
+from .crud import get_user_by_username, get_user_by_email, create_user, authenticate_user, run_in_auth_db_executor
+from .auth_utils import create_access_token, hash_password_async, PasswordHasherBusy
 from ..database import SessionLocal
 from ..config import SECRET_KEY, ALGORITHM
 import logging
@@ -26,6 +27,16 @@ def get_db():
     finally:
         db.close()
 
+# --- 异步版本：登录/注册为 async 接口，依赖不经过默认线程池，避免被慢请求阻塞 ---
+# 接口内的数据库操作（可能等待 SQLite 写锁 / 连接池）均在登录专用线程池中执行，不在事件循环上阻塞，
+# 也不与等待 LLM 的同步接口争用默认线程池
+async def get_db_async():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        await run_in_auth_db_executor(db.close)
+
 # --- 从 token 中获取当前用户 ---
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -45,29 +56,64 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
+# --- 哈希线程池排队已满时的统一响应 ---
+def _password_hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry later.",
+        headers={"Retry-After": "1"},
+    )
+
+# --- 注册前检查用户名和邮箱唯一性，返回冲突提示（无冲突为 None），并归还连接 ---
+def _registration_conflict(db: Session, username: str, email: str):
+    try:
+        if get_user_by_username(db, username):
+            logger.info(f"Username already exists: {username}")
+            return "Username already exists."
+        if get_user_by_email(db, email):
+            logger.info(f"Email already exists: {email}")
+            return "Email already exists."
+        return None
+    finally:
+        db.rollback()  # 归还连接，哈希期间不占用连接池
+
+# --- 写入新用户；检查后、写入前被并发注册抢先时唯一约束冲突，返回 None ---
+def _insert_user(db: Session, username: str, email: str, password_hash: str):
+    try:
+        return create_user(db, username, email, password_hash=password_hash)
+    except IntegrityError:
+        db.rollback()
+        logger.info(f"Concurrent registration conflict: {username} ({email})")
+        return None
+
 # --- 注册接口：接收 JSON ---
 @router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    # 检查用户名和邮箱唯一性
-    if get_user_by_username(db, user.username):
-        logger.info(f"Username already exists: {user.username}")
-        raise HTTPException(status_code=400, detail="Username already exists.")
-    if get_user_by_email(db, user.email):
-        logger.info(f"Email already exists: {user.email}")
-        raise HTTPException(status_code=400, detail="Email already exists.")
-    new_user = create_user(db, user.username, user.email, user.password)
+async def register(user: UserCreate, db: Session = Depends(get_db_async)):
+    conflict = await run_in_auth_db_executor(_registration_conflict, db, user.username, user.email)
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
+    try:
+        password_hash = await hash_password_async(user.password)
+    except PasswordHasherBusy:
+        raise _password_hasher_busy()
+    new_user = await run_in_auth_db_executor(_insert_user, db, user.username, user.email, password_hash)
+    if new_user is None:
+        raise HTTPException(status_code=400, detail="Username or email already exists.")
     logger.info(f"New user registered: {new_user.username} ({new_user.email})")
     return new_user
 
 # --- 登录接口：接收 JSON ---
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: Session = Depends(get_db_async)):
     """
     登录：用户名/邮箱+密码
     成功后直接返回 access_token + user 字段
     """
     username_or_email = user.username if user.username else user.email
-    db_user = authenticate_user(db, username_or_email, user.password)
+    try:
+        db_user = await authenticate_user(db, username_or_email, user.password)
+    except PasswordHasherBusy:
+        raise _password_hasher_busy()
     if not db_user:
         logger.warning(f"Login failed for: {username_or_email}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials.")
@@ -0,0 +1,69 @@
+# backend/benchmarks/common.py
+# 基准测试公共工具：临时环境、进程内启动 uvicorn、延迟统计
+
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+
+def use_temp_environment(prefix: str = "gadgetguide_bench_") -> str:
+    """
+    为基准测试准备隔离的临时目录与 SQLite 数据库（需在导入 backend.* 之前调用）。
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    return workdir
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(app, port: int, timeout: float = 10.0):
+    """在后台线程中启动 uvicorn，返回 server 对象（调用 server.should_exit = True 停止）。"""
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + timeout
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"uvicorn 未能在 {timeout}s 内启动 (port={port})")
+        time.sleep(0.05)
+    return server
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """汇总吞吐与延迟分位数（单位：毫秒）。"""
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def format_summary(name: str, stats: Dict[str, float]) -> str:
+    return (
+        f"{name:<28} n={stats['requests']:<6} err={stats['errors']:<4} "
+        f"rps={stats['throughput_rps']:<9} p50={stats['p50_ms']}ms "
+        f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms"
+    )
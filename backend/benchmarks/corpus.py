@@ -0,0 +1,65 @@
+# backend/benchmarks/corpus.py
+# 合成电子产品规格语料：生成 TXT 规格文档及带出处标注的问题集，供基准与检索评估使用
+
+import os
+import random
+from typing import Dict, List
+
+BRANDS = ["iPhone", "Galaxy S", "Pixel", "Xperia", "Mate", "Redmi Note", "OnePlus", "Find X"]
+CHIPS = ["A17 Pro", "A18 Pro", "Snapdragon 8 Gen 3", "Tensor G4", "Dimensity 9300", "Kirin 9010"]
+COLORS = ["黑色", "白色", "原色钛金属", "沙漠色", "蓝色", "绿色"]
+
+SPEC_QUESTIONS = {
+    "battery": "{product} 的电池容量是多少？",
+    "screen": "{product} 的屏幕尺寸和刷新率是多少？",
+    "chip": "{product} 使用的是什么芯片？",
+    "camera": "{product} 的主摄像头是多少像素？",
+    "weight": "{product} 有多重？",
+    "storage": "{product} 有哪些存储容量可选？",
+}
+
+
+def _product_specs(rng: random.Random, product: str) -> Dict[str, str]:
+    return {
+        "battery": f"{product} 内置 {rng.randrange(3000, 5600, 50)} mAh 锂离子电池，视频播放最长可达 {rng.randint(18, 33)} 小时，支持 {rng.choice([20, 25, 45, 67, 100])}W 有线快充。",
+        "screen": f"{product} 配备 {rng.choice(['6.1', '6.3', '6.7', '6.9'])} 英寸 OLED 显示屏，分辨率 {rng.choice(['2556 x 1179', '2796 x 1290', '3120 x 1440'])}，最高 {rng.choice([60, 90, 120, 144])}Hz 自适应刷新率。",
+        "chip": f"{product} 搭载 {rng.choice(CHIPS)} 芯片，{rng.choice([6, 8])} 核中央处理器，{rng.choice([5, 6, 12])} 核图形处理器。",
+        "camera": f"{product} 后置 {rng.choice([48, 50, 108, 200])}MP 主摄像头，{rng.choice([12, 48, 50])}MP 超广角，支持 {rng.choice([3, 5, 10])} 倍光学变焦。",
+        "weight": f"{product} 重量约 {rng.randint(160, 240)} 克，厚度 {rng.choice(['7.8', '8.25', '8.9'])} 毫米，提供 {'、'.join(rng.sample(COLORS, 3))} 等配色。",
+        "storage": f"{product} 提供 {'、'.join(rng.sample(['128GB', '256GB', '512GB', '1TB'], 3))} 存储版本，运行内存 {rng.choice([8, 12, 16])}GB。",
+    }
+
+
+def generate_corpus(target_dir: str, products: int = 24, filler_paragraphs: int = 6, seed: int = 42) -> List[dict]:
+    """
+    在 target_dir 中为 products 个虚构机型各生成一个规格 TXT 文档。
+    返回问题集：[{"question", "product", "source", "field"}]，source 为答案所在的文件名。
+    """
+    rng = random.Random(seed)
+    os.makedirs(target_dir, exist_ok=True)
+    questions = []
+    names = set()
+    while len(names) < products:
+        names.add(f"{rng.choice(BRANDS)} {rng.randint(10, 19)}{rng.choice(['', ' Pro', ' Pro Max', ' Ultra', ' Plus'])}")
+    for product in sorted(names):
+        specs = _product_specs(rng, product)
+        filename = f"{product.replace(' ', '_')}_技术规格.txt"
+        sections = [f"{product} 技术规格\n"]
+        for field, text in specs.items():
+            sections.append(text)
+            # 与规格无关的通用说明，使语料更接近真实文档并增加检索干扰
+            for _ in range(rng.randint(0, filler_paragraphs)):
+                sections.append(
+                    f"{product} 支持 {rng.choice(['Wi-Fi 7', 'Wi-Fi 6E', '蓝牙 5.3', 'NFC', '超宽带'])}，"
+                    f"具备 IP{rng.choice([67, 68])} 级防溅抗水性能，出厂预装最新版本操作系统。"
+                )
+        with open(os.path.join(target_dir, filename), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(sections))
+        for field, template in SPEC_QUESTIONS.items():
+            questions.append({
+                "question": template.format(product=product),
+                "product": product,
+                "source": filename,
+                "field": field,
+            })
+    return questions
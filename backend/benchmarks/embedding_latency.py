@@ -0,0 +1,74 @@
+# backend/benchmarks/embedding_latency.py
+"""
+嵌入服务提供方基准：测量查询嵌入延迟（串行与并发，并发时 onnx 会动态合批）与文档批量嵌入吞吐。
+
+用法（项目根目录）：
+    # Ollama（默认 OLLAMA_BASE_URL；--fake-ollama 使用本地替身服务）
+    python -m backend.benchmarks.embedding_latency --provider ollama
+    # 进程内 ONNX（模型目录见 EMBEDDING_ONNX_MODEL_DIR）
+    EMBEDDING_ONNX_THREADS=4 python -m backend.benchmarks.embedding_latency --provider onnx
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.benchmarks.common import use_temp_environment, summarize, format_summary
+
+_QUERIES = [
+    "iPhone 16 Pro 的电池容量是多少？",
+    "华为 Mate 60 和小米 14 的屏幕有什么区别？",
+    "这款手机支持多少瓦的快充？",
+    "Galaxy S24 Ultra 的主摄像头是多少像素？",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入延迟 / 吞吐基准")
+    parser.add_argument("--provider", choices=["ollama", "onnx"], default="ollama")
+    parser.add_argument("--fake-ollama", action="store_true", help="使用替身 Ollama 嵌入服务")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--documents", type=int, default=256)
+    args = parser.parse_args()
+
+    use_temp_environment("gadgetguide_embed_")
+    os.environ["EMBEDDING_PROVIDER"] = args.provider
+    if args.fake_ollama:
+        from backend.benchmarks.fake_servers import start_fake_embedding_server
+        _, embed_url = start_fake_embedding_server(latency=0.0, latency_per_input=0.0)
+        os.environ["OLLAMA_BASE_URL"] = embed_url
+
+    from backend.knowledge_base_processor import get_embeddings
+
+    t0 = time.perf_counter()
+    embeddings = get_embeddings()
+    embeddings.embed_query("预热")
+    print(f"provider={args.provider} 初始化 + 首次嵌入: {(time.perf_counter() - t0) * 1000:.0f}ms")
+
+    def embed_once(i):
+        started = time.perf_counter()
+        embeddings.embed_query(_QUERIES[i % len(_QUERIES)] + f" #{i}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    serial = [embed_once(i) for i in range(args.queries)]
+    print(format_summary("embed_query serial", summarize(serial, time.perf_counter() - started)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        concurrent = list(pool.map(embed_once, range(args.queries)))
+    print(format_summary(f"embed_query x{args.concurrency}", summarize(concurrent, time.perf_counter() - started)))
+    if hasattr(embeddings, "stats"):
+        print(f"动态合批: {embeddings.stats()['query_batching']}")
+
+    documents = [(_QUERIES[i % len(_QUERIES)] + " 详细规格说明。") * 8 for i in range(args.documents)]
+    started = time.perf_counter()
+    embeddings.embed_documents(documents)
+    elapsed = time.perf_counter() - started
+    print(f"embed_documents: {args.documents} 条 {elapsed * 1000:.0f}ms（{args.documents / elapsed:.1f} 条/秒）")
+
+
+if __name__ == "__main__":
+    main()
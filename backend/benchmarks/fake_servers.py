@@ -0,0 +1,192 @@
+# backend/benchmarks/fake_servers.py
+"""
+离线替身服务，延迟与错误率可配置，用于测试与基准：
+- OpenAI 兼容的 /v1/chat/completions 桩（替代 DeepSeek，支持 stream=True 的 SSE 输出）；
+- Ollama 兼容的 /api/embed 桩（替代 bge-m3），基于字符二元组哈希生成确定性向量，相似文本向量相近。
+
+单独运行：
+    python -m backend.benchmarks.fake_servers --llm-port 9001 --llm-latency 0.5 --embed-port 9002
+然后设置 LLM_API_URL=http://127.0.0.1:9001/v1/chat/completions LLM_API_KEY=stub
+OLLAMA_BASE_URL=http://127.0.0.1:9002 启动后端。
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, latency: float, jitter: float, error_rate: float):
+        super().__init__(address, handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    def simulate(self) -> bool:
+        """模拟处理耗时；返回 False 表示本次应返回错误。"""
+        with self._count_lock:
+            self.request_count += 1
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+        return random.random() >= self.error_rate
+
+
+class _BaseHandler(BaseHTTPRequestHandler):
+    server: _FakeServer
+
+    def log_message(self, format, *args):  # noqa: A002 - 保持与基类签名一致
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeChatCompletionHandler(_BaseHandler):
+    """OpenAI 兼容 chat completions 桩：回答内容取自 prompt 中的用户问题。"""
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        payload = self._read_json()
+        if not self.server.simulate():
+            self._send_json(503, {"error": {"message": "simulated upstream failure"}})
+            return
+        prompt = (payload.get("messages") or [{}])[-1].get("content", "")
+        question = prompt.rsplit("用户问题：", 1)[-1].split("\n", 1)[0].strip() or prompt[:50]
+        answer = f"这是针对“{question}”的模拟回答。"
+        if payload.get("stream"):
+            self._send_stream(payload, answer)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{self.server.request_count}",
+            "object": "chat.completion",
+            "model": payload.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(answer), "total_tokens": len(prompt) + len(answer)},
+        })
+
+    def _send_stream(self, payload: dict, answer: str):
+        """SSE 流式响应：latency 视为首个 token 的等待时间，之后每 stream_interval 秒输出一段。"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i in range(0, len(answer), 4):
+            chunk = {
+                "id": f"chatcmpl-fake-{self.server.request_count}",
+                "object": "chat.completion.chunk",
+                "model": payload.get("model", "fake-model"),
+                "choices": [{"index": 0, "delta": {"content": answer[i:i + 4]}, "finish_reason": None}],
+            }
+            try:
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            time.sleep(self.server.stream_interval)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """确定性嵌入：字符二元组与英文单词哈希到 dim 维后 L2 归一化。"""
+    vector = [0.0] * dim
+    compact = re.sub(r"\s+", "", text.lower())
+    features = [compact[i:i + 2] for i in range(len(compact) - 1)] + re.findall(r"[a-z0-9]+", text.lower())
+    for feature in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeEmbeddingHandler(_BaseHandler):
+    """Ollama /api/embed 桩：每个输入额外增加 latency_per_input 秒。"""
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/embed":
+            self._send_json(404, {"error": "not found"})
+            return
+        payload = self._read_json()
+        inputs = payload.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if not self.server.simulate():
+            self._send_json(500, {"error": "simulated embedding failure"})
+            return
+        time.sleep(self.server.latency_per_input * len(inputs))
+        self._send_json(200, {
+            "model": payload.get("model", "fake-embed"),
+            "embeddings": [fake_embedding(text, self.server.dim) for text in inputs],
+        })
+
+
+def start_fake_embedding_server(port: int = 0, latency: float = 0.01, latency_per_input: float = 0.002,
+                                dim: int = 1024, error_rate: float = 0.0) -> Tuple[_FakeServer, str]:
+    """启动 Ollama 嵌入桩，返回 (server, base_url)。"""
+    server = _FakeServer(("127.0.0.1", port), FakeEmbeddingHandler, latency, 0.0, error_rate)
+    server.latency_per_input = latency_per_input
+    server.dim = dim
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_fake_llm_server(port: int = 0, latency: float = 0.2, jitter: float = 0.0,
+                          error_rate: float = 0.0, stream_interval: float = 0.02) -> Tuple[_FakeServer, str]:
+    """启动 chat completions 桩，返回 (server, completions_url)；调用 server.shutdown() 停止。"""
+    server = _FakeServer(("127.0.0.1", port), FakeChatCompletionHandler, latency, jitter, error_rate)
+    server.stream_interval = stream_interval
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动离线替身服务")
+    parser.add_argument("--llm-port", type=int, default=9001)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--embed-port", type=int, default=9002)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--embed-dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    _, llm_url = start_fake_llm_server(args.llm_port, args.llm_latency, args.llm_jitter, args.llm_error_rate)
+    _, embed_url = start_fake_embedding_server(args.embed_port, args.embed_latency, dim=args.embed_dim)
+    print(f"Fake chat completions: {llm_url}")
+    print(f"Fake Ollama embeddings: {embed_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
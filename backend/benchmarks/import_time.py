@@ -0,0 +1,117 @@
+# backend/benchmarks/import_time.py
+"""
+冷启动基准：在全新子进程中多次导入 backend.main，统计导入耗时，列出累计耗时最高的模块，
+并检查重量级依赖（FAISS、LangChain、Ollama 客户端、jieba 等）是否被提前导入。
+
+用法（项目根目录）：
+    python -m backend.benchmarks.import_time --runs 5
+CI 中可加 --max-ms 1500，导入耗时中位数超限或重量级模块被提前导入时以非零状态退出。
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+from backend.benchmarks.common import use_temp_environment, percentile
+
+# 这些模块只应在检索、建索引、分词等实际用到时才导入
+HEAVY_MODULES = [
+    "faiss",
+    "numpy",
+    "langchain",
+    "langchain_community",
+    "langchain_ollama",
+    "langchain_text_splitters",
+    "pypdf",
+    "jieba",
+]
+
+_CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "heavy": sorted(m for m in %r if m in sys.modules)}))
+""" % (HEAVY_MODULES,)
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def _run_once(env: dict) -> tuple[dict, list[tuple[int, str]]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD_SCRIPT],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    # 只统计 backend.main 直接或间接导入的顶层包（缩进最浅的条目）
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    min_depth = min((depth for _, depth, _ in entries), default=0)
+    top = [(cumulative, name) for cumulative, depth, name in entries if depth <= min_depth + 2]
+    return result, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description="backend.main 导入耗时基准")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="列出累计导入耗时最高的模块数")
+    parser.add_argument("--max-ms", type=float, help="导入耗时中位数超过该值则以状态码 1 退出")
+    parser.add_argument("--allow-heavy", action="store_true", help="重量级模块被提前导入时不视为失败")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    workdir = use_temp_environment("gadgetguide_import_")
+    env = dict(os.environ)
+    env.setdefault("UPLOAD_FOLDER", os.path.join(workdir, "uploads"))
+    env.setdefault("FAISS_INDEX_PATH", os.path.join(workdir, "faiss_index"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+    # 第一次运行用于生成 .pyc 等缓存，不计入统计
+    _run_once(env)
+    timings, heavy, slowest = [], set(), {}
+    for _ in range(args.runs):
+        result, top = _run_once(env)
+        timings.append(result["seconds"])
+        heavy.update(result["heavy"])
+        for cumulative, name in top:
+            slowest[name] = max(slowest.get(name, 0), cumulative)
+
+    summary = {
+        "runs": args.runs,
+        "p50_ms": round(percentile(timings, 50) * 1000, 1),
+        "max_ms": round(max(timings) * 1000, 1),
+        "heavy_modules_imported": sorted(heavy),
+        "slowest_modules_ms": [
+            {"module": name, "cumulative_ms": round(us / 1000, 1)}
+            for name, us in sorted(slowest.items(), key=lambda kv: -kv[1])[:args.top]
+        ],
+    }
+
+    print(f"import backend.main: p50={summary['p50_ms']}ms max={summary['max_ms']}ms ({args.runs} 次)")
+    print(f"提前导入的重量级模块: {summary['heavy_modules_imported'] or '无'}")
+    for item in summary["slowest_modules_ms"]:
+        print(f"  {item['cumulative_ms']:>9.1f}ms  {item['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if heavy and not args.allow_heavy:
+        print(f"重量级模块在导入 backend.main 时被加载: {sorted(heavy)}")
+        failed = True
+    if args.max_ms is not None and summary["p50_ms"] > args.max_ms:
+        print(f"导入耗时 p50 超过 {args.max_ms}ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
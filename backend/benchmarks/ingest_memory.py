@@ -0,0 +1,117 @@
+# backend/benchmarks/ingest_memory.py
+"""
+入库内存基准（完全离线）：生成不同大小的 TXT 文档，分别用流式入库（create_index_from_files）
+与旧的整文件加载方式（loader.load + from_documents）建索引，采样进程 RSS，输出峰值增量。
+流式入库的峰值应基本不随文档大小增长（索引本身的向量与 docstore 除外）。
+
+用法（项目根目录）：
+    python -m backend.benchmarks.ingest_memory --sizes-mb 2,8 --compare-legacy
+"""
+
+import argparse
+import gc
+import os
+import threading
+import time
+
+from backend.benchmarks.common import use_temp_environment
+
+_PARAGRAPH = (
+    "{name} 第 {i} 节：这款设备采用全新设计的机身结构，续航、影像与散热均有明显提升。"
+    "屏幕支持 120Hz 自适应刷新率，峰值亮度 2000 尼特，支持 IP68 级防尘抗水。\n\n"
+)
+
+
+def _write_document(path: str, size_mb: float):
+    target = int(size_mb * 2**20)
+    written, i = 0, 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            text = _PARAGRAPH.format(name=os.path.basename(path), i=i)
+            f.write(text)
+            written += len(text.encode("utf-8"))
+            i += 1
+
+
+class _PeakSampler:
+    """后台线程每隔 interval 秒采样一次 RSS，记录峰值。"""
+
+    def __init__(self, interval: float = 0.01):
+        from backend.knowledge_base_processor import current_rss_mb
+
+        self._rss = current_rss_mb
+        self._interval = interval
+        self._stop = threading.Event()
+        self.baseline = self.peak = self._rss() or 0.0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss() or 0.0)
+            time.sleep(self._interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _legacy_ingest(path: str):
+    from langchain_community.vectorstores import FAISS
+    from backend.knowledge_base_processor import get_document_loader, get_embeddings, make_text_splitter
+
+    documents = get_document_loader(path).load()
+    chunks = make_text_splitter().split_documents(documents)
+    return FAISS.from_documents(chunks, get_embeddings())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入库峰值内存基准")
+    parser.add_argument("--sizes-mb", default="2,8", help="逗号分隔的文档大小（MB）")
+    parser.add_argument("--compare-legacy", action="store_true", help="同时测量整文件加载方式")
+    parser.add_argument("--embed-dim", type=int, default=256)
+    args = parser.parse_args()
+
+    workdir = use_temp_environment("gadgetguide_ingest_")
+    os.environ["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    os.environ["FAISS_INDEX_PATH"] = os.path.join(workdir, "faiss_index")
+    os.environ["COLLECTIONS_ROOT"] = os.path.join(workdir, "collections")
+    from backend.benchmarks.fake_servers import start_fake_embedding_server
+    _, embed_url = start_fake_embedding_server(latency=0.0, latency_per_input=0.0, dim=args.embed_dim)
+    os.environ["OLLAMA_BASE_URL"] = embed_url
+
+    from backend.kb_collections import ensure_collection, collection_upload_folder
+    from backend.knowledge_base_processor import create_index_from_files, get_embeddings
+    from langchain_community.vectorstores import FAISS  # noqa: F401 - 预先导入，避免导入开销计入首个场景
+    get_embeddings().embed_documents(["预热"])
+
+    rows = []
+    for size_mb in [float(v) for v in args.sizes_mb.split(",") if v.strip()]:
+        collection = f"ingest_{str(size_mb).replace('.', '_')}"
+        ensure_collection(collection)
+        name = f"doc_{size_mb}MB.txt"
+        path = os.path.join(collection_upload_folder(collection), name)
+        _write_document(path, size_mb)
+
+        modes = [("streaming", lambda: create_index_from_files([name], collection))]
+        if args.compare_legacy:
+            modes.append(("legacy", lambda: _legacy_ingest(path)))
+        for mode, run in modes:
+            gc.collect()
+            t0 = time.perf_counter()
+            with _PeakSampler() as sampler:
+                result = run()
+            elapsed = time.perf_counter() - t0
+            del result
+            rows.append((size_mb, mode, sampler.peak - sampler.baseline, elapsed))
+
+    print(f"\n{'size_mb':>8} {'mode':>10} {'peak_delta_mb':>14} {'seconds':>8}")
+    for size_mb, mode, delta, elapsed in rows:
+        print(f"{size_mb:>8} {mode:>10} {delta:>14.1f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# backend/benchmarks/load_test.py
+"""
+端到端负载基准（完全离线）：启动替身嵌入 / LLM 服务与后端，生成合成语料，
+按指定并发压测 /admin/upload-documents/、/ask 与 /chat/.../messages/，输出吞吐与 p50/p95/p99 延迟。
+
+用法（项目根目录）：
+    python -m backend.benchmarks.load_test --concurrency 8 --ask-requests 200 --chat-requests 100
+CI 中可加 --max-p95-ms 2000 --output bench.json，任一场景 p95 超限时以非零状态退出。
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.benchmarks.common import use_temp_environment, free_port, start_uvicorn, summarize, format_summary
+from backend.benchmarks.corpus import generate_corpus
+from backend.benchmarks.fake_servers import start_fake_llm_server, start_fake_embedding_server
+
+
+def _configure_environment(args) -> str:
+    """在导入 backend 之前，把数据库、上传目录、索引目录与外部服务全部指向临时环境 / 替身服务。"""
+    workdir = use_temp_environment("gadgetguide_load_")
+    os.environ["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    os.environ["FAISS_INDEX_PATH"] = os.path.join(workdir, "faiss_index")
+    _, embed_url = start_fake_embedding_server(latency=args.embed_latency, dim=args.embed_dim)
+    _, llm_url = start_fake_llm_server(latency=args.llm_latency, jitter=args.llm_jitter)
+    os.environ["OLLAMA_BASE_URL"] = embed_url
+    os.environ["LLM_API_URL"] = llm_url
+    os.environ["LLM_API_KEY"] = "stub"
+    if not args.respect_admission:
+        # 压测流量都来自同一 IP / 少量用户，默认放宽准入限制以测量系统本身的容量
+        os.environ.setdefault("ADMISSION_MAX_IN_FLIGHT", str(max(args.concurrency, 16)))
+        os.environ.setdefault("ADMISSION_MAX_PER_USER", str(args.concurrency))
+    return workdir
+
+
+def _run_concurrently(fn, count: int, concurrency: int):
+    latencies, errors, rejected = [], 0, 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, status in pool.map(fn, range(count)):
+            if status == 200:
+                latencies.append(latency)
+            elif status == 429:
+                rejected += 1
+            else:
+                errors += 1
+    stats = summarize(latencies, time.perf_counter() - started, errors)
+    stats["rejected_429"] = rejected
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GadgetGuide 端到端负载基准")
+    parser.add_argument("--products", type=int, default=24, help="合成语料中的机型数量")
+    parser.add_argument("--upload-batches", type=int, default=3, help="语料分几次上传（每次上传都会触发索引更新）")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ask-requests", type=int, default=100)
+    parser.add_argument("--chat-requests", type=int, default=50)
+    parser.add_argument("--chat-users", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--embed-dim", type=int, default=1024)
+    parser.add_argument("--respect-admission", action="store_true", help="使用默认准入限制（429 单独计数）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--max-p95-ms", type=float, help="任一场景 p95 超过该值则以状态码 1 退出")
+    args = parser.parse_args()
+
+    workdir = _configure_environment(args)
+    import requests
+    from backend.main import app
+    from backend.database import SessionLocal
+    from backend.auth.crud import create_user
+
+    port = free_port()
+    server = start_uvicorn(app, port)
+    base = f"http://127.0.0.1:{port}"
+    rng = random.Random(args.seed)
+
+    corpus_dir = os.path.join(workdir, "corpus")
+    questions = generate_corpus(corpus_dir, products=args.products, seed=args.seed)
+
+    # --- 账号准备：管理员 + 若干普通用户 ---
+    db = SessionLocal()
+    admin = create_user(db, "bench_admin", "bench_admin@example.com", "bench-password")
+    admin.is_admin = True
+    db.commit()
+    for i in range(args.chat_users):
+        create_user(db, f"bench_user{i}", f"bench_user{i}@example.com", "bench-password")
+    db.close()
+
+    def login(username: str) -> dict:
+        resp = requests.post(f"{base}/auth/login", json={"username": username, "password": "bench-password"})
+        resp.raise_for_status()
+        return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    admin_headers = login("bench_admin")
+    user_headers = [login(f"bench_user{i}") for i in range(args.chat_users)]
+    results = {}
+
+    # --- 场景 1：分批上传语料并更新索引（串行，索引更新本身不可并发） ---
+    files = sorted(os.listdir(corpus_dir))
+    batches = [files[i::args.upload_batches] for i in range(args.upload_batches)]
+    upload_latencies, upload_errors = [], 0
+    started = time.perf_counter()
+    for batch in batches:
+        handles = [open(os.path.join(corpus_dir, name), "rb") for name in batch]
+        try:
+            t0 = time.perf_counter()
+            resp = requests.post(
+                f"{base}/admin/upload-documents/",
+                headers=admin_headers,
+                files=[("files", (name, fh, "text/plain")) for name, fh in zip(batch, handles)],
+                timeout=600,
+            )
+            if resp.status_code == 200:
+                upload_latencies.append(time.perf_counter() - t0)
+            else:
+                upload_errors += 1
+        finally:
+            for fh in handles:
+                fh.close()
+    results["upload_documents"] = summarize(upload_latencies, time.perf_counter() - started, upload_errors)
+
+    # --- 场景 2：/ask ---
+    def ask_once(_):
+        question = rng.choice(questions)["question"]
+        t0 = time.perf_counter()
+        resp = requests.post(f"{base}/ask", data={"query": question}, timeout=120)
+        return time.perf_counter() - t0, resp.status_code
+
+    results["ask"] = _run_concurrently(ask_once, args.ask_requests, args.concurrency)
+
+    # --- 场景 3：聊天发送消息（每个用户一个会话） ---
+    conversation_ids = []
+    for headers in user_headers:
+        resp = requests.post(f"{base}/chat/conversations/", headers=headers, json={"title": "bench"})
+        resp.raise_for_status()
+        conversation_ids.append(resp.json()["id"])
+
+    def chat_once(i):
+        slot = i % len(user_headers)
+        question = rng.choice(questions)["question"]
+        t0 = time.perf_counter()
+        resp = requests.post(
+            f"{base}/chat/conversations/{conversation_ids[slot]}/messages/",
+            headers=user_headers[slot],
+            json={"role": "user", "content": question},
+            timeout=120,
+        )
+        return time.perf_counter() - t0, resp.status_code
+
+    results["chat_send_message"] = _run_concurrently(chat_once, args.chat_requests, args.concurrency)
+
+    server.should_exit = True
+
+    print(f"\nworkdir={workdir} concurrency={args.concurrency} llm_latency={args.llm_latency}s products={args.products}")
+    for name, stats in results.items():
+        print(format_summary(name, stats) + (f" 429={stats['rejected_429']}" if "rejected_429" in stats else ""))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+    if args.max_p95_ms is not None:
+        over = [name for name, stats in results.items() if stats["p95_ms"] > args.max_p95_ms]
+        if over:
+            print(f"p95 超过 {args.max_p95_ms}ms 的场景: {over}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
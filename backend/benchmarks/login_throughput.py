@@ -0,0 +1,100 @@
+# backend/benchmarks/login_throughput.py
+"""
+登录吞吐基准：在模拟 LLM 阻塞的同步接口压满默认线程池的同时，测量 /auth/login 的吞吐与延迟。
+
+用法（项目根目录）：
+    python -m backend.benchmarks.login_throughput --users 20 --requests 200 --concurrency 16 --busy 32
+"""
+
+import argparse
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.benchmarks.common import use_temp_environment, free_port, start_uvicorn, summarize, format_summary
+
+
+def build_app(busy_seconds: float):
+    from fastapi import FastAPI
+    from backend.auth.routes import router as auth_router
+    from backend.database import Base, engine
+    from backend.auth import models  # noqa: F401  注册 users 表
+    from backend.chat import models as chat_models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(auth_router)
+
+    # 模拟 send_message：同步接口在默认线程池中阻塞等待 LLM
+    @app.get("/busy")
+    def busy():
+        time.sleep(busy_seconds)
+        return {"ok": True}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bcrypt 登录吞吐基准")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--busy", type=int, default=32, help="并发占用默认线程池的慢请求数")
+    parser.add_argument("--busy-seconds", type=float, default=2.0)
+    parser.add_argument("--rounds", type=int, default=None, help="覆盖 BCRYPT_ROUNDS")
+    args = parser.parse_args()
+
+    use_temp_environment()
+    if args.rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+
+    import requests
+
+    port = free_port()
+    server = start_uvicorn(build_app(args.busy_seconds), port)
+    base = f"http://127.0.0.1:{port}"
+
+    for i in range(args.users):
+        requests.post(f"{base}/auth/register", json={
+            "username": f"bench{i}", "email": f"bench{i}@example.com", "password": "bench-password",
+        }).raise_for_status()
+
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            try:
+                requests.get(f"{base}/busy", timeout=60)
+            except requests.RequestException:
+                pass
+
+    busy_threads = [threading.Thread(target=busy_loop, daemon=True) for _ in range(args.busy)]
+    for t in busy_threads:
+        t.start()
+    time.sleep(0.5)
+
+    def login_once(i: int):
+        start = time.perf_counter()
+        resp = requests.post(f"{base}/auth/login", json={
+            "username": f"bench{i % args.users}", "password": "bench-password",
+        }, timeout=60)
+        return time.perf_counter() - start, resp.status_code == 200
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(login_once, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    server.should_exit = True
+
+    latencies = [lat for lat, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    from backend.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+    print(f"bcrypt rounds={BCRYPT_ROUNDS} hash workers={PASSWORD_HASH_WORKERS} busy requests={args.busy}")
+    print(format_summary("POST /auth/login", summarize(latencies, elapsed, errors)))
+
+
+if __name__ == "__main__":
+    main()
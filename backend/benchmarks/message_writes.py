@@ -0,0 +1,63 @@
+# backend/benchmarks/message_writes.py
+"""
+聊天消息写入基准：多个线程（模拟并发的 send_message 请求）各自调用 crud.create_message，
+对比逐条提交（MESSAGE_GROUP_COMMIT=0）与组提交的写入吞吐、延迟和每次提交合并的消息数。
+
+用法（项目根目录）：
+    python -m backend.benchmarks.message_writes --messages 2000 --concurrency 16
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.benchmarks.common import use_temp_environment, summarize, format_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="聊天消息写入（逐条提交 vs 组提交）基准")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--conversations", type=int, default=64)
+    args = parser.parse_args()
+
+    use_temp_environment("gadgetguide_msgwrite_")
+    from backend.database import Base, engine, SessionLocal
+    from backend.auth import models as auth_models
+    from backend.chat import crud, models, message_writer
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = auth_models.User(username="bench", email="bench@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    conversations = [crud.create_conversation(db, user, title=f"c{i}") for i in range(args.conversations)]
+    conversation_ids = [c.id for c in conversations]
+    db.close()
+
+    def run(label: str, group_commit: bool):
+        crud.MESSAGE_GROUP_COMMIT = group_commit
+
+        def write_one(i):
+            session = SessionLocal()
+            try:
+                conversation = session.get(models.Conversation, conversation_ids[i % len(conversation_ids)])
+                started = time.perf_counter()
+                crud.create_message(session, conversation, role="user", content=f"消息 {i} " + "测试内容" * 50)
+                return time.perf_counter() - started
+            finally:
+                session.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(write_one, range(args.messages)))
+        print(format_summary(label, summarize(latencies, time.perf_counter() - started)))
+
+    run(f"逐条提交 x{args.concurrency}", group_commit=False)
+    run(f"组提交 x{args.concurrency}", group_commit=True)
+    print(f"组提交: {message_writer.get_message_writer().stats()}")
+    message_writer.stop_message_writer()
+
+
+if __name__ == "__main__":
+    main()
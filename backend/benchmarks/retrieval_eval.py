@@ -0,0 +1,209 @@
+# backend/benchmarks/retrieval_eval.py
+"""
+检索质量 / 速度 / 内存评估：在带标注的“问题 → 出处文件(页)”集合上，比较不同分块参数、索引类型
+（含 fp16 / SQ8 / PCA 降维等压缩存储格式）、k 与阈值下的 recall@k、MRR、检索延迟与每向量字节数，
+输出可对比的 Markdown / JSON 报告。
+
+注意：PCA 降维后的 L2 距离整体变小，阈值需按报告重新选择。
+
+标注文件为 JSON 数组或 JSONL，每条形如：
+    {"question": "iPhone 16 Pro 的电池容量是多少？", "source": "iPhone 16 Pro - Tech Specs - Apple Support.pdf", "page": 2}
+（page 为文档中的页码，从 1 开始，可省略；TXT 文档无页码。）
+
+用法（项目根目录）：
+    # 完全离线：合成语料 + 替身嵌入服务
+    python -m backend.benchmarks.retrieval_eval --report retrieval_report.md
+    # 真实文档与 Ollama 嵌入
+    python -m backend.benchmarks.retrieval_eval --docs backend/uploads --labels labels.jsonl --real-embeddings
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from itertools import product
+from typing import List, Optional
+
+from backend.benchmarks.common import use_temp_environment, percentile
+
+
+def _parse_list(value: str, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def load_labels(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _is_hit(doc, label: dict) -> bool:
+    source = os.path.basename(str(doc.metadata.get("source", "")))
+    if source != os.path.basename(label["source"]):
+        return False
+    if label.get("page") is not None and doc.metadata.get("page") is not None:
+        return int(doc.metadata["page"]) + 1 == int(label["page"])
+    return True
+
+
+def _build_index(index_type: str, vectors):
+    """flat / hnsw / ivf，或生产环境可选的压缩存储格式（fp16、sq8、pcaN+sq8 等，见 FAISS_VECTOR_ENCODING）。"""
+    import faiss
+    from backend.knowledge_base_processor import build_encoded_index
+
+    count, dim = vectors.shape
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32)
+    elif index_type == "ivf":
+        nlist = max(1, int(math.sqrt(count)))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.train(vectors)
+        index.nprobe = max(1, nlist // 8)
+    else:
+        return build_encoded_index(vectors, index_type)
+    index.add(vectors)
+    return index
+
+
+def _index_bytes(index) -> int:
+    """序列化后的索引大小，近似其常驻内存占用（含 PCA 矩阵、HNSW 图等固定 / 结构开销）。"""
+    import faiss
+    return len(faiss.serialize_index(index))
+
+
+def _code_bytes(index) -> Optional[int]:
+    """每个向量编码本身的字节数（不含固定开销），语料增大后每向量内存趋近该值。"""
+    try:
+        return index.sa_code_size()
+    except RuntimeError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索质量 / 速度评估")
+    parser.add_argument("--docs", help="文档目录（PDF/TXT）；缺省时生成合成语料")
+    parser.add_argument("--labels", help="标注文件（JSON / JSONL）；使用 --docs 时必填")
+    parser.add_argument("--real-embeddings", action="store_true", help="使用 config 中的 Ollama 嵌入服务而非替身")
+    parser.add_argument("--chunk-sizes", default="250,350,500")
+    parser.add_argument("--chunk-overlaps", default="0,70")
+    parser.add_argument("--index-types", default="flat,hnsw,ivf,fp16,sq8,pca256+sq8",
+                        help="flat / hnsw / ivf，或 FAISS_VECTOR_ENCODING 支持的压缩格式（fp16、sq8、pcaN+sq8 等）")
+    parser.add_argument("--ks", default="3,5,10")
+    parser.add_argument("--thresholds", default="0,0.65", help="与 retrieve_context 相同语义：保留 score >= 阈值的片段")
+    parser.add_argument("--products", type=int, default=24, help="合成语料的机型数量")
+    parser.add_argument("--report", help="Markdown 报告输出路径")
+    parser.add_argument("--output", help="JSON 结果输出路径")
+    args = parser.parse_args()
+    if args.docs and not args.labels:
+        parser.error("使用 --docs 时必须提供 --labels")
+
+    workdir = use_temp_environment("gadgetguide_eval_")
+    # 评估使用独立的空索引目录，不会触碰线上索引
+    os.environ["FAISS_INDEX_PATH"] = os.path.join(workdir, "faiss_index")
+    if not args.real_embeddings:
+        from backend.benchmarks.fake_servers import start_fake_embedding_server
+        _, embed_url = start_fake_embedding_server(latency=0.0, latency_per_input=0.0)
+        os.environ["OLLAMA_BASE_URL"] = embed_url
+
+    if args.docs:
+        docs_dir, labels = args.docs, load_labels(args.labels)
+    else:
+        from backend.benchmarks.corpus import generate_corpus
+        docs_dir = os.path.join(workdir, "corpus")
+        labels = generate_corpus(docs_dir, products=args.products)
+
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+    from backend.knowledge_base_processor import (
+        get_embeddings, get_document_loader, annotate_documents, make_text_splitter,
+    )
+    from backend.qa_handler import search_with_threshold
+
+    embeddings = get_embeddings()
+    documents = []
+    for name in sorted(os.listdir(docs_dir)):
+        path = os.path.join(docs_dir, name)
+        loader = get_document_loader(path)
+        if loader is not None:
+            documents.extend(annotate_documents(loader.load(), path))
+
+    # 问题向量与分块无关，只计算一次
+    query_vectors, embed_latencies = [], []
+    for label in labels:
+        t0 = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(label["question"]))
+        embed_latencies.append(time.perf_counter() - t0)
+
+    rows = []
+    for chunk_size, overlap in product(_parse_list(args.chunk_sizes, int), _parse_list(args.chunk_overlaps, int)):
+        if overlap >= chunk_size:
+            continue
+        chunks = make_text_splitter(chunk_size, overlap).split_documents(documents)
+        base = FAISS.from_documents(chunks, embeddings)
+        vectors = base.index.reconstruct_n(0, base.index.ntotal).astype(np.float32)
+        for index_type in _parse_list(args.index_types, str):
+            try:
+                index = _build_index(index_type, vectors)
+            except ValueError as e:
+                print(f"跳过 {index_type} (chunk_size={chunk_size}): {e}")
+                continue
+            index_bytes = _index_bytes(index)
+            store = FAISS(
+                embedding_function=embeddings,
+                index=index,
+                docstore=base.docstore,
+                index_to_docstore_id=base.index_to_docstore_id,
+            )
+            for k, threshold in product(_parse_list(args.ks, int), _parse_list(args.thresholds, float)):
+                hits, reciprocal_ranks, latencies = 0, [], []
+                for label, vector in zip(labels, query_vectors):
+                    t0 = time.perf_counter()
+                    results = search_with_threshold(store, vector, k, threshold)
+                    latencies.append(time.perf_counter() - t0)
+                    rank = next((i + 1 for i, (doc, _) in enumerate(results) if _is_hit(doc, label)), None)
+                    hits += rank is not None
+                    reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+                rows.append({
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": overlap,
+                    "index_type": index_type,
+                    "k": k,
+                    "threshold": threshold,
+                    "chunks": len(chunks),
+                    "index_mb": round(index_bytes / 2**20, 3),
+                    "bytes_per_vector": round(index_bytes / max(len(chunks), 1)),
+                    "code_bytes": _code_bytes(index),
+                    "recall_at_k": round(hits / len(labels), 4),
+                    "mrr": round(sum(reciprocal_ranks) / len(labels), 4),
+                    "search_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                    "search_p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                })
+
+    header = ["chunk_size", "chunk_overlap", "index_type", "k", "threshold", "chunks", "bytes_per_vector",
+              "code_bytes", "recall_at_k", "mrr", "search_p50_ms", "search_p95_ms"]
+    lines = [
+        "# 检索评估报告\n",
+        f"- 问题数: {len(labels)}，文档目录: {docs_dir}",
+        f"- 查询嵌入延迟: p50={percentile(embed_latencies, 50) * 1000:.2f}ms "
+        f"p95={percentile(embed_latencies, 95) * 1000:.2f}ms\n",
+        "| " + " | ".join(header) + " |",
+        "|" + "---|" * len(header),
+    ]
+    for row in sorted(rows, key=lambda r: (-r["recall_at_k"], -r["mrr"], r["search_p50_ms"])):
+        lines.append("| " + " | ".join(str(row[h]) for h in header) + " |")
+    report = "\n".join(lines)
+    print(report)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"labels": len(labels), "results": rows}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
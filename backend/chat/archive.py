@@ -0,0 +1,236 @@
+# backend/chat/archive.py
+# 消息冷热分层：最后一条消息早于 ARCHIVE_INACTIVE_DAYS 天的会话，其消息压缩成一行移入 archived_conversations，
+# 并从热表 messages 删除，热表及其索引只保留活跃会话，热词统计 / 管理统计扫描的数据量不再随历史增长。
+# 读取通过 crud.get_messages_by_conversation 透明合并冷热两部分；归档会话收到新消息时新消息写入热表，
+# 再次不活跃后与已归档部分合并重新压缩。消息 id / 时间 / 状态原样保留，归档前后接口返回的内容不变（ETag 无需变化）；
+# messages 表使用 AUTOINCREMENT 主键，归档删除的 id 不会再分配给新消息。
+
+import json
+import time
+import zlib
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend.chat import models
+from backend.database import SessionLocal
+from backend.config import (
+    ARCHIVE_INACTIVE_DAYS, ARCHIVE_INTERVAL_HOURS, ARCHIVE_BATCH_CONVERSATIONS,
+)
+
+logger = logging.getLogger("gadgetguide_ai.chat_archive")
+
+
+def _encode(messages: Iterable[models.Message]) -> bytes:
+    rows = [
+        {"id": m.id, "role": m.role, "content": m.content,
+         "created_at": m.created_at.isoformat() if m.created_at else None, "status": m.status or "complete"}
+        for m in messages
+    ]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def archived_messages(archive: Optional[models.ArchivedConversation]) -> List[models.Message]:
+    """解压冷存储中的消息（未加入数据库会话的 Message 对象，只读）。"""
+    if archive is None:
+        return []
+    rows = json.loads(zlib.decompress(archive.payload).decode("utf-8"))
+    return [
+        models.Message(
+            id=row["id"], conversation_id=archive.conversation_id, role=row["role"], content=row["content"],
+            created_at=datetime.fromisoformat(row["created_at"]) if row["created_at"] else None,
+            status=row["status"],
+        )
+        for row in rows
+    ]
+
+
+def max_archived_message_id(conn) -> int:
+    """冷存储中出现过的最大消息 id（重建 messages 表时计入 AUTOINCREMENT 序列，见 database.ensure_sqlite_autoincrement）。"""
+    high_water = 0
+    for (payload,) in conn.execute(select(models.ArchivedConversation.payload)):
+        rows = json.loads(zlib.decompress(payload).decode("utf-8"))
+        high_water = max([high_water] + [row["id"] for row in rows if row.get("id") is not None])
+    return high_water
+
+
+def max_referenced_conversation_id(conn) -> int:
+    """消息热表 / 冷存储中引用过的最大会话 id（重建 conversations 表时计入 AUTOINCREMENT 序列）。"""
+    hot = conn.execute(select(func.max(models.Message.conversation_id))).scalar() or 0
+    cold = conn.execute(select(func.max(models.ArchivedConversation.conversation_id))).scalar() or 0
+    return max(hot, cold)
+
+
+def find_inactive_conversations(db: Session, cutoff: datetime, limit: int) -> List[int]:
+    """热表中最后一条消息早于 cutoff 的会话 id。"""
+    rows = (
+        db.query(models.Message.conversation_id)
+        .group_by(models.Message.conversation_id)
+        .having(func.max(models.Message.created_at) < cutoff)
+        .limit(limit)
+        .all()
+    )
+    return [conversation_id for conversation_id, in rows]
+
+
+def archive_conversation(db: Session, conversation_id: int,
+                         before: Optional[datetime] = None) -> tuple[int, int, int]:
+    """
+    把会话在热表中（早于 before）的消息并入冷存储（不提交）。只删除本次读取到的消息 id，
+    选出会话后才到达的新消息留在热表，冷存储中的消息总是早于热表中的消息。
+    返回 (归档消息数, 原始字节数, 压缩后字节数)。
+    """
+    query = db.query(models.Message).filter(models.Message.conversation_id == conversation_id)
+    if before is not None:
+        query = query.filter(models.Message.created_at < before)
+    hot = (
+        query
+        .order_by(models.Message.created_at.asc(), models.Message.id.asc())
+        .all()
+    )
+    if not hot:
+        return 0, 0, 0
+    archive = db.get(models.ArchivedConversation, conversation_id)
+    messages = archived_messages(archive) + hot
+    payload = _encode(messages)
+    raw_bytes = sum(len(m.content.encode("utf-8")) for m in hot)
+    if archive is None:
+        archive = models.ArchivedConversation(conversation_id=conversation_id)
+        db.add(archive)
+    archive.payload = payload
+    archive.codec = "zlib"
+    archive.message_count = len(messages)
+    archive.first_message_at = messages[0].created_at
+    archive.last_message_at = messages[-1].created_at
+    archive.archived_at = datetime.utcnow()
+    db.query(models.Message).filter(models.Message.id.in_([m.id for m in hot])).delete(synchronize_session=False)
+    return len(hot), raw_bytes, len(payload)
+
+
+def archive_inactive_conversations(inactive_days: float = ARCHIVE_INACTIVE_DAYS,
+                                   batch_size: int = ARCHIVE_BATCH_CONVERSATIONS) -> dict:
+    """归档所有不活跃会话：每 batch_size 个会话一个事务，避免长时间持有写锁。"""
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=inactive_days)
+    report = {"inactive_days": inactive_days, "conversations": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+    failed: set[int] = set()
+    while True:
+        db = SessionLocal()
+        try:
+            candidates = [
+                cid for cid in find_inactive_conversations(db, cutoff, batch_size + len(failed)) if cid not in failed
+            ][:batch_size]
+            if not candidates:
+                break
+            batch = {"conversations": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+            for conversation_id in candidates:
+                try:
+                    count, raw_bytes, stored_bytes = archive_conversation(db, conversation_id, before=cutoff)
+                except Exception as e:
+                    # 整批回滚，跳过出错的会话后重新选取（本批其余会话在下一轮重新归档）
+                    logger.error(f"归档会话 {conversation_id} 失败: {e}", exc_info=True)
+                    db.rollback()
+                    failed.add(conversation_id)
+                    break
+                batch["conversations"] += 1
+                batch["messages"] += count
+                batch["raw_bytes"] += raw_bytes
+                batch["stored_bytes"] += stored_bytes
+            else:
+                db.commit()
+                for key, value in batch.items():
+                    report[key] += value
+        finally:
+            db.close()
+    report["failed"] = sorted(failed)
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    report["finished_at"] = int(time.time())
+    if report["conversations"]:
+        logger.info(
+            f"已归档 {report['conversations']} 个不活跃会话的 {report['messages']} 条消息"
+            f"（{report['raw_bytes'] / 2**20:.2f}MB → {report['stored_bytes'] / 2**20:.2f}MB），"
+            f"耗时 {report['elapsed_seconds']}s。"
+        )
+    return report
+
+
+def archive_stats(db: Session) -> dict:
+    hot_messages = db.query(func.count(models.Message.id)).scalar()
+    archived = db.query(
+        func.count(models.ArchivedConversation.conversation_id),
+        func.coalesce(func.sum(models.ArchivedConversation.message_count), 0),
+        func.coalesce(func.sum(func.length(models.ArchivedConversation.payload)), 0),
+    ).one()
+    return {
+        "hot_messages": hot_messages,
+        "archived_conversations": archived[0],
+        "archived_messages": int(archived[1]),
+        "archived_mb": round(int(archived[2]) / 2**20, 3),
+    }
+
+
+class ConversationArchiver:
+    """后台定期归档（ARCHIVE_ENABLED=1 时随应用启动）。"""
+
+    def __init__(self, interval_hours: float = ARCHIVE_INTERVAL_HOURS, inactive_days: float = ARCHIVE_INACTIVE_DAYS):
+        self.interval = interval_hours * 3600
+        self.inactive_days = inactive_days
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[dict] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="conversation-archiver", daemon=True)
+            self._thread.start()
+            logger.info(f"会话归档已启动（每 {self.interval / 3600:g} 小时归档 {self.inactive_days:g} 天未活跃的会话）。")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.last_report = archive_inactive_conversations(self.inactive_days)
+            except Exception as e:
+                logger.error(f"归档不活跃会话失败: {e}", exc_info=True)
+            self._stop.wait(self.interval)
+
+    def status(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_hours": self.interval / 3600,
+            "inactive_days": self.inactive_days,
+            "last_report": self.last_report,
+        }
+
+
+_archiver: Optional[ConversationArchiver] = None
+
+
+def start_archiver() -> ConversationArchiver:
+    global _archiver
+    if _archiver is None:
+        _archiver = ConversationArchiver()
+        _archiver.start()
+    return _archiver
+
+
+def stop_archiver():
+    global _archiver
+    if _archiver is not None:
+        _archiver.stop()
+        _archiver = None
+
+
+def archiver_status() -> dict:
+    if _archiver is None:
+        return {"running": False, "last_report": None}
+    return _archiver.status()
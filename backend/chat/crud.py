@@ -3,14 +3,22 @@
 from sqlalchemy.orm import Session
 from backend.chat import models, schemas
 from backend.auth.models import User
+from backend.metrics import stage_timer
+from backend import etags
+from backend.chat import archive as archive_module
+from backend.chat import message_writer
+from backend.config import MESSAGE_GROUP_COMMIT
 from typing import List, Optional
 
 # --- 创建会话 ---
 def create_conversation(db: Session, user: User, title: Optional[str] = None) -> models.Conversation:
-    conversation = models.Conversation(user_id=user.id, title=title)
-    db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
+    with stage_timer("db_create_conversation"):
+        conversation = models.Conversation(user_id=user.id, title=title)
+        db.add(conversation)
+        db.commit()
+        db.refresh(conversation)
+    etags.conversations_changed(user.id)
+    etags.remember_conversation_owner(conversation.id, user.id)
     return conversation
 
 # --- 获取用户的所有会话 ---
@@ -25,13 +33,56 @@ def get_conversation_by_id(db: Session, conversation_id: int, user: User) -> Opt
     ).first()
 
 # --- 创建消息 ---
-def create_message(db: Session, conversation: models.Conversation, role: str, content: str) -> models.Message:
-    message = models.Message(conversation_id=conversation.id, role=role, content=content)
-    db.add(message)
-    db.commit()
-    db.refresh(message)
+def create_message(db: Session, conversation: models.Conversation, role: str, content: str,
+                   status: str = "complete", wait: bool = True) -> Optional[models.Message]:
+    """
+    组提交开启时由后台写线程与其他请求的消息合并提交（见 message_writer 的持久性说明）：
+    wait=True 等待提交后返回已持久化的消息；wait=False 入队即返回 None。
+    """
+    if MESSAGE_GROUP_COMMIT:
+        with stage_timer("db_create_message"):
+            future = message_writer.get_message_writer().submit(
+                conversation.id, conversation.user_id, role, content, status,
+            )
+            return future.result() if wait else None
+    with stage_timer("db_create_message"):
+        message = models.Message(conversation_id=conversation.id, role=role, content=content, status=status)
+        db.add(message)
+        db.commit()
+        db.refresh(message)
+    etags.messages_changed(conversation.id, conversation.user_id)
     return message
 
 # --- 获取某个会话下的所有消息 ---
 def get_messages_by_conversation(db: Session, conversation: models.Conversation) -> List[models.Message]:
-    return db.query(models.Message).filter(models.Message.conversation_id == conversation.id).order_by(models.Message.created_at.asc()).all()
+    return get_messages_by_conversation_id(db, conversation.id)
+
+def get_messages_by_conversation_id(db: Session, conversation_id: int) -> List[models.Message]:
+    """热表中的消息；会话已部分归档时在前面合并冷存储中的消息（冷存储中的消息总是更早）。"""
+    message_writer.wait_for_pending([conversation_id])
+    with stage_timer("db_get_messages"):
+        hot = db.query(models.Message).filter(models.Message.conversation_id == conversation_id).order_by(models.Message.created_at.asc()).all()
+        archive = db.get(models.ArchivedConversation, conversation_id)
+    if archive is None:
+        return hot
+    with stage_timer("db_get_archived_messages"):
+        return archive_module.archived_messages(archive) + hot
+
+# --- 批量获取多个会话的消息（会话列表接口，两次查询代替逐个会话懒加载） ---
+def get_messages_by_conversation_ids(db: Session, conversation_ids: List[int]) -> dict[int, List[models.Message]]:
+    result: dict[int, List[models.Message]] = {cid: [] for cid in conversation_ids}
+    if not conversation_ids:
+        return result
+    message_writer.wait_for_pending(conversation_ids)
+    with stage_timer("db_get_messages"):
+        archives = db.query(models.ArchivedConversation).filter(
+            models.ArchivedConversation.conversation_id.in_(conversation_ids)
+        ).all()
+        hot = db.query(models.Message).filter(
+            models.Message.conversation_id.in_(conversation_ids)
+        ).order_by(models.Message.created_at.asc()).all()
+    for archive in archives:
+        result[archive.conversation_id].extend(archive_module.archived_messages(archive))
+    for message in hot:
+        result[message.conversation_id].append(message)
+    return result
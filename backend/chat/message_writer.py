@@ -0,0 +1,240 @@
+# backend/chat/message_writer.py
+# 聊天消息组提交（MESSAGE_GROUP_COMMIT=1，默认开启）：各请求提交的消息插入进入队列，由一个后台写线程
+# 把队列中已有的消息合并为一次事务提交（一次 fsync），并发越高每次提交合并的消息越多，写入吞吐随负载增长，
+# 而不再受每条消息一次 fsync 的限制；SQLite 的写锁也只由这一个线程争用。
+#
+# 持久性说明：
+# - crud.create_message(wait=True)（用户消息、流式回复）：等待所在批次提交后返回，返回即已持久化，与逐条提交相同；
+# - crud.create_message(wait=False)（非流式 send_message 的 AI 回复，不在响应中返回）：入队即返回，
+#   最迟在当前批次及下一批次提交完成后持久化（通常数毫秒）；进程在此期间崩溃会丢失该条回复
+#   （用户消息已持久化，表现与 AI 调用失败相同）。正常停止时（shutdown）先写完队列中的消息。
+# - 本进程内读己之写：消息读取（crud.get_messages_by_conversation_id、会话 / 消息列表接口）先等待该会话 / 用户
+#   尚未提交的消息写完，再计算 ETag 与查询；多进程部署时其他进程最多晚一个批次看到新消息。
+
+import time
+import queue
+import threading
+import logging
+from collections import Counter
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.chat import models
+from backend.database import engine, connect_args
+from backend.metrics import STAGE_DURATION, MESSAGE_COMMIT_BATCH
+from backend import etags
+from backend.config import MESSAGE_GROUP_COMMIT_MAX_BATCH, MESSAGE_GROUP_COMMIT_WAIT_MS
+
+logger = logging.getLogger("gadgetguide_ai.message_writer")
+
+_BARRIER_TIMEOUT = 10.0  # 读取等待未提交消息的上限（秒），超时后照常读取
+
+
+def _dedicated_session_factory() -> Callable:
+    """
+    写线程独占一个连接（独立的单连接引擎）：请求在等待提交时仍持有共享连接池中的连接，
+    若写线程也从共享池取连接，并发请求数达到池上限时会互相等待直到超时。
+    """
+    writer_engine = create_engine(engine.url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    return sessionmaker(bind=writer_engine, autocommit=False, autoflush=False)
+
+
+def _copy(message: models.Message) -> models.Message:
+    return models.Message(conversation_id=message.conversation_id, role=message.role, content=message.content,
+                          status=message.status, created_at=message.created_at)
+
+
+class ConversationDeleted(LookupError):
+    """消息所属的会话在写入前已被删除。"""
+
+
+def _deleted_error(message: models.Message) -> ConversationDeleted:
+    return ConversationDeleted(f"会话 {message.conversation_id} 已删除，消息未写入")
+
+
+class MessageWriter:
+    """
+    组提交写线程：取出队列中的第一条消息后，把此时已排队的消息（最多 max_batch 条）一并插入并提交；
+    上一次提交期间到达的消息自动归入下一批。max_wait > 0 时第一条到达后再最多等待 max_wait 秒凑批。
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None, max_batch: int = MESSAGE_GROUP_COMMIT_MAX_BATCH,
+                 max_wait: float = MESSAGE_GROUP_COMMIT_WAIT_MS / 1000.0):
+        self._session_factory = session_factory or _dedicated_session_factory()
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self._queue: "queue.Queue[Optional[tuple[models.Message, int, Future]]]" = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending_conversations: Counter = Counter()
+        self._pending_users: Counter = Counter()
+        self._closed = False
+        self.commits = 0
+        self.messages = 0
+        self._thread = threading.Thread(target=self._worker, name="message-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, conversation_id: int, user_id: int, role: str, content: str, status: str = "complete") -> Future:
+        """消息入队，返回 Future（提交后结果为已持久化、脱离数据库会话的 Message）。"""
+        # 创建时间取入队时刻，同一会话内的消息顺序与请求顺序一致
+        message = models.Message(conversation_id=conversation_id, role=role, content=content, status=status,
+                                 created_at=datetime.utcnow())
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("消息写线程已停止")
+            self._pending_conversations[conversation_id] += 1
+            self._pending_users[user_id] += 1
+        self._queue.put((message, user_id, future))
+        return future
+
+    def _wait_until(self, predicate: Callable[[], bool], timeout: Optional[float]) -> bool:
+        with self._cond:
+            return self._cond.wait_for(predicate, timeout)
+
+    def wait_for_conversation(self, conversation_id: int, timeout: Optional[float] = _BARRIER_TIMEOUT) -> bool:
+        return self._wait_until(lambda: not self._pending_conversations.get(conversation_id), timeout)
+
+    def wait_for_user(self, user_id: int, timeout: Optional[float] = _BARRIER_TIMEOUT) -> bool:
+        return self._wait_until(lambda: not self._pending_users.get(user_id), timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self._wait_until(lambda: not self._pending_conversations, timeout)
+
+    def close(self, timeout: float = 10.0):
+        """停止接收新消息，写完队列中已有的消息后退出写线程。"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _worker(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _insert(self, messages: list) -> set:
+        """插入并提交；所属会话已被删除的消息不写入（否则成为孤儿行），返回这些会话的 id。"""
+        db = self._session_factory(expire_on_commit=False)
+        try:
+            conversation_ids = {m.conversation_id for m in messages}
+            existing = {
+                cid for cid, in db.query(models.Conversation.id).filter(models.Conversation.id.in_(conversation_ids))
+            }
+            db.add_all([m for m in messages if m.conversation_id in existing])
+            db.commit()
+            return conversation_ids - existing
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _commit(self, batch: list):
+        started = time.perf_counter()
+        results: list[tuple[models.Message, Optional[Exception]]] = []
+        try:
+            deleted = self._insert([message for message, _, _ in batch])
+            results = [(message, _deleted_error(message) if message.conversation_id in deleted else None)
+                       for message, _, _ in batch]
+        except Exception as e:
+            # 整批失败时逐条重试，只让出错的消息失败
+            logger.warning(f"消息组提交失败（{len(batch)} 条），改为逐条提交: {e}")
+            for message, _, _ in batch:
+                retry = _copy(message)
+                try:
+                    deleted = self._insert([retry])
+                    results.append((retry, _deleted_error(retry) if deleted else None))
+                except Exception as single_error:
+                    results.append((retry, single_error))
+        STAGE_DURATION.observe(time.perf_counter() - started, stage="db_group_commit")
+        MESSAGE_COMMIT_BATCH.observe(len(batch))
+        self.commits += 1
+        self.messages += len(batch)
+
+        # 先更新 ETag 版本号再解除读取等待，等待结束的读取一定能看到新版本
+        for conversation_id, user_id in {(m.conversation_id, uid) for (m, uid, _), (_, err) in zip(batch, results)
+                                         if err is None}:
+            etags.messages_changed(conversation_id, user_id)
+        with self._cond:
+            for message, user_id, _ in batch:
+                self._pending_conversations[message.conversation_id] -= 1
+                if self._pending_conversations[message.conversation_id] <= 0:
+                    del self._pending_conversations[message.conversation_id]
+                self._pending_users[user_id] -= 1
+                if self._pending_users[user_id] <= 0:
+                    del self._pending_users[user_id]
+            self._cond.notify_all()
+        for (_, _, future), (message, error) in zip(batch, results):
+            if error is None:
+                future.set_result(message)
+            else:
+                if isinstance(error, ConversationDeleted):
+                    logger.info(str(error))
+                else:
+                    logger.error(f"写入会话 {message.conversation_id} 的消息失败: {error}")
+                future.set_exception(error)
+
+    def stats(self) -> dict:
+        with self._cond:
+            pending = sum(self._pending_conversations.values())
+        return {
+            "commits": self.commits,
+            "messages": self.messages,
+            "avg_batch_size": round(self.messages / self.commits, 2) if self.commits else 0.0,
+            "pending": pending,
+        }
+
+
+_writer: Optional[MessageWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_message_writer() -> MessageWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = MessageWriter()
+    return _writer
+
+
+def stop_message_writer():
+    """应用停止时调用：写完队列中的消息。"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+        logger.info(f"消息写线程已停止：{writer.stats()}")
+
+
+def wait_for_pending(conversation_ids: Iterable[int] = (), user_id: Optional[int] = None):
+    """读取前等待本进程中这些会话 / 该用户尚未提交的消息写完（未启用组提交或没有待写消息时立即返回）。"""
+    writer = _writer
+    if writer is None:
+        return
+    if user_id is not None:
+        writer.wait_for_user(user_id)
+    for conversation_id in conversation_ids:
+        writer.wait_for_conversation(conversation_id)
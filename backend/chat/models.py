@@ -1,5 +1,5 @@
 # backend/chat/models.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.database import Base
@@ -14,10 +14,20 @@ class Conversation(Base):
 
     # 关联：一对多（一个会话包含多条消息）
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    # 已归档（冷）消息，见 backend/chat/archive.py
+    archive = relationship("ArchivedConversation", back_populates="conversation", uselist=False,
+                           cascade="all, delete-orphan")
 
     # 可选：关联用户（如需反向引用）
     user = relationship("User", back_populates="conversations")
 
+    # 按用户列会话 / 按用户聚合统计；
+    # AUTOINCREMENT：删除会话后其 id 不会分配给新会话（迟到的消息不会出现在别人的新会话里）
+    __table_args__ = (
+        Index("ix_conversations_user_id_created_at", "user_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -26,6 +36,29 @@ class Message(Base):
     role = Column(String(20), nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # "complete"；流式回复中途客户端断开或上游出错时为 "partial"
+    status = Column(String(20), nullable=False, default="complete", server_default="complete")
 
     # 关联：多条消息属于一个会话
     conversation = relationship("Conversation", back_populates="messages")
+
+    # 按会话取消息 / 按会话聚合消息数与最后消息时间；
+    # AUTOINCREMENT：归档会删除 id 最大的行，普通主键会把这些 id 重新分配给新消息（与冷存储中的 id 重复）
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+class ArchivedConversation(Base):
+    """冷存储：不活跃会话的全部已归档消息，压缩为一个 JSON 数组存放（每个会话一行）。"""
+    __tablename__ = "archived_conversations"
+
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), primary_key=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    first_message_at = Column(DateTime, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    codec = Column(String(20), nullable=False, default="zlib")
+    payload = Column(LargeBinary, nullable=False)
+
+    conversation = relationship("Conversation", back_populates="archive")
@@ -1,15 +1,21 @@
 # backend/chat/routes.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from backend.chat import crud, schemas
+from backend.chat import crud, schemas, models, message_writer
 from backend.auth.routes import get_current_user
 from backend.auth.models import User
 from backend.database import SessionLocal
+from backend import etags
+from contextlib import closing
 from typing import List
 
 # === 新增，导入问答核心模块（生成智能回复）===
-from backend.qa_handler import get_final_answer
+from backend.qa_handler import get_final_answer, stream_final_answer
+from backend.llm_backend import LLMError
+from backend.admission import admit_or_429
+from backend.profiling import profiled_request
+from backend.sse import sse_event, admitted_sse_response
 
 router = APIRouter(
     prefix="/chat",
@@ -39,13 +45,28 @@ def create_conversation(
 # === 获取当前用户的所有会话列表 ===
 @router.get("/conversations/", response_model=List[schemas.ConversationOut])
 def list_conversations(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    获取当前用户所有会话，按创建时间排序。
+    获取当前用户所有会话，按创建时间排序。支持 If-None-Match（列表未变化时返回 304）。
     """
-    return crud.get_user_conversations(db, current_user)
+    # 先等待本用户尚未提交的消息写完（组提交），ETag 才反映最新内容
+    message_writer.wait_for_pending(user_id=current_user.id)
+    etag = etags.make_etag("c", current_user.id, etags.versions.version(("conversations", current_user.id)))
+    not_modified = etags.not_modified_or_tag(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    conversations = crud.get_user_conversations(db, current_user)
+    # 消息按会话批量读取（含已归档的冷消息），不再逐个会话懒加载 conversation.messages
+    messages = crud.get_messages_by_conversation_ids(db, [c.id for c in conversations])
+    return [
+        schemas.ConversationOut(id=c.id, title=c.title, created_at=c.created_at,
+                                messages=[schemas.MessageOut.model_validate(m) for m in messages[c.id]])
+        for c in conversations
+    ]
 
 # === 重命名会话 ===
 @router.put("/conversations/{conversation_id}/rename")
@@ -64,6 +85,7 @@ def rename_conversation(
     conversation.title = payload.title
     db.commit()
     db.refresh(conversation)
+    etags.conversations_changed(current_user.id)
     return {"success": True, "new_title": conversation.title}
 
 # === 删除会话 ===
@@ -79,8 +101,11 @@ def delete_conversation(
     conversation = crud.get_conversation_by_id(db, conversation_id, current_user)
     if not conversation:
         raise HTTPException(status_code=404, detail="会话不存在或无权限访问")
+    # 先写完该会话排队中的消息（如未等待提交的 AI 回复），再一并删除
+    message_writer.wait_for_pending([conversation_id])
     db.delete(conversation)
     db.commit()
+    etags.conversation_deleted(conversation_id, current_user.id)
     return {"success": True, "deleted_id": conversation_id}
 
 # === 发送消息并让 AI 回复（多轮上下文拼接）===
@@ -98,40 +123,122 @@ def send_message(
     if not conversation:
         raise HTTPException(status_code=404, detail="会话不存在或无权限访问")
 
-    # 1️⃣ 保存用户消息
-    user_msg = crud.create_message(db, conversation, role=payload.role, content=payload.content)
+    # 准入控制：超出全局/单用户并发上限时直接 429（此时尚未写入用户消息，可安全重试）
+    with admit_or_429(f"user:{current_user.id}"), profiled_request("send_message"):
+        return _reply_in_conversation(db, conversation, payload)
 
-    # 2️⃣ 获取最近 N 条上下文（拼接上下文）
+
+def _build_history_prompt(db: Session, conversation, content: str) -> str:
+    # 获取最近 N 条上下文（拼接上下文）
     previous_msgs = crud.get_messages_by_conversation(db, conversation)
     N = 10
     previous_msgs = previous_msgs[-N:] if len(previous_msgs) > N else previous_msgs
 
     history_context = "\n".join([f"{m.role}: {m.content}" for m in previous_msgs])
-    prompt = f"{history_context}\nuser: {payload.content}"
+    return f"{history_context}\nuser: {content}"
+
+
+def _reply_in_conversation(db: Session, conversation, payload: schemas.MessageCreate):
+    # 1️⃣ 保存用户消息
+    user_msg = crud.create_message(db, conversation, role=payload.role, content=payload.content)
+
+    # 2️⃣ 拼接最近 N 条上下文
+    prompt = _build_history_prompt(db, conversation, payload.content)
 
     # 3️⃣ 调用 AI，生成回复
     try:
-        result = get_final_answer(prompt)
+        # 提示词包含会话历史，不使用跨用户共享的语义答案缓存
+        result = get_final_answer(prompt, use_cache=False)
         ai_content = result.get("answer", "很抱歉，未能获取到明确的回答。")
     except Exception as e:
         ai_content = f"AI内部错误：{str(e)}"
 
-    # 4️⃣ 保存 AI 消息
-    crud.create_message(db, conversation, role="assistant", content=ai_content)
+    # 4️⃣ 保存 AI 消息（不在响应中返回，入队后不等待提交；之后的读取会先等它写完）
+    crud.create_message(db, conversation, role="assistant", content=ai_content, wait=False)
 
     return user_msg
 
-# === 获取会话的所有消息（按时间排序）===
-@router.get("/conversations/{conversation_id}/messages/", response_model=List[schemas.MessageOut])
-def list_messages(
+# === 发送消息并以 SSE 流式推送 AI 回复 ===
+@router.post("/conversations/{conversation_id}/messages/stream")
+def send_message_stream(
     conversation_id: int,
+    payload: schemas.MessageCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    获取指定会话的所有消息，按时间升序返回。
+    与发送消息相同，但 AI 回复以 SSE 逐段推送：
+    event: user_message（已存库的用户消息）→ event: token（回复片段）→ event: done（已存库的 AI 消息）。
+    AI 消息在流结束后存库；客户端中途断开或 AI 服务出错时，已生成部分以 status="partial" 存库。
     """
     conversation = crud.get_conversation_by_id(db, conversation_id, current_user)
     if not conversation:
         raise HTTPException(status_code=404, detail="会话不存在或无权限访问")
-    return crud.get_messages_by_conversation(db, conversation)
+    return admitted_sse_response(f"user:{current_user.id}", lambda: _stream_reply(conversation_id, payload))
+
+
+def _message_payload(message) -> dict:
+    return schemas.MessageOut.model_validate(message).model_dump(mode="json")
+
+
+def _save_reply(db: Session, conversation, parts: List[str], status: str):
+    content = "".join(parts).strip() or "很抱歉，未能获取到明确的回答。"
+    return crud.create_message(db, conversation, role="assistant", content=content, status=status)
+
+
+def _stream_reply(conversation_id: int, payload: schemas.MessageCreate):
+    # 请求级 Session 在响应体开始发送前就已关闭，流式过程使用独立的 Session
+    db = SessionLocal()
+    try:
+        conversation = db.get(models.Conversation, conversation_id)
+        user_msg = crud.create_message(db, conversation, role=payload.role, content=payload.content)
+        prompt = _build_history_prompt(db, conversation, payload.content)
+
+        parts, error = [], None
+        try:
+            yield sse_event("user_message", _message_payload(user_msg))
+            with closing(stream_final_answer(prompt, use_cache=False)) as answer_stream:
+                for delta in answer_stream:
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+        except GeneratorExit:
+            # 客户端断开：上游请求随 answer_stream 关闭而中止，保存已生成的部分
+            _save_reply(db, conversation, parts, status="partial")
+            raise
+        except LLMError as e:
+            error = str(e)
+        except Exception as e:
+            error = f"AI内部错误：{str(e)}"
+
+        ai_msg = _save_reply(db, conversation, parts, status="partial" if error else "complete")
+        if error:
+            yield sse_event("error", {"detail": error, "message": _message_payload(ai_msg)})
+        else:
+            yield sse_event("done", {"message": _message_payload(ai_msg)})
+    finally:
+        db.close()
+
+# === 获取会话的所有消息（按时间排序）===
+@router.get("/conversations/{conversation_id}/messages/", response_model=List[schemas.MessageOut])
+def list_messages(
+    conversation_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取指定会话的所有消息，按时间升序返回。支持 If-None-Match（无新消息时返回 304）。
+    """
+    # 会话归属只查询一次，之后记在内存中；消息版本未变化时不再查询消息表
+    if etags.conversation_owner(conversation_id) != current_user.id:
+        conversation = crud.get_conversation_by_id(db, conversation_id, current_user)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="会话不存在或无权限访问")
+        etags.remember_conversation_owner(conversation_id, current_user.id)
+    message_writer.wait_for_pending([conversation_id])
+    etag = etags.make_etag("m", current_user.id, conversation_id, etags.versions.version(("messages", conversation_id)))
+    not_modified = etags.not_modified_or_tag(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+    return crud.get_messages_by_conversation_id(db, conversation_id)
@@ -13,6 +13,7 @@ class MessageOut(BaseModel):
     role: str
     content: str
     created_at: datetime
+    status: str = "complete"
 
     class Config:
         from_attributes = True  # Pydantic v2: 替代 orm_mode
@@ -0,0 +1,103 @@
+# backend/chunk_metadata.py
+# 片段元数据：来源文件 / 页码 / 产品以结构化元数据保存（不再写入 page_content）；
+# 检索时再渲染来源标注；按向量 id 建立查找表，用于在 FAISS 检索内部按来源过滤
+
+import os
+import re
+import logging
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger("gadgetguide_ai.chunk_metadata")
+
+# 文件名中产品名之后常见的后缀，如 "iPhone 16 Pro - Tech Specs - Apple Support.pdf"、"Pixel_9_技术规格.txt"
+_PRODUCT_SUFFIX_PATTERN = re.compile(r"\s*(?:-\s+.*|[_\s]*(?:技术规格|规格|参数|说明书|Tech Specs).*)$", re.IGNORECASE)
+
+
+def guess_product_name(filename: str) -> str:
+    """从文件名推断产品名（启发式，取扩展名前、" - " 或“技术规格”等后缀之前的部分）。"""
+    stem = Path(filename).stem.replace("_", " ").strip()
+    product = _PRODUCT_SUFFIX_PATTERN.sub("", stem).strip()
+    return product or stem
+
+
+def chunk_source_file(metadata: dict) -> Optional[str]:
+    """片段的来源文件名；兼容旧索引（只有加载器写入的 source 路径）。"""
+    if metadata.get("source_file"):
+        return metadata["source_file"]
+    source = metadata.get("source")
+    return os.path.basename(source) if source else None
+
+
+def render_chunk_header(metadata: dict) -> Optional[str]:
+    """渲染来源标注，格式与旧版写入 page_content 的标注一致（context_packer 依赖该格式）。"""
+    filename = metadata.get("source_file")
+    if not filename:
+        return None
+    page_number = metadata.get("page_number")
+    if page_number is not None:
+        return f"[{filename} - 第{page_number}页]"
+    return f"[来源文件: {filename}]"
+
+
+def render_chunk(doc) -> str:
+    """检索结果转为送入 LLM 的文本：来源标注 + 正文。旧索引的标注已在正文中，原样返回。"""
+    header = render_chunk_header(doc.metadata)
+    return f"{header}\n{doc.page_content}" if header else doc.page_content
+
+
+class ChunkLookup:
+    """
+    向量 id → (来源文件, 页码, 产品) 的查找表（列式 numpy 数组），
+    将来源过滤条件转换为 id 集合，供 FAISS IDSelector 在检索内部过滤。
+    """
+
+    def __init__(self, vector_db):
+        import numpy as np
+
+        size = vector_db.index.ntotal
+        self.sources: list[str] = []
+        self.products: list[str] = []
+        source_codes, product_codes = {}, {}
+        self.source_ids = np.full(size, -1, dtype=np.int32)
+        self.product_ids = np.full(size, -1, dtype=np.int32)
+        self.pages = np.full(size, -1, dtype=np.int32)
+        for position, docstore_id in vector_db.index_to_docstore_id.items():
+            doc = vector_db.docstore.search(docstore_id)
+            metadata = getattr(doc, "metadata", None) or {}
+            source = chunk_source_file(metadata)
+            if source is not None:
+                self.source_ids[position] = source_codes.setdefault(source, len(source_codes))
+            product = metadata.get("product") or (guess_product_name(source) if source else None)
+            if product:
+                self.product_ids[position] = product_codes.setdefault(product, len(product_codes))
+            if metadata.get("page_number") is not None:
+                self.pages[position] = metadata["page_number"]
+            elif metadata.get("page") is not None:
+                self.pages[position] = int(metadata["page"]) + 1
+        self.sources = list(source_codes)
+        self.products = list(product_codes)
+        self._source_codes = source_codes
+        self._product_codes = product_codes
+        logger.info(f"片段查找表已建立：{size} 个片段，{len(self.sources)} 个来源文件，{len(self.products)} 个产品。")
+
+    def ids_matching(
+        self,
+        source_files: Optional[Iterable[str]] = None,
+        pages: Optional[Iterable[int]] = None,
+        products: Optional[Iterable[str]] = None,
+    ):
+        """返回同时满足各条件的向量 id（int64 数组）；同一条件内多个取值为“或”。"""
+        import numpy as np
+
+        mask = np.ones(len(self.source_ids), dtype=bool)
+        if source_files is not None:
+            codes = [self._source_codes[name] for name in source_files if name in self._source_codes]
+            mask &= np.isin(self.source_ids, codes)
+        if pages is not None:
+            mask &= np.isin(self.pages, list(pages))
+        if products is not None:
+            wanted = {p.casefold() for p in products}
+            codes = [code for name, code in self._product_codes.items() if name.casefold() in wanted]
+            mask &= np.isin(self.product_ids, codes)
+        return np.nonzero(mask)[0].astype(np.int64)
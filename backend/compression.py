@@ -0,0 +1,71 @@
+# backend/compression.py
+# 响应压缩：不小于 minimum_size 的响应按 Accept-Encoding 压缩；安装了 brotli 时优先使用 br，否则 gzip。
+# SSE（text/event-stream）等类型不压缩，流式回复的逐段推送不受影响。
+
+import logging
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+
+logger = logging.getLogger("gadgetguide_ai.compression")
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：pip install brotli
+    brotli = None
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """解析 Accept-Encoding，返回 q > 0 的编码名。"""
+    accepted = set()
+    for item in header.split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.lower())
+    return accepted
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """在 Starlette GZipMiddleware 的基础上增加 br（客户端接受且已安装 brotli 时优先）。"""
+
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 6, brotli_quality: int = 5):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.brotli_quality = brotli_quality
+        logger.debug(f"响应压缩已启用：{'br / ' if brotli else ''}gzip，最小 {minimum_size} 字节。")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        options = {"exclude_content_types": self.exclude_content_types}
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality, **options)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size, **options)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, **options)
+        await responder(scope, receive, send)
@@ -13,6 +13,16 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 天
 
+# --- 密码哈希配置 ---
+# bcrypt 计算代价（log2 轮数）；修改后旧哈希会在用户下次登录时自动按新代价重算
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 专用哈希线程池大小，与 FastAPI 默认线程池（聊天/问答等同步接口）隔离
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 排队中的哈希任务上限，超出后直接拒绝，避免登录洪峰无限堆积
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+# 登录/注册数据库操作的专用线程池大小，默认线程池被等待 LLM 的请求占满时登录仍可及时完成
+AUTH_DB_WORKERS = int(os.getenv("AUTH_DB_WORKERS", "4"))
+
 # --- BASE_DIR 配置 ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'users.db')}"
@@ -26,6 +36,52 @@ else:
     logger.warning("Value of DEEPSEEK_API_KEY loaded by os.getenv is: None. API Key is MISSING or not loaded correctly.")
 logger.debug(f"--- End of API Key check in config.py ---")
 
+# --- LLM 服务配置（OpenAI 兼容接口，默认 DeepSeek） ---
+LLM_API_URL = os.getenv("LLM_API_URL", "https://api.deepseek.com/v1/chat/completions")
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "deepseek-chat")
+LLM_API_KEY = os.getenv("LLM_API_KEY", DEEPSEEK_API_KEY)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))    # 秒
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))         # 秒
+# 熔断：连续失败达到阈值后，在冷却时间内直接快速失败
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# 可选的备用端点：主端点超过历史延迟分位数仍未返回时发起对冲请求，主端点失败时也会切换过去
+LLM_SECONDARY_API_URL = os.getenv("LLM_SECONDARY_API_URL")
+LLM_SECONDARY_MODEL_NAME = os.getenv("LLM_SECONDARY_MODEL_NAME", LLM_MODEL_NAME)
+LLM_SECONDARY_API_KEY = os.getenv("LLM_SECONDARY_API_KEY", LLM_API_KEY)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))    # 秒，历史样本不足时使用
+logger.debug(f"LLM endpoint: {LLM_API_URL} (model: {LLM_MODEL_NAME}), secondary: {LLM_SECONDARY_API_URL}")
+
+# --- 问答准入控制 ---
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))  # 全局同时执行的问答请求数
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "2"))     # 单用户执行中 + 排队中的上限
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))          # 等待队列长度
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))  # 秒，排队超时即返回 429
+# 可信反向代理地址（逗号分隔）：来自这些地址的匿名请求按 X-Forwarded-For 中的真实客户端 IP 计入单用户上限，
+# 否则所有经代理的匿名请求会共用代理 IP 这一个名额
+TRUSTED_PROXIES = frozenset(ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "").split(",") if ip.strip())
+
+# --- 批量问答 ---
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))        # 单次批量请求的问题数上限
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))   # 单个批次同时进行的 LLM 调用数
+
+# --- 响应压缩 ---
+# 不小于该字节数的响应按 Accept-Encoding 压缩（gzip；安装 brotli 后优先 br），0 表示不压缩
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+
+# --- 在线性能剖析（管理员按需开启，未开启时无采样线程、不追踪内存分配） ---
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))  # 默认采样间隔
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))              # 单次剖析的最长时间
+PROFILE_MAX_STACK_DEPTH = int(os.getenv("PROFILE_MAX_STACK_DEPTH", "128"))        # 每个调用栈保留的最深帧数
+
+# --- 语义答案缓存 ---
+# 新问题与已回答问题的向量余弦相似度不低于阈值（且识别出的产品相同）时直接复用答案；知识库索引重新加载后清空
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))   # 超出后按 LRU 淘汰
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))  # 0 表示不过期
+
 # --- 数据库配置 ---
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'users.db')}")
 if "sqlite" in DATABASE_URL:
@@ -33,17 +89,53 @@ if "sqlite" in DATABASE_URL:
 else:
     logger.debug(f"Using external database (e.g., MySQL/PostgreSQL): {DATABASE_URL}")
 
+# --- 消息冷热分层 ---
+# 最后一条消息早于 N 天的会话，其消息压缩后移入 archived_conversations 冷表，热表 messages 只保留活跃会话
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "0") == "1"                  # 随应用启动后台定期归档
+ARCHIVE_INACTIVE_DAYS = float(os.getenv("ARCHIVE_INACTIVE_DAYS", "90"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "6"))
+ARCHIVE_BATCH_CONVERSATIONS = int(os.getenv("ARCHIVE_BATCH_CONVERSATIONS", "200"))  # 每个事务归档的会话数
+
+# --- 聊天消息组提交 ---
+# 并发请求的消息插入由后台写线程合并为一次事务提交（一次 fsync），0 表示每条消息单独提交
+MESSAGE_GROUP_COMMIT = os.getenv("MESSAGE_GROUP_COMMIT", "1") == "1"
+MESSAGE_GROUP_COMMIT_MAX_BATCH = int(os.getenv("MESSAGE_GROUP_COMMIT_MAX_BATCH", "256"))   # 单次提交的最大消息数
+MESSAGE_GROUP_COMMIT_WAIT_MS = float(os.getenv("MESSAGE_GROUP_COMMIT_WAIT_MS", "0"))      # 凑批额外等待；0 只合并提交期间到达的消息
+
 # --- Ollama 配置 ---
 OLLAMA_EMBEDDING_MODEL = "bge-m3"
-logger.debug(f"Ollama embedding model set to: {OLLAMA_EMBEDDING_MODEL}")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+logger.debug(f"Ollama embedding model set to: {OLLAMA_EMBEDDING_MODEL} ({OLLAMA_BASE_URL})")
+# 嵌入服务提供方：ollama（HTTP 调用 Ollama）/ onnx（进程内 CPU 推理导出的 bge-m3，需安装 onnxruntime 与 tokenizers）
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "ollama").strip().lower()
+EMBEDDING_ONNX_MODEL_DIR = os.getenv("EMBEDDING_ONNX_MODEL_DIR", os.path.join(BASE_DIR, "models", "bge-m3-onnx"))
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))      # 推理线程数，0 表示 onnxruntime 默认（物理核数）
+EMBEDDING_MAX_LENGTH = int(os.getenv("EMBEDDING_MAX_LENGTH", "512"))        # token 截断长度
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))         # 单次推理的最大条数
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "0"))  # 凑批额外等待；0 只合并推理期间到达的查询
+logger.debug(f"Embedding provider: {EMBEDDING_PROVIDER}")
 
 # --- 路径配置 ---
-UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
-FAISS_INDEX_PATH = os.path.join(BASE_DIR, "faiss_index")
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(BASE_DIR, "uploads"))
+FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", os.path.join(BASE_DIR, "faiss_index"))
 
 logger.debug(f"BASE_DIR set to: {BASE_DIR}")
 logger.debug(f"UPLOAD_FOLDER set to: {UPLOAD_FOLDER}")
 logger.debug(f"FAISS_INDEX_PATH set to: {FAISS_INDEX_PATH}")
+# 其他知识库集合的根目录：每个集合为 COLLECTIONS_ROOT/<集合名>/{uploads,faiss_index}
+COLLECTIONS_ROOT = os.getenv("COLLECTIONS_ROOT", os.path.join(BASE_DIR, "collections"))
+# 同时载入内存的索引总大小上限（按索引目录文件大小估计），超出后按 LRU 淘汰
+COLLECTION_MEMORY_BUDGET_MB = float(os.getenv("COLLECTION_MEMORY_BUDGET_MB", "2048"))
+logger.debug(f"COLLECTIONS_ROOT set to: {COLLECTIONS_ROOT}")
+# 删除文件后，已删除向量占比达到该值时在后台压缩索引（0 表示只手动压缩）
+COMPACTION_DEAD_RATIO = float(os.getenv("COMPACTION_DEAD_RATIO", "0.2"))
+# 上传目录监视：定期扫描各集合上传目录，把直接放入 / 修改 / 删除的文件增量应用到索引（默认关闭）
+UPLOAD_WATCH_ENABLED = os.getenv("UPLOAD_WATCH_ENABLED", "0") == "1"
+UPLOAD_WATCH_INTERVAL_SECONDS = float(os.getenv("UPLOAD_WATCH_INTERVAL_SECONDS", "2"))
+UPLOAD_WATCH_DEBOUNCE_SECONDS = float(os.getenv("UPLOAD_WATCH_DEBOUNCE_SECONDS", "3"))  # 目录静默多久后应用一批变化
+UPLOAD_WATCH_RETRY_SECONDS = float(os.getenv("UPLOAD_WATCH_RETRY_SECONDS", "30"))       # 入库失败的文件多久后重试
+# jieba 前缀词典缓存（见 segmenter.py）
+JIEBA_CACHE_PATH = os.getenv("JIEBA_CACHE_PATH", os.path.join(BASE_DIR, "jieba_dict.cache"))
 
 # --- 确保路径存在 ---
 try:
@@ -53,10 +145,29 @@ try:
 except OSError as e:
     logger.error(f"Error creating directories UPLOAD_FOLDER or FAISS_INDEX_PATH: {e}", exc_info=True)
 
+# --- 向量存储格式 ---
+# flat（float32，默认）/ fp16 / sq8（8 bit 标量量化），可加 pcaN+ 前缀先用 PCA 降到 N 维，如 pca256+sq8。
+# 修改后在下次建索引 / 增量更新时自动转换已有索引。
+FAISS_VECTOR_ENCODING = os.getenv("FAISS_VECTOR_ENCODING", "flat")
+logger.debug(f"FAISS_VECTOR_ENCODING set to: {FAISS_VECTOR_ENCODING}")
+
 # --- 文本分割参数 ---
 CHUNK_SIZE = 350
 CHUNK_OVERLAP = 70
 logger.debug(f"CHUNK_SIZE set to: {CHUNK_SIZE}")
 logger.debug(f"CHUNK_OVERLAP set to: {CHUNK_OVERLAP}")
 
+# --- 文档入库（流式）参数 ---
+# 文档逐页（TXT 按段落边界分块）读取、分割，每凑满 INGEST_BATCH_CHUNKS 个片段即嵌入并追加到索引。
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "64"))
+INGEST_TEXT_BLOCK_CHARS = int(os.getenv("INGEST_TEXT_BLOCK_CHARS", "200000"))
+# 入库进程常驻内存（RSS）上限，超出则中止本次入库、磁盘上的索引保持不变；0 表示不限制
+INGEST_MEMORY_CEILING_MB = float(os.getenv("INGEST_MEMORY_CEILING_MB", "4096"))
+
+# --- 上下文打包参数 ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1800"))  # 送入 LLM 的参考信息 token 上限
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))     # 1.0 只看相关度，越小越强调多样性
+CONTEXT_MIN_OVERLAP = 20                                               # 判定相邻片段重叠的最小字符数
+logger.debug(f"CONTEXT_TOKEN_BUDGET set to: {CONTEXT_TOKEN_BUDGET}")
+
 logger.info("Configuration from config.py loaded.")
@@ -0,0 +1,158 @@
+# backend/context_packer.py
+# 上下文打包：合并重叠的相邻片段、去除重复来源标注、MMR 多样性筛选并按 token 预算裁剪
+
+import re
+import math
+import logging
+from typing import List, Optional, Tuple
+
+from .config import CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_LAMBDA, CONTEXT_MIN_OVERLAP
+
+logger = logging.getLogger("gadgetguide_ai.context_packer")
+
+# 与 chunk_metadata.render_chunk_header 渲染的来源标注格式对应（旧索引中标注直接写在正文里，格式相同）
+_HEADER_PATTERN = re.compile(r"^\[(?:.+? - 第\d+页|来源文件: .+?)\]\n")
+_CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算 token 数：中文按字计，英文/数字按词 ×1.3，其余符号按 0.5 计；
+    长的字母数字串（URL、型号、base64 等）按每 4 个字符一个 token 计，不再整串只算一个词。
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    words = _WORD_PATTERN.findall(text)
+    word_chars = sum(len(w) for w in words)
+    word_tokens = sum(max(1.3, len(w) / 4) for w in words)
+    others = len(text) - cjk - word_chars - text.count(" ")
+    return cjk + math.ceil(word_tokens) + math.ceil(max(others, 0) * 0.5)
+
+
+def split_header(chunk: str) -> Tuple[Optional[str], str]:
+    """拆分片段开头的来源标注，返回 (标注, 正文)。"""
+    match = _HEADER_PATTERN.match(chunk)
+    if not match:
+        return None, chunk
+    return match.group(0).strip(), chunk[match.end():]
+
+
+def _overlap_length(left: str, right: str, min_overlap: int) -> int:
+    """left 的后缀与 right 的前缀重合的最大长度（小于 min_overlap 视为不重叠）。"""
+    for size in range(min(len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_overlapping(chunks: List[str], min_overlap: int = CONTEXT_MIN_OVERLAP) -> List[str]:
+    """
+    合并因 CHUNK_OVERLAP 产生重复文本的相邻片段，并丢弃被其他片段完整包含的片段。
+    合并结果占据前半段片段在列表中的位置。
+    """
+    items = [split_header(c) for c in chunks]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(items)):
+            for j in range(len(items)):
+                if i == j:
+                    continue
+                header_i, body_i = items[i]
+                header_j, body_j = items[j]
+                # 已被完整包含（且来源标注不冲突）
+                if len(body_j) >= min_overlap and body_j in body_i and header_j in (None, header_i):
+                    del items[j]
+                    merged = True
+                    break
+                # 后一片段是前一片段的续写：不带页标注（旧索引，只有每页首个片段带标注）
+                # 或与前一片段来源标注相同（新索引，每个片段都按元数据渲染标注）
+                if header_j in (None, header_i):
+                    size = _overlap_length(body_i, body_j, min_overlap)
+                    if size:
+                        items[i] = (header_i, body_i + body_j[size:])
+                        del items[j]
+                        merged = True
+                        break
+            if merged:
+                break
+    return [f"{h}\n{b}" if h else b for h, b in items]
+
+
+def _bigrams(text: str) -> set:
+    text = re.sub(r"\s+", "", text.lower())
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _truncate_to_budget(text: str, budget: int) -> str:
+    if estimate_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def pack_context(
+    chunks: List[str],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+) -> List[str]:
+    """
+    将检索片段（按相关度降序）打包为送入 LLM 的上下文：
+    1. 合并重叠的相邻片段；
+    2. MMR：在相关度（按检索排名）与已选片段的相似度（字符二元组 Jaccard）间取舍；
+    3. 在 token 预算内贪心选取，首个片段超预算时截断；
+    4. 按原始排名输出，连续相同的来源标注只保留一次。
+    """
+    if not chunks:
+        return []
+    candidates = merge_overlapping(chunks)
+    count = len(candidates)
+    relevance = [1.0 - i / count for i in range(count)]
+    grams = [_bigrams(c) for c in candidates]
+    costs = [estimate_tokens(c) for c in candidates]
+
+    selected: List[int] = []
+    remaining = set(range(count))
+    used = 0
+    while remaining and used < token_budget:
+        def mmr(i: int) -> float:
+            redundancy = max((_similarity(grams[i], grams[j]) for j in selected), default=0.0)
+            return mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy
+
+        best = max(remaining, key=mmr)
+        remaining.discard(best)
+        if used + costs[best] <= token_budget:
+            selected.append(best)
+            used += costs[best]
+        elif not selected:
+            candidates[best] = _truncate_to_budget(candidates[best], token_budget)
+            selected.append(best)
+            used = token_budget
+
+    packed = []
+    last_header = None
+    for i in sorted(selected):
+        header, body = split_header(candidates[i])
+        if header and header == last_header:
+            packed.append(body)
+        else:
+            packed.append(candidates[i])
+        last_header = header
+
+    logger.info(
+        f"pack_context: {len(chunks)} 个片段 -> {len(packed)} 个，"
+        f"约 {sum(estimate_tokens(c) for c in chunks)} -> {used} tokens（预算 {token_budget}）"
+    )
+    return packed
@@ -1,6 +1,9 @@
 # backend/database.py
 
-from sqlalchemy import create_engine
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.orm import sessionmaker, declarative_base
 from backend.config import DATABASE_URL, logger
 
@@ -25,4 +28,90 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # --- 创建模型继承的基础类 ---
 Base = declarative_base()
 
+# --- 为已存在的表补加新增列（create_all 不会修改已存在的表；新增列须可为空或带 server_default） ---
+def ensure_columns():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+# --- 为已存在的表补建索引（create_all 只会在建表时创建索引） ---
+def ensure_indexes():
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    logger.debug("Database indexes ensured.")
+
+# --- SQLite：声明了 sqlite_autoincrement 的已存在表重建为 AUTOINCREMENT 主键（create_all 不会修改已存在的表） ---
+# 普通 INTEGER PRIMARY KEY 在删除最大 id 的行后会重新分配该 id；AUTOINCREMENT 表的 id 只增不减。
+# reserve: {表名: 函数(conn) -> 已在表外使用过的最大 id}，重建时一并计入 sqlite_sequence，保证这些 id 不再分配。
+def ensure_sqlite_autoincrement(reserve: Optional[Dict[str, Callable]] = None) -> List[str]:
+    if engine.dialect.name != "sqlite":
+        return []
+    reserve = reserve or {}
+    rebuilt = []
+    with engine.connect() as conn:
+        # pysqlite 不会为 DDL 开启事务，改为手动 BEGIN / COMMIT，重建失败时整体回滚
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in Base.metadata.sorted_tables:
+            if not table.dialect_options["sqlite"]["autoincrement"]:
+                continue
+            ddl = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar()
+            if ddl is None or "AUTOINCREMENT" in ddl.upper():
+                continue
+            new_name = f"{table.name}__new"
+            columns = ", ".join(
+                column["name"] for column in inspect(conn).get_columns(table.name) if column["name"] in table.columns
+            )
+            # 按模型生成建表语句，表名换成临时名（不能先改名旧表：其他表指向它的外键会随之改名）
+            create_ddl = str(CreateTable(table).compile(dialect=engine.dialect)).strip()
+            create_ddl = create_ddl.replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {new_name} (", 1)
+            conn.exec_driver_sql("BEGIN")
+            try:
+                # 先删除旧表的索引，新表改名后按模型重建同名索引
+                for (index_name,) in conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"),
+                    {"name": table.name},
+                ).fetchall():
+                    conn.exec_driver_sql(f"DROP INDEX {index_name}")
+                conn.exec_driver_sql(create_ddl)
+                conn.exec_driver_sql(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}")
+                conn.exec_driver_sql(f"DROP TABLE {table.name}")
+                conn.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {table.name}")
+                for index in table.indexes:
+                    index.create(bind=conn)
+                if table.name in reserve:
+                    high_water = reserve[table.name](conn) or 0
+                    current = conn.execute(
+                        text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": table.name}
+                    ).scalar()
+                    if current is None:
+                        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                                     {"name": table.name, "seq": high_water})
+                    elif high_water > current:
+                        conn.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"),
+                                     {"name": table.name, "seq": high_water})
+                conn.exec_driver_sql("COMMIT")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                logger.error(f"Failed to rebuild {table.name} with AUTOINCREMENT", exc_info=True)
+                raise
+            rebuilt.append(table.name)
+            logger.info(f"Rebuilt {table.name} with AUTOINCREMENT primary key")
+    return rebuilt
+
 logger.debug("--- database.py loaded successfully ---")
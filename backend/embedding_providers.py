@@ -0,0 +1,177 @@
+# backend/embedding_providers.py
+# 嵌入服务提供方（EMBEDDING_PROVIDER）：
+# - ollama（默认）：经 HTTP 调用 Ollama 服务中的 bge-m3；
+# - onnx：进程内 CPU 推理（onnxruntime + tokenizers 加载导出的 bge-m3 ONNX 模型），省去网络往返与 JSON 序列化，
+#   无需 Ollama 旁车进程。并发的单条查询嵌入由动态批处理合并为一次推理。
+# 本模块由 knowledge_base_processor.get_embeddings 按需导入；onnxruntime / tokenizers 只在选用 onnx 时导入（可选依赖）。
+
+import os
+import time
+import asyncio
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .config import (
+    EMBEDDING_PROVIDER, OLLAMA_EMBEDDING_MODEL, OLLAMA_BASE_URL, EMBEDDING_ONNX_MODEL_DIR,
+    EMBEDDING_ONNX_THREADS, EMBEDDING_MAX_LENGTH, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WAIT_MS,
+)
+
+logger = logging.getLogger("gadgetguide_ai.embedding_providers")
+
+
+class DynamicBatcher:
+    """
+    把多个线程各自提交的单条输入合并成批，由后台线程一次调用 run_batch(输入列表) -> 输出列表，再分发结果。
+    上一批推理期间到达的输入自动归入下一批（空闲时单条请求不额外等待）；max_wait > 0 时
+    第一条到达后再最多等待 max_wait 秒凑批（提高吞吐，代价是增加单条延迟）。
+    """
+
+    def __init__(self, run_batch: Callable[[list], list], max_batch: int, max_wait: float, name: str = "batcher"):
+        self._run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self._queue: "queue.Queue[tuple[object, Future]]" = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        threading.Thread(target=self._worker, name=name, daemon=True).start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _worker(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    pending.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.batches += 1
+            self.items += len(pending)
+            try:
+                results = self._run_batch([item for item, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    LangChain Embeddings 兼容的进程内 bge-m3 推理：取 [CLS] 向量并 L2 归一化（与 bge-m3 稠密向量一致）。
+    model_dir 中需有 model.onnx 与 tokenizer.json，例如：
+        optimum-cli export onnx --model BAAI/bge-m3 --task feature-extraction backend/models/bge-m3-onnx
+    """
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_MODEL_DIR, threads: int = EMBEDDING_ONNX_THREADS,
+                 max_length: int = EMBEDDING_MAX_LENGTH, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 batch_wait_ms: float = EMBEDDING_BATCH_WAIT_MS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, "model.onnx")
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX 嵌入模型文件不存在: {path}（见 EMBEDDING_ONNX_MODEL_DIR）")
+
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        started = time.perf_counter()
+        self._session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        output_names = [o.name for o in self._session.get_outputs()]
+        # 优先使用导出时已池化的稠密向量输出，否则取第一个输出（last_hidden_state）的 [CLS]
+        self._output_name = next((n for n in ("dense_vecs", "sentence_embedding") if n in output_names), output_names[0])
+
+        self._tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+        self.batch_size = max(1, batch_size)
+        self._query_batcher = DynamicBatcher(
+            self._embed_batch, self.batch_size, batch_wait_ms / 1000.0, name="onnx-embed-batcher",
+        )
+        logger.info(
+            f"ONNX 嵌入模型已加载: {model_path}（线程数 {threads or '默认'}，输出 {self._output_name}，"
+            f"耗时 {time.perf_counter() - started:.1f}s）"
+        )
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.asarray([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+        output = self._session.run([self._output_name], feeds)[0]
+        vectors = output[:, 0] if output.ndim == 3 else output
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """按长度排序后分批推理（同批文本长度接近，padding 更少），结果按原顺序返回。"""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                results[i] = vector
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._query_batcher(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._query_batcher.submit(text))
+
+    def stats(self) -> dict:
+        return {"provider": "onnx", "query_batching": self._query_batcher.stats()}
+
+
+@lru_cache(maxsize=1)
+def _onnx_embeddings() -> OnnxEmbeddings:
+    # 模型只加载一次，所有集合共用
+    return OnnxEmbeddings()
+
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER) -> Embeddings:
+    """按 EMBEDDING_PROVIDER 构建嵌入客户端（ollama / onnx）。"""
+    provider = provider.strip().lower()
+    if provider == "onnx":
+        return _onnx_embeddings()
+    if provider == "ollama":
+        from langchain_ollama import OllamaEmbeddings
+        return OllamaEmbeddings(model=OLLAMA_EMBEDDING_MODEL, base_url=OLLAMA_BASE_URL)
+    raise ValueError(f"未知的嵌入服务提供方: {provider}（可选 ollama / onnx）")
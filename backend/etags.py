@@ -0,0 +1,95 @@
+# backend/etags.py
+# 列表接口的条件请求：ETag 由进程内的版本号生成，写入（新建 / 重命名 / 删除会话、新消息、上传 / 删除文件）时递增。
+# 请求带的 If-None-Match 与当前版本一致时直接返回 304，不再查询消息 / 会话或扫描上传目录。
+# 版本号只在本进程内有效：ETag 含进程启动时生成的纪元，重启后旧 ETag 全部失效（客户端重新拉取一次）。
+
+import secrets
+import threading
+from typing import Hashable, Optional
+
+from fastapi import Request, Response
+
+_EPOCH = secrets.token_hex(4)
+
+
+class VersionRegistry:
+    """按键（如 ("messages", 会话 id)）维护单调递增的版本号。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: dict[Hashable, int] = {}
+
+    def version(self, key: Hashable) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def bump(self, key: Hashable):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._versions.pop(key, None)
+
+
+versions = VersionRegistry()
+
+# 会话 id -> 所属用户 id：只有确认过归属的会话才允许 304（避免用伪造的 ETag 探测他人会话）
+_conversation_owners: dict[int, int] = {}
+_owners_lock = threading.Lock()
+
+
+def remember_conversation_owner(conversation_id: int, user_id: int):
+    with _owners_lock:
+        _conversation_owners[conversation_id] = user_id
+
+
+def conversation_owner(conversation_id: int) -> Optional[int]:
+    with _owners_lock:
+        return _conversation_owners.get(conversation_id)
+
+
+def conversations_changed(user_id: int):
+    """用户的会话列表（含各会话消息）发生变化。"""
+    versions.bump(("conversations", user_id))
+
+
+def messages_changed(conversation_id: int, user_id: int):
+    versions.bump(("messages", conversation_id))
+    conversations_changed(user_id)
+
+
+def conversation_deleted(conversation_id: int, user_id: int):
+    versions.bump(("messages", conversation_id))
+    conversations_changed(user_id)
+    with _owners_lock:
+        _conversation_owners.pop(conversation_id, None)
+
+
+def uploads_changed(collection: str):
+    versions.bump(("uploads", collection))
+
+
+def make_etag(*parts) -> str:
+    """弱 ETag：内容等价即可（压缩前后、JSON 序列化细节不影响）。"""
+    return 'W/"' + "-".join(str(p) for p in (_EPOCH, *parts)) + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # 弱比较：忽略 W/ 前缀（GZip 等中间层可能改写强 / 弱标记）
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified_or_tag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """If-None-Match 命中时返回 304 响应；否则把 ETag 写入即将返回的响应并返回 None。"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
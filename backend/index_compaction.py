@@ -0,0 +1,68 @@
+# backend/index_compaction.py
+# 索引压缩调度：删除文件只写墓碑，已删除向量占比超过 COMPACTION_DEAD_RATIO 时在后台线程中压缩索引，
+# 完成后重新加载（可检索内容不变，不清空语义缓存）；管理员也可手动触发。
+
+import threading
+import logging
+from typing import Optional
+
+from .knowledge_base_processor import compact_index
+from .qa_handler import get_vector_db, reload_vector_db, dead_vector_count
+from .config import COMPACTION_DEAD_RATIO
+
+logger = logging.getLogger("gadgetguide_ai.index_compaction")
+
+_running: set[str] = set()
+_last_reports: dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+def dead_ratio(collection: str) -> float:
+    db = get_vector_db(collection)
+    if db is None or db.index.ntotal == 0:
+        return 0.0
+    return dead_vector_count(db) / db.index.ntotal
+
+
+def compact_collection(collection: str) -> Optional[dict]:
+    """压缩集合索引并重新加载，返回压缩报告；该集合已在压缩中时返回 None。"""
+    with _lock:
+        if collection in _running:
+            return None
+        _running.add(collection)
+    try:
+        report = compact_index(collection)
+        if report["compacted"]:
+            reload_vector_db(collection, content_changed=False)
+        with _lock:
+            _last_reports[collection] = report
+        return report
+    finally:
+        with _lock:
+            _running.discard(collection)
+
+
+def _compact_quietly(collection: str):
+    try:
+        compact_collection(collection)
+    except Exception as e:
+        logger.error(f"集合 '{collection}' 后台压缩失败: {e}", exc_info=True)
+
+
+def maybe_compact_in_background(collection: str) -> bool:
+    """已删除向量占比达到阈值时启动后台压缩，返回是否已启动。"""
+    if COMPACTION_DEAD_RATIO <= 0:
+        return False
+    ratio = dead_ratio(collection)
+    if ratio < COMPACTION_DEAD_RATIO:
+        return False
+    logger.info(f"集合 '{collection}' 已删除向量占比 {ratio:.1%}，启动后台压缩。")
+    threading.Thread(target=_compact_quietly, args=(collection,), name=f"compact-{collection}", daemon=True).start()
+    return True
+
+
+def compaction_status(collection: str) -> dict:
+    with _lock:
+        running = collection in _running
+        last_report = _last_reports.get(collection)
+    return {"running": running, "dead_ratio": round(dead_ratio(collection), 4), "last_report": last_report}
@@ -0,0 +1,175 @@
+# backend/kb_collections.py
+# 知识库集合：每个集合有独立的上传目录与索引目录（索引目录中的 processed_files.json 为其文件清单）；
+# 默认集合沿用 UPLOAD_FOLDER / FAISS_INDEX_PATH。已加载的索引放在按内存预算淘汰的 LRU 中。
+
+import os
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Callable, Generic, Optional, TypeVar
+
+from .config import UPLOAD_FOLDER, FAISS_INDEX_PATH, COLLECTIONS_ROOT
+
+logger = logging.getLogger("gadgetguide_ai.kb_collections")
+
+DEFAULT_COLLECTION = "default"
+_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_\-]{0,63}")
+
+
+class InvalidCollectionName(ValueError):
+    pass
+
+
+def validate_collection_name(name: str) -> str:
+    """集合名只允许字母、数字、下划线与连字符（同时用作目录名）。"""
+    if not name or not _NAME_PATTERN.fullmatch(name):
+        raise InvalidCollectionName(f"非法的集合名: {name!r}（只允许字母、数字、_ 与 -，最长 64 个字符）")
+    return name
+
+
+def collection_upload_folder(name: str = DEFAULT_COLLECTION) -> str:
+    if validate_collection_name(name) == DEFAULT_COLLECTION:
+        return UPLOAD_FOLDER
+    return os.path.join(COLLECTIONS_ROOT, name, "uploads")
+
+
+def collection_index_path(name: str = DEFAULT_COLLECTION) -> str:
+    if validate_collection_name(name) == DEFAULT_COLLECTION:
+        return FAISS_INDEX_PATH
+    return os.path.join(COLLECTIONS_ROOT, name, "faiss_index")
+
+
+def ensure_collection(name: str):
+    """创建集合的上传目录与索引目录（已存在时不做任何事）。"""
+    os.makedirs(collection_upload_folder(name), exist_ok=True)
+    os.makedirs(collection_index_path(name), exist_ok=True)
+
+
+def collection_exists(name: str) -> bool:
+    return name == DEFAULT_COLLECTION or os.path.isdir(collection_upload_folder(name))
+
+
+def list_collections() -> list[str]:
+    names = [DEFAULT_COLLECTION]
+    if os.path.isdir(COLLECTIONS_ROOT):
+        names.extend(sorted(
+            entry for entry in os.listdir(COLLECTIONS_ROOT)
+            if entry != DEFAULT_COLLECTION and _NAME_PATTERN.fullmatch(entry)
+            and os.path.isdir(os.path.join(COLLECTIONS_ROOT, entry))
+        ))
+    return names
+
+
+_write_locks: dict[str, threading.Lock] = {}
+_swap_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def index_write_lock(name: str) -> threading.Lock:
+    """集合索引的写锁：建索引 / 增量添加、删除文件（墓碑）与压缩互斥执行。"""
+    with _locks_guard:
+        return _write_locks.setdefault(name, threading.Lock())
+
+
+def index_swap_lock(name: str) -> threading.Lock:
+    """短时锁：读取索引目录与替换索引文件（保存、压缩后的目录交换）互斥，避免读到一半新一半旧的文件。"""
+    with _locks_guard:
+        return _swap_locks.setdefault(name, threading.Lock())
+
+
+def index_disk_bytes(name: str) -> int:
+    """索引目录的文件总大小，作为该索引载入后常驻内存的估计值（向量 + docstore）。"""
+    path = collection_index_path(name)
+    if not os.path.isdir(path):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+T = TypeVar("T")
+
+
+class IndexLRU(Generic[T]):
+    """
+    按需加载的索引缓存：总估计内存超过预算时按最近最少使用淘汰（刚加载 / 正在使用的集合除外）。
+    同一集合的并发加载只执行一次；被淘汰的索引在仍被请求引用时照常可用，引用释放后回收。
+    """
+
+    def __init__(self, load: Callable[[str], Optional[T]], size_of: Callable[[str], int], budget_bytes: int,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self._load = load
+        self._size_of = size_of
+        self.budget_bytes = budget_bytes
+        self._on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[Optional[T], int, float]]" = OrderedDict()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self.evictions = 0
+
+    def get(self, name: str) -> Optional[T]:
+        with self._lock:
+            if name in self._entries:
+                return self._touch(name)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if name in self._entries:
+                    return self._touch(name)
+            value = self._load(name)
+            self.put(name, value)
+            return value
+
+    def put(self, name: str, value: Optional[T]):
+        """放入（或替换）集合的索引，随后按预算淘汰其他集合。"""
+        size = self._size_of(name) if value is not None else 0
+        with self._lock:
+            self._entries[name] = (value, size, time.time())
+            self._entries.move_to_end(name)
+            evicted = self._evict(keep=name)
+        for victim in evicted:
+            logger.info(f"索引 LRU：内存预算 {self.budget_bytes / 2**20:.0f}MB 已满，淘汰集合 '{victim}'。")
+            if self._on_evict:
+                self._on_evict(victim)
+
+    def discard(self, name: str):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def loaded(self) -> dict[str, Optional[T]]:
+        """当前已加载的集合及其索引（不改变 LRU 顺序）。"""
+        with self._lock:
+            return {name: value for name, (value, _, _) in self._entries.items()}
+
+    def _touch(self, name: str) -> Optional[T]:
+        value, size, _ = self._entries[name]
+        self._entries[name] = (value, size, time.time())
+        self._entries.move_to_end(name)
+        return value
+
+    def _evict(self, keep: str) -> list[str]:
+        evicted = []
+        total = sum(size for _, size, _ in self._entries.values())
+        for name in list(self._entries):
+            if total <= self.budget_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._entries.pop(name)[1]
+            evicted.append(name)
+        self.evictions += len(evicted)
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            loaded = [
+                {"collection": name, "estimated_mb": round(size / 2**20, 3), "last_used": int(last_used),
+                 "empty": value is None}
+                for name, (value, size, last_used) in self._entries.items()
+            ]
+        return {
+            "budget_mb": round(self.budget_bytes / 2**20, 3),
+            "used_mb": round(sum(item["estimated_mb"] for item in loaded), 3),
+            "evictions": self.evictions,
+            "loaded": loaded,
+        }
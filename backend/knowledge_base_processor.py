@@ -1,62 +1,305 @@
 # backend/knowledge_base_processor.py
+import gc
 import os
+import re
 import json
+import time
+import shutil
 import logging
 from pathlib import Path
-from langchain_community.document_loaders import TextLoader, PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
+from typing import Optional
 
-from .config import UPLOAD_FOLDER, FAISS_INDEX_PATH, OLLAMA_EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP
+# LangChain / FAISS / Ollama 客户端导入较慢，只在实际加载文档、构建或加载索引时才导入（缩短进程冷启动）
+from .metrics import stage_timer
+from .chunk_metadata import guess_product_name, ChunkLookup
+from .product_catalog import save_catalog
+from .kb_collections import (
+    DEFAULT_COLLECTION, collection_upload_folder, collection_index_path, ensure_collection,
+    index_write_lock, index_swap_lock, index_disk_bytes,
+)
+from .config import (
+    OLLAMA_EMBEDDING_MODEL, EMBEDDING_PROVIDER, CHUNK_SIZE, CHUNK_OVERLAP, FAISS_VECTOR_ENCODING,
+    INGEST_BATCH_CHUNKS, INGEST_TEXT_BLOCK_CHARS, INGEST_MEMORY_CEILING_MB,
+)
 
 # --- 获取 logger 实例 ---
 logger = logging.getLogger("gadgetguide_ai.knowledge_base_processor")
 
-# 定义已处理文件记录路径
-PROCESSED_FILES_PATH = os.path.join(FAISS_INDEX_PATH, "processed_files.json")
+# 以下文件均位于各集合的索引目录中（见 kb_collections）
+# 已处理文件记录（集合的文件清单）
+PROCESSED_FILES_NAME = "processed_files.json"
+# 记录当前索引的向量存储格式（faiss.index_factory 描述串）
+INDEX_ENCODING_NAME = "index_encoding.json"
+# 已删除文件的片段（docstore id）；检索时排除，压缩时从索引与 docstore 中物理删除
+TOMBSTONES_NAME = "tombstones.json"
+# 上传目录监视器最近一次处理时各文件的大小与修改时间（见 upload_watcher）
+WATCHED_FILES_NAME = "watched_files.json"
 
-def load_processed_files():
+def load_processed_files(collection: str = DEFAULT_COLLECTION):
     """加载已处理文件的记录"""
-    if os.path.exists(PROCESSED_FILES_PATH):
+    processed_files_path = os.path.join(collection_index_path(collection), PROCESSED_FILES_NAME)
+    if os.path.exists(processed_files_path):
         try:
-            with open(PROCESSED_FILES_PATH, 'r', encoding='utf-8') as f:
+            with open(processed_files_path, 'r', encoding='utf-8') as f:
                 return set(json.load(f))
         except Exception as e:
             logger.warning(f"读取已处理文件记录失败: {e}")
     return set()
 
-def save_processed_files(files: set):
+def save_processed_files(files: set, collection: str = DEFAULT_COLLECTION):
     """保存已处理文件记录"""
     try:
-        with open(PROCESSED_FILES_PATH, 'w', encoding='utf-8') as f:
+        with open(os.path.join(collection_index_path(collection), PROCESSED_FILES_NAME), 'w', encoding='utf-8') as f:
             json.dump(list(files), f, ensure_ascii=False, indent=2)
     except Exception as e:
         logger.warning(f"保存已处理文件记录失败: {e}")
 
-def inject_filename_to_documents(documents, source_path: str):
-    """在每个文档前注入来源文件信息"""
+def get_embeddings():
+    """构建嵌入模型客户端：EMBEDDING_PROVIDER=ollama（默认，地址见 OLLAMA_BASE_URL）或 onnx（进程内推理）。"""
+    from .embedding_providers import create_embeddings
+    return create_embeddings()
+
+def annotate_documents(documents, source_path: str):
+    """为每个文档写入结构化来源元数据（来源文件、页码、产品），正文保持原样；来源标注在检索时渲染。"""
     filename = Path(source_path).name
+    product = guess_product_name(filename)
     for doc in documents:
+        doc.metadata["source_file"] = filename
+        doc.metadata["product"] = product
         page = doc.metadata.get("page", None)
         if page is not None:
-            doc.page_content = f"[{filename} - 第{page+1}页]\n" + doc.page_content
-        else:
-            doc.page_content = f"[来源文件: {filename}]\n" + doc.page_content
+            doc.metadata["page_number"] = page + 1
     return documents
 
-def create_index_from_files(file_names: list[str]):
+def get_document_loader(doc_path: str):
+    """按扩展名选择文档加载器，不支持的格式返回 None。"""
+    if doc_path.lower().endswith(".txt"):
+        from langchain_community.document_loaders import TextLoader
+        return TextLoader(doc_path, encoding="utf-8")
+    if doc_path.lower().endswith(".pdf"):
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(doc_path)
+    return None
+
+def make_text_splitter(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """构建文本分割器（检索评估时可传入不同的分块参数）。"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False,
+        separators=["\n\n", "\n", "。", ". ", "！", "？", "，", "、", "；", " ", ""]
+    )
+
+def _iter_text_blocks(doc_path: str, block_chars: int = INGEST_TEXT_BLOCK_CHARS):
+    """分块读取 TXT：每块约 block_chars 个字符，尽量在空行 / 换行处切开，避免整个文件一次读入内存。"""
+    from langchain_core.documents import Document
+
+    carry = ""
+    with open(doc_path, "r", encoding="utf-8") as f:
+        while True:
+            data = f.read(block_chars)
+            if not data:
+                break
+            text = carry + data
+            cut = text.rfind("\n\n")
+            if cut <= len(text) // 2:
+                cut = text.rfind("\n")
+            if cut <= len(text) // 2:
+                cut = len(text)  # 找不到合适的换行时硬切（余下部分不超过一块，内存仍有上界）
+            block, carry = text[:cut], text[cut:]
+            if block.strip():
+                yield Document(page_content=block, metadata={"source": doc_path})
+    if carry.strip():
+        yield Document(page_content=carry, metadata={"source": doc_path})
+
+def iter_document_pages(doc_path: str):
+    """
+    逐页产出已写入来源元数据的文档：PDF 每页一个 Document，TXT 按段落边界分块。
+    不支持的格式返回 None。
+    """
+    if doc_path.lower().endswith(".txt"):
+        pages = _iter_text_blocks(doc_path)
+    else:
+        loader = get_document_loader(doc_path)
+        if loader is None:
+            return None
+        pages = loader.lazy_load()
+    return (annotate_documents([page], doc_path)[0] for page in pages)
+
+def current_rss_mb() -> Optional[float]:
+    """当前进程的常驻内存（MB），读取 /proc/self/statm；无法获取（非 Linux）时返回 None。"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class IngestMemoryExceeded(RuntimeError):
+    pass
+
+
+class _IndexAppender:
+    """
+    流式入库：逐页分割，片段凑满一批即嵌入并追加到索引，内存中只保留一页文本与一批片段。
+    记录当前文件已写入的向量 id，文件中途失败时可整体撤回。
+    """
+
+    def __init__(self, vector_db, embeddings, batch_chunks: int = INGEST_BATCH_CHUNKS,
+                 ceiling_mb: float = INGEST_MEMORY_CEILING_MB):
+        self.vector_db = vector_db
+        self.embeddings = embeddings
+        self.batch_chunks = max(1, batch_chunks)
+        self.ceiling_mb = ceiling_mb
+        self.total_chunks = 0
+        self._created = vector_db is None
+        self._splitter = make_text_splitter()
+        self._buffer = []
+        self._file_ids = []
+
+    def add_file(self, pages) -> tuple[int, int]:
+        """把一个文件的全部页入库，返回 (页数, 片段数)。"""
+        self._file_ids = []
+        page_count = chunk_count = 0
+        while True:
+            with stage_timer("kb_load_document"):
+                page = next(pages, None)
+            if page is None:
+                break
+            page_count += 1
+            with stage_timer("kb_split"):
+                chunks = self._splitter.split_documents([page])
+            chunk_count += len(chunks)
+            for chunk in chunks:
+                self._buffer.append(chunk)
+                if len(self._buffer) >= self.batch_chunks:
+                    self._flush()
+        self._flush()
+        self.total_chunks += chunk_count
+        return page_count, chunk_count
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        from langchain_community.vectorstores import FAISS
+
+        batch, self._buffer = self._buffer, []
+        texts = [doc.page_content for doc in batch]
+        metadatas = [doc.metadata for doc in batch]
+        with stage_timer("kb_embed_and_index"):
+            text_embeddings = list(zip(texts, self.embeddings.embed_documents(texts)))
+            if self.vector_db is None:
+                self.vector_db = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas)
+                ids = list(self.vector_db.index_to_docstore_id.values())
+            else:
+                ids = self.vector_db.add_embeddings(text_embeddings, metadatas=metadatas)
+        self._file_ids.extend(ids)
+        self._check_memory()
+
+    def _check_memory(self):
+        if self.ceiling_mb <= 0:
+            return
+        rss = current_rss_mb()
+        if rss is not None and rss > self.ceiling_mb:
+            gc.collect()
+            rss = current_rss_mb()
+            if rss is not None and rss > self.ceiling_mb:
+                raise IngestMemoryExceeded(
+                    f"入库时进程内存 {rss:.0f}MB 超过上限 INGEST_MEMORY_CEILING_MB={self.ceiling_mb:.0f}MB"
+                )
+
+    def rollback_file(self):
+        """丢弃当前文件尚未嵌入的片段，并从索引中删除其已写入的向量。"""
+        self._buffer = []
+        if self._file_ids and self.vector_db is not None:
+            self.vector_db.delete(self._file_ids)
+            if self._created and self.vector_db.index.ntotal == 0:
+                self.vector_db = None
+        self._file_ids = []
+
+_ENCODING_FACTORY = {"flat": "Flat", "fp16": "SQfp16", "sq8": "SQ8"}
+
+
+def encoding_factory_string(encoding: str) -> str:
+    """把向量存储格式（flat / fp16 / sq8，可加 pcaN+ 前缀）转换为 faiss.index_factory 描述串。"""
+    match = re.fullmatch(r"(?:pca(\d+)\+)?(flat|fp16|sq8)", encoding.strip().lower())
+    if not match:
+        raise ValueError(f"未知的向量存储格式: {encoding}（可选 flat / fp16 / sq8，可加 pcaN+ 前缀）")
+    pca_dim, base = match.groups()
+    return (f"PCA{pca_dim}," if pca_dim else "") + _ENCODING_FACTORY[base]
+
+
+def build_encoded_index(vectors, encoding: str):
+    """用给定向量（float32 矩阵）训练并构建指定存储格式的 L2 索引，向量 id 与行号一致。"""
+    import faiss
+
+    factory = encoding_factory_string(encoding)
+    count, dim = vectors.shape
+    pca = re.match(r"PCA(\d+),", factory)
+    if pca and (int(pca.group(1)) >= dim or count < int(pca.group(1))):
+        raise ValueError(f"PCA 目标维度需小于原维度 {dim} 且不大于向量数 {count}（当前 {factory}）")
+    index = faiss.index_factory(dim, factory)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def _read_index_encoding(index_path: str) -> str:
+    try:
+        with open(os.path.join(index_path, INDEX_ENCODING_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)["factory"]
+    except FileNotFoundError:
+        return "Flat"  # LangChain 默认的 IndexFlatL2
+
+
+def _write_index_encoding(factory: str, index_path: str):
+    with open(os.path.join(index_path, INDEX_ENCODING_NAME), "w", encoding="utf-8") as f:
+        json.dump({"factory": factory}, f)
+
+
+def apply_vector_encoding(vector_db, index_path: str, encoding: str = FAISS_VECTOR_ENCODING) -> bool:
+    """
+    按配置转换索引的向量存储格式（重建后替换 vector_db.index，docstore 映射不变），返回是否发生了转换。
+    已量化的索引再转换时基于其重建（有损）向量；向量数不足以训练 PCA 时暂不转换。
+    """
+    factory = encoding_factory_string(encoding)
+    current = _read_index_encoding(index_path)
+    if current == factory:
+        return False
+    count = vector_db.index.ntotal
+    vectors = vector_db.index.reconstruct_n(0, count)
+    try:
+        with stage_timer("kb_encode_index"):
+            vector_db.index = build_encoded_index(vectors, encoding)
+    except ValueError as e:
+        logger.warning(f"暂不转换向量存储格式 ({current} -> {factory}): {e}")
+        return False
+    logger.info(f"索引向量存储格式已转换: {current} -> {factory}（{count} 个向量）")
+    return True
+
+
+def create_index_from_files(file_names: list[str], collection: str = DEFAULT_COLLECTION):
     """
     从指定的文件列表创建或更新 FAISS 索引。
-    file_names: 在 UPLOAD_FOLDER 中的文件名列表。
+    file_names: 在集合上传目录（默认集合为 UPLOAD_FOLDER）中的文件名列表。
     """
-    logger.info(f"开始从文件列表创建/更新 FAISS 索引: {file_names}")
-    doc_paths = [os.path.join(UPLOAD_FOLDER, fn) for fn in file_names]
-    all_docs = []
-    processed_files = load_processed_files()
-    newly_processed = []
+    with index_write_lock(collection):
+        return _create_index_from_files(file_names, collection)
+
+def _create_index_from_files(file_names: list[str], collection: str):
+    logger.info(f"开始从文件列表创建/更新集合 '{collection}' 的 FAISS 索引: {file_names}")
+    ensure_collection(collection)
+    upload_folder = collection_upload_folder(collection)
+    index_path = collection_index_path(collection)
+    processed_files = load_processed_files(collection)
+    pending_paths = []
 
-    for doc_path in doc_paths:
+    for file_name in file_names:
+        doc_path = os.path.join(upload_folder, file_name)
         file_name_for_log = os.path.basename(doc_path)
         if not os.path.exists(doc_path):
             logger.warning(f"文件 '{file_name_for_log}' 在路径 '{doc_path}' 未找到，已跳过。")
@@ -64,91 +307,194 @@ def create_index_from_files(file_names: list[str]):
         if file_name_for_log in processed_files:
             logger.info(f"文件 '{file_name_for_log}' 已处理过，跳过。")
             continue
-        
-        loader = None
-        try:
-            if doc_path.lower().endswith(".txt"):
-                logger.info(f"正在加载 TXT 文件: {file_name_for_log}...")
-                loader = TextLoader(doc_path, encoding="utf-8")
-            elif doc_path.lower().endswith(".pdf"):
-                logger.info(f"正在加载 PDF 文件: {file_name_for_log}...")
-                loader = PyPDFLoader(doc_path)
-            else:
-                logger.warning(f"不支持的文件格式 '{file_name_for_log}'，已跳过。")
-                continue
-            
-            if loader:
-                documents = loader.load()
-                documents = inject_filename_to_documents(documents, doc_path)  # 注入文件名
-                all_docs.extend(documents)
-                newly_processed.append(file_name_for_log)
-                logger.info(f"文件 '{file_name_for_log}' 加载成功，包含 {len(documents)} 个 Langchain Document 对象。")
+        pending_paths.append(doc_path)
 
-        except Exception as e:
-            logger.error(f"加载文件 '{file_name_for_log}' 时出错: {e}", exc_info=True)
-            continue
-    
-    if not all_docs:
+    if not pending_paths:
         logger.warning("没有成功加载任何文档，无法创建或更新索引。")
         return False
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        is_separator_regex=False,
-        separators=["\n\n", "\n", "。", ". ", "！", "？", "，", "、", "；", " ", ""]
-    )
-    
-    split_docs = text_splitter.split_documents(all_docs)
-    logger.info(f"所有文档内容已分割完成，共生成 {len(split_docs)} 个文本片段用于嵌入。")
-
     try:
-        logger.info(f"正在使用 Ollama 嵌入模型: {OLLAMA_EMBEDDING_MODEL}")
-        embeddings = OllamaEmbeddings(model=OLLAMA_EMBEDDING_MODEL)
+        from langchain_community.vectorstores import FAISS
 
-        if os.path.exists(FAISS_INDEX_PATH) and os.listdir(FAISS_INDEX_PATH):
+        logger.info(f"正在使用嵌入模型: {OLLAMA_EMBEDDING_MODEL}（{EMBEDDING_PROVIDER}）")
+        embeddings = get_embeddings()
+        vector_db = None
+        if os.path.exists(os.path.join(index_path, "index.faiss")):
             logger.info("检测到已有索引，正在执行增量添加...")
-            vector_db = FAISS.load_local(FAISS_INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-            vector_db.add_documents(split_docs)
+            vector_db = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
         else:
             logger.info("首次创建索引...")
-            vector_db = FAISS.from_documents(split_docs, embeddings)
+        appender = _IndexAppender(vector_db, embeddings)
+        newly_processed = []
 
-        vector_db.save_local(FAISS_INDEX_PATH)
-        logger.info(f"FAISS 索引已成功保存至: {FAISS_INDEX_PATH}")
+        for doc_path in pending_paths:
+            file_name_for_log = os.path.basename(doc_path)
+            pages = iter_document_pages(doc_path)
+            if pages is None:
+                logger.warning(f"不支持的文件格式 '{file_name_for_log}'，已跳过。")
+                continue
+            logger.info(f"正在加载文件: {file_name_for_log}...")
+            try:
+                page_count, chunk_count = appender.add_file(pages)
+            except IngestMemoryExceeded:
+                raise
+            except Exception as e:
+                # 单个文件失败（文件损坏、嵌入服务出错等）只撤回该文件已写入的片段，其余文件照常入库
+                logger.error(f"入库文件 '{file_name_for_log}' 时出错，已撤回该文件的片段: {e}", exc_info=True)
+                appender.rollback_file()
+                continue
+            newly_processed.append(file_name_for_log)
+            logger.info(f"文件 '{file_name_for_log}' 入库完成：{page_count} 页，{chunk_count} 个文本片段。")
+
+        vector_db = appender.vector_db
+        if not newly_processed or vector_db is None:
+            logger.warning("没有成功加载任何文档，无法创建或更新索引。")
+            return False
+        logger.info(f"新文档已全部入库，共新增 {appender.total_chunks} 个文本片段。")
+
+        encoded = apply_vector_encoding(vector_db, index_path)
+
+        with stage_timer("kb_save_index"), index_swap_lock(collection):
+            vector_db.save_local(index_path)
+            if encoded:
+                _write_index_encoding(encoding_factory_string(FAISS_VECTOR_ENCODING), index_path)
+            # 产品目录取自索引中全部片段（含之前入库的文档），供对比问题识别产品实体
+            save_catalog(ChunkLookup(vector_db).products, index_path)
+        logger.info(f"FAISS 索引已成功保存至: {index_path}")
 
         processed_files.update(newly_processed)
-        save_processed_files(processed_files)
+        save_processed_files(processed_files, collection)
 
         return True
+    except IngestMemoryExceeded as e:
+        logger.error(f"{e}，本次入库已中止，磁盘上的索引保持不变。可调小 INGEST_BATCH_CHUNKS 或调大上限后重试。")
+        return False
     except Exception as e:
         logger.error(f"创建 FAISS 索引时出错: {e}", exc_info=True)
-        logger.error(f"请确保 Ollama 服务正在运行，并且模型 '{OLLAMA_EMBEDDING_MODEL}' 已通过 'ollama pull {OLLAMA_EMBEDDING_MODEL}' 下载。")
+        if EMBEDDING_PROVIDER == "ollama":
+            logger.error(f"请确保 Ollama 服务正在运行，并且模型 '{OLLAMA_EMBEDDING_MODEL}' 已通过 'ollama pull {OLLAMA_EMBEDDING_MODEL}' 下载。")
         return False
 
-def load_faiss_index():
-    """加载本地的 FAISS 索引。"""
-    if os.path.exists(FAISS_INDEX_PATH) and os.listdir(FAISS_INDEX_PATH):
+def load_faiss_index(collection: str = DEFAULT_COLLECTION):
+    """加载集合的本地 FAISS 索引。"""
+    index_path = collection_index_path(collection)
+    _recover_interrupted_swap(index_path)
+    if os.path.exists(index_path) and os.listdir(index_path):
         try:
-            embeddings = OllamaEmbeddings(model=OLLAMA_EMBEDDING_MODEL)
-            vector_db = FAISS.load_local(FAISS_INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
-            logger.info(f"FAISS 索引已从 {FAISS_INDEX_PATH} 加载。")
+            from langchain_community.vectorstores import FAISS
+
+            embeddings = get_embeddings()
+            with index_swap_lock(collection):
+                vector_db = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+            logger.info(f"FAISS 索引已从 {index_path} 加载。")
             return vector_db
         except Exception as e:
             logger.error(f"加载 FAISS 索引时出错: {e}", exc_info=True)
             return None
     else:
-        logger.info(f"FAISS 索引目录 {FAISS_INDEX_PATH} 不存在或为空，将不会加载现有索引。")
+        logger.info(f"FAISS 索引目录 {index_path} 不存在或为空，将不会加载现有索引。")
         return None
 
-def rebuild_index_from_all_files():
-    """从 upload 文件夹中所有文件重新构建索引"""
+# --- 按文件删除（墓碑）与索引压缩 ---
+def load_tombstones(collection: str = DEFAULT_COLLECTION) -> set:
+    try:
+        with open(os.path.join(collection_index_path(collection), TOMBSTONES_NAME), "r", encoding="utf-8") as f:
+            return set(json.load(f))
+    except FileNotFoundError:
+        return set()
+    except Exception as e:
+        logger.warning(f"读取墓碑记录失败: {e}")
+        return set()
+
+def _save_tombstones(docstore_ids: set, index_path: str):
+    with open(os.path.join(index_path, TOMBSTONES_NAME), "w", encoding="utf-8") as f:
+        json.dump(sorted(docstore_ids), f)
+
+def tombstone_source_file(vector_db, filename: str, collection: str = DEFAULT_COLLECTION) -> int:
+    """
+    删除文件时不重建索引：把来源为 filename 的片段记为墓碑（检索时排除），并从已处理文件记录中移除
+    （同名文件可重新上传入库）。返回新增的墓碑数。
+    """
+    with index_write_lock(collection):
+        tombstones = load_tombstones(collection)
+        dead = set()
+        if vector_db is not None:
+            for position in ChunkLookup(vector_db).ids_matching(source_files=[filename]):
+                dead.add(vector_db.index_to_docstore_id[int(position)])
+        added = dead - tombstones
+        if added:
+            _save_tombstones(tombstones | added, collection_index_path(collection))
+        processed_files = load_processed_files(collection)
+        if filename in processed_files:
+            processed_files.discard(filename)
+            save_processed_files(processed_files, collection)
+    logger.info(f"集合 '{collection}' 中文件 '{filename}' 的 {len(added)} 个片段已标记为删除。")
+    return len(added)
+
+def _recover_interrupted_swap(index_path: str):
+    """压缩交换目录的两次重命名之间进程退出时，恢复旧索引目录。"""
+    old_path = index_path + ".old"
+    if not os.path.exists(index_path) and os.path.isdir(old_path):
+        os.replace(old_path, index_path)
+        logger.warning(f"检测到未完成的索引目录交换，已恢复 {index_path}")
+
+def compact_index(collection: str = DEFAULT_COLLECTION) -> dict:
+    """
+    压缩索引：从 FAISS 索引与 docstore 中删除墓碑片段并重新编号，写入临时目录后整体替换索引目录。
+    返回回收的向量数与字节数。
+    """
+    index_path = collection_index_path(collection)
+    with index_write_lock(collection):
+        _recover_interrupted_swap(index_path)
+        tombstones = load_tombstones(collection)
+        bytes_before = index_disk_bytes(collection)
+        vector_db = load_faiss_index(collection) if tombstones else None
+        if vector_db is None:
+            return {"collection": collection, "compacted": False, "vectors_before": None,
+                    "vectors_reclaimed": 0, "bytes_before": bytes_before, "bytes_reclaimed": 0}
+
+        vectors_before = vector_db.index.ntotal
+        dead = [docstore_id for docstore_id in vector_db.index_to_docstore_id.values() if docstore_id in tombstones]
+        started = time.perf_counter()
+        with stage_timer("kb_compact_index"):
+            if dead:
+                vector_db.delete(dead)
+            staging_path = index_path + ".compacting"
+            shutil.rmtree(staging_path, ignore_errors=True)
+            os.makedirs(staging_path)
+            vector_db.save_local(staging_path)
+            for name in (PROCESSED_FILES_NAME, INDEX_ENCODING_NAME, WATCHED_FILES_NAME):
+                if os.path.exists(os.path.join(index_path, name)):
+                    shutil.copy2(os.path.join(index_path, name), os.path.join(staging_path, name))
+            save_catalog(ChunkLookup(vector_db).products, staging_path)
+            # 交换：两次目录重命名（中途退出时由 _recover_interrupted_swap 恢复），期间不允许读取索引
+            old_path = index_path + ".old"
+            with index_swap_lock(collection):
+                shutil.rmtree(old_path, ignore_errors=True)
+                os.replace(index_path, old_path)
+                os.replace(staging_path, index_path)
+            shutil.rmtree(old_path, ignore_errors=True)
+
+    bytes_after = index_disk_bytes(collection)
+    report = {
+        "collection": collection,
+        "compacted": True,
+        "vectors_before": vectors_before,
+        "vectors_reclaimed": vectors_before - vector_db.index.ntotal,
+        "bytes_before": bytes_before,
+        "bytes_reclaimed": bytes_before - bytes_after,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"集合 '{collection}' 索引压缩完成: {report}")
+    return report
+
+def rebuild_index_from_all_files(collection: str = DEFAULT_COLLECTION):
+    """从集合上传目录中所有文件重新构建索引"""
     try:
-        files = [f for f in os.listdir(UPLOAD_FOLDER) if f.lower().endswith(('.pdf', '.txt'))]
+        files = [f for f in os.listdir(collection_upload_folder(collection)) if f.lower().endswith(('.pdf', '.txt'))]
         if not files:
             return False, "知识库中没有可用文件"
-        success = create_index_from_files(files)
+        success = create_index_from_files(files, collection)
         return success, f"索引刷新 {'成功' if success else '失败'}，处理了 {len(files)} 个文件。"
     except Exception as e:
         logger.error(f"刷新索引失败: {e}", exc_info=True)
@@ -0,0 +1,351 @@
+# backend/llm_backend.py
+# LLM 调用后端：OpenAI 兼容接口 + 熔断器 + 可选的对冲请求（备用端点）
+
+import json
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator, List, Optional
+
+import requests
+
+from .config import (
+    LLM_API_URL, LLM_MODEL_NAME, LLM_API_KEY,
+    LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+    LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS,
+    LLM_SECONDARY_API_URL, LLM_SECONDARY_MODEL_NAME, LLM_SECONDARY_API_KEY,
+    LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY,
+)
+
+logger = logging.getLogger("gadgetguide_ai.llm")
+
+
+class LLMError(Exception):
+    """LLM 调用失败，消息可直接返回给用户。"""
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败 failure_threshold 次后打开，reset_timeout 秒内直接拒绝；
+    冷却后放行一个试探请求（半开），成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._trial_in_flight or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    logger.warning(f"熔断器打开（连续失败 {self._failures} 次）。")
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def release_trial(self):
+        """调用未得出结论（如调用方提前放弃）：只释放试探名额，保持原状态，下一个请求重新试探。"""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class LLMBackend:
+    """LLM 后端接口。"""
+
+    name = "base"
+
+    def complete(self, messages: List[dict], max_tokens: int = 1500, temperature: float = 0.3) -> str:
+        raise NotImplementedError
+
+    def stream(self, messages: List[dict], max_tokens: int = 1500, temperature: float = 0.3) -> Iterator[str]:
+        """逐段产出回答文本；不支持流式的后端退化为一次性返回完整回答。"""
+        yield self.complete(messages, max_tokens, temperature)
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """调用 OpenAI 兼容的 /chat/completions 接口（DeepSeek、本地 vLLM/Ollama 网关、测试桩等）。"""
+
+    def __init__(
+        self,
+        name: str,
+        api_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        connect_timeout: float = LLM_CONNECT_TIMEOUT,
+        read_timeout: float = LLM_READ_TIMEOUT,
+        breaker: Optional[CircuitBreaker] = None,
+        latency_window: int = 200,
+    ):
+        self.name = name
+        self.api_url = api_url
+        self.model = model
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+        self._session = requests.Session()
+        self._latencies = deque(maxlen=latency_window)
+        self._latency_lock = threading.Lock()
+
+    def _headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """最近成功请求的延迟分位数（秒），样本不足时返回 None。"""
+        with self._latency_lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return None
+        return samples[min(len(samples) - 1, int(pct / 100.0 * len(samples)))]
+
+    def _settle(self, outcome: Optional[bool]):
+        if outcome is True:
+            self.breaker.record_success()
+        elif outcome is False:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+
+    def complete(self, messages: List[dict], max_tokens: int = 1500, temperature: float = 0.3) -> str:
+        if not self.breaker.allow():
+            raise LLMError("AI 服务暂时不可用，请稍后再试。")
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        started = time.monotonic()
+        outcome: Optional[bool] = None  # True 成功 / False 失败 / None 未得出结论
+        try:
+            try:
+                response = self._session.post(self.api_url, headers=self._headers(), json=payload, timeout=self.timeout)
+                if response.status_code >= 400:
+                    # 429 / 5xx 计为失败；其余 4xx 说明服务可达，属于请求本身的问题
+                    outcome = not (response.status_code == 429 or response.status_code >= 500)
+                response.raise_for_status()
+                response_data = response.json()
+            except requests.exceptions.Timeout:
+                outcome = False
+                logger.error(f"[{self.name}] LLM 请求超时 (timeout={self.timeout})。")
+                raise LLMError("AI 服务请求超时，请稍后再试。")
+            except requests.exceptions.HTTPError as e:
+                logger.error(f"[{self.name}] LLM 请求错误: {e}")
+                raise LLMError(f"与 AI 服务通信时发生错误: {e}")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                outcome = False
+                logger.error(f"[{self.name}] LLM 请求错误: {e}", exc_info=True)
+                raise LLMError(f"与 AI 服务通信时发生错误: {e}")
+
+            choices = (response_data.get("choices") if isinstance(response_data, dict) else None) or []
+            first = choices[0] if isinstance(choices, list) and choices else None
+            message = first.get("message") if isinstance(first, dict) else None
+            if not isinstance(message, dict):
+                outcome = False
+                logger.error(f"[{self.name}] LLM 响应格式不符合预期: {response_data}")
+                raise LLMError("AI 服务响应格式不正确。")
+            outcome = True
+            with self._latency_lock:
+                self._latencies.append(time.monotonic() - started)
+            return message.get("content", "")
+        finally:
+            # 任何退出路径（包括意外异常）都记录结果或释放半开状态下的试探名额
+            self._settle(outcome)
+
+    def stream(self, messages: List[dict], max_tokens: int = 1500, temperature: float = 0.3) -> Iterator[str]:
+        """
+        以 stream=True 调用接口，逐个产出 delta 文本。
+        调用方提前关闭生成器（如客户端断开）时，连接随之关闭，上游停止生成。
+        """
+        if not self.breaker.allow():
+            raise LLMError("AI 服务暂时不可用，请稍后再试。")
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+        }
+        started = time.monotonic()
+        outcome: Optional[bool] = None  # True 成功 / False 失败 / None 未得出结论
+        try:
+            try:
+                response = self._session.post(
+                    self.api_url, headers=self._headers(), json=payload, timeout=self.timeout, stream=True
+                )
+            except requests.exceptions.Timeout:
+                outcome = False
+                logger.error(f"[{self.name}] LLM 流式请求超时 (timeout={self.timeout})。")
+                raise LLMError("AI 服务请求超时，请稍后再试。")
+            except requests.exceptions.RequestException as e:
+                outcome = False
+                logger.error(f"[{self.name}] LLM 流式请求错误: {e}", exc_info=True)
+                raise LLMError(f"与 AI 服务通信时发生错误: {e}")
+
+            with response:
+                if response.status_code >= 400:
+                    # 429 / 5xx 计为失败；其余 4xx 说明服务可达，属于请求本身的问题
+                    outcome = not (response.status_code == 429 or response.status_code >= 500)
+                    logger.error(f"[{self.name}] LLM 流式请求错误: HTTP {response.status_code}")
+                    raise LLMError(f"与 AI 服务通信时发生错误: HTTP {response.status_code}")
+                try:
+                    # SSE 规定为 UTF-8，不依赖响应头中的 charset
+                    for raw_line in response.iter_lines():
+                        line = raw_line.decode("utf-8")
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        choices = (chunk.get("choices") if isinstance(chunk, dict) else None) or []
+                        delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                        if delta:
+                            yield delta
+                except GeneratorExit:
+                    # 调用方提前关闭（客户端断开）：已收到 200 响应，服务可用
+                    outcome = True
+                    raise
+                except (requests.exceptions.RequestException, ValueError, AttributeError) as e:
+                    outcome = False
+                    logger.error(f"[{self.name}] LLM 流式响应中断: {e}")
+                    raise LLMError(f"AI 服务响应中断: {e}")
+            outcome = True
+            with self._latency_lock:
+                self._latencies.append(time.monotonic() - started)
+        finally:
+            # 任何退出路径都要记录结果或释放试探名额，否则半开状态下的试探请求泄漏后熔断器不再放行
+            self._settle(outcome)
+
+
+# 对冲请求使用的线程池（请求本身是阻塞 IO）。主 / 备端点各用独立的线程池：
+# 故障期间主端点请求可能各自挂起到读超时，占满线程池后备用端点请求不会排在它们后面。
+_primary_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-primary")
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+
+class HedgedBackend(LLMBackend):
+    """
+    对冲请求：主端点在其历史延迟分位数（至少 min_delay 秒）内未返回时，
+    再向备用端点发起同样的请求，取先成功的结果；主端点失败或熔断时直接切换到备用端点。
+    """
+
+    def __init__(self, primary: OpenAICompatibleBackend, secondary: LLMBackend,
+                 hedge_percentile: float = LLM_HEDGE_PERCENTILE, min_delay: float = LLM_HEDGE_MIN_DELAY):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_percentile = hedge_percentile
+        self.min_delay = min_delay
+        self.name = f"{primary.name}+{secondary.name}"
+
+    def hedge_delay(self) -> float:
+        observed = self.primary.latency_percentile(self.hedge_percentile)
+        return max(self.min_delay, observed) if observed is not None else self.min_delay
+
+    def complete(self, messages: List[dict], max_tokens: int = 1500, temperature: float = 0.3) -> str:
+        if self.primary.breaker.state == "open":
+            logger.info(f"主端点 {self.primary.name} 熔断中，直接使用备用端点 {self.secondary.name}。")
+            return self.secondary.complete(messages, max_tokens, temperature)
+
+        pending = {_primary_executor.submit(self.primary.complete, messages, max_tokens, temperature)}
+        secondary_started = False
+        done, _ = wait(pending, timeout=self.hedge_delay())
+        if not done:
+            logger.info(f"主端点 {self.primary.name} 超过 {self.hedge_delay():.2f}s 未返回，向备用端点发起对冲请求。")
+            pending.add(_hedge_executor.submit(self.secondary.complete, messages, max_tokens, temperature))
+            secondary_started = True
+
+        last_error: Optional[LLMError] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except LLMError as e:
+                    last_error = e
+            if not pending and not secondary_started:
+                logger.info(f"主端点 {self.primary.name} 失败，切换到备用端点 {self.secondary.name}。")
+                pending.add(_hedge_executor.submit(self.secondary.complete, messages, max_tokens, temperature))
+                secondary_started = True
+        raise last_error
+
+    def stream(self, messages: List[dict], max_tokens: int = 1500, temperature: float = 0.3) -> Iterator[str]:
+        """
+        流式请求不做对冲（两路输出无法合并）：主端点熔断或在产出首段文本前失败时改用备用端点，
+        已开始输出后的失败直接抛出。
+        """
+        if self.primary.breaker.state != "open":
+            produced = False
+            try:
+                # 显式关闭主端点生成器：调用方提前关闭时主端点也能及时记录熔断结果
+                with closing(self.primary.stream(messages, max_tokens, temperature)) as parts:
+                    for delta in parts:
+                        produced = True
+                        yield delta
+                return
+            except LLMError:
+                if produced:
+                    raise
+            logger.info(f"主端点 {self.primary.name} 流式请求失败，切换到备用端点 {self.secondary.name}。")
+        yield from self.secondary.stream(messages, max_tokens, temperature)
+
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_llm_backend() -> LLMBackend:
+    """按 config 构建（并缓存）当前使用的 LLM 后端。"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            primary = OpenAICompatibleBackend("primary", LLM_API_URL, LLM_MODEL_NAME, LLM_API_KEY)
+            if LLM_SECONDARY_API_URL:
+                secondary = OpenAICompatibleBackend(
+                    "secondary", LLM_SECONDARY_API_URL, LLM_SECONDARY_MODEL_NAME, LLM_SECONDARY_API_KEY
+                )
+                _backend = HedgedBackend(primary, secondary)
+            else:
+                _backend = primary
+            logger.info(f"LLM 后端已初始化: {_backend.name}")
+        return _backend
+
+
+def set_llm_backend(backend: Optional[LLMBackend]):
+    """替换当前 LLM 后端（基准测试或切换模型时使用），传 None 则下次按 config 重建。"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
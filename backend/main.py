@@ -24,27 +24,58 @@ else:
     logger.warning(f".env file NOT found at {DOTENV_PATH}. Attempting default load_dotenv().")
     load_dotenv(verbose=True)
 
-from fastapi import FastAPI, HTTPException, Form, File, UploadFile
+from fastapi import FastAPI, HTTPException, Form, File, UploadFile, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import List, Dict, Any
 import shutil
+import threading
+import time
+from contextlib import closing
 
 # --- 模块导入 ---
 from backend.knowledge_base_processor import create_index_from_files
-from backend.qa_handler import retrieve_context, reload_vector_db, get_final_answer
-from backend.config import UPLOAD_FOLDER
-from backend.auth.routes import router as auth_router
+from backend.qa_handler import (
+    retrieve_context, reload_vector_db, get_vector_db, get_final_answer, stream_final_answer, answer_batch,
+)
+from backend.qa_schemas import BatchAskRequest, RetrieveRequest
+from backend.llm_backend import LLMError
+from backend.sse import sse_event, admitted_sse_response
+from backend.config import (
+    UPLOAD_FOLDER, BATCH_MAX_QUERIES, BATCH_LLM_CONCURRENCY, UPLOAD_WATCH_ENABLED, RESPONSE_COMPRESSION_MIN_BYTES,
+    ARCHIVE_ENABLED,
+)
+from backend.compression import CompressionMiddleware
+from backend.kb_collections import DEFAULT_COLLECTION
+from backend.upload_watcher import start_upload_watcher, stop_upload_watcher
+from backend.chat.archive import (
+    start_archiver, stop_archiver, max_archived_message_id, max_referenced_conversation_id,
+)
+from backend.chat.message_writer import stop_message_writer
+from backend.admission import admit_or_429, client_admission_key
+from backend.profiling import profiled_request
+from backend import etags
+from backend.metrics import (
+    render_prometheus, start_request_spans, format_server_timing, HTTP_REQUEST_DURATION,
+)
+from backend.auth.routes import router as auth_router, get_current_user
 from backend.chat.routes import router as chat_router
-from backend.admin.routes import router as admin_router        # <--- 新增
+from backend.admin.routes import router as admin_router, require_collection        # <--- 新增
 from backend.auth import models
 from backend.chat import models as chat_models
-from backend.database import Base, engine
+from backend.database import Base, engine, ensure_columns, ensure_indexes, ensure_sqlite_autoincrement
 
 # --- 创建 FastAPI 实例 ---
 app = FastAPI(title="GadgetGuide AI API")
 
 # --- 创建所有数据表（用户表、会话表、消息表等） ---
 Base.metadata.create_all(bind=engine)
+ensure_columns()
+ensure_indexes()
+ensure_sqlite_autoincrement(reserve={
+    "messages": max_archived_message_id,
+    "conversations": max_referenced_conversation_id,
+})
 
 # --- CORS 配置 ---
 origins = [
@@ -59,8 +90,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# --- 响应压缩（会话 / 消息 / 文件列表等较大的 JSON）；304 与 SSE 不受影响 ---
+if RESPONSE_COMPRESSION_MIN_BYTES > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=RESPONSE_COMPRESSION_MIN_BYTES)
+
+# --- 请求耗时：记录直方图，并通过 Server-Timing 头返回各阶段耗时 ---
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    spans = start_request_spans()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    HTTP_REQUEST_DURATION.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    response.headers["Server-Timing"] = format_server_timing(spans, elapsed)
+    return response
+
 # --- 路由挂载 ---
 logger.debug("Mounting /auth, /chat and /admin routes...")
 app.include_router(auth_router)
@@ -70,7 +123,23 @@ logger.info("Routes mounted successfully.")
 
 @app.on_event("startup")
 async def startup_event():
-    logger.info("应用程序启动，qa_handler 将尝试加载现有索引...")
+    # 索引在后台线程中预热加载，不阻塞启动；加载完成前到达的请求会等待同一次加载
+    logger.info("应用程序启动，qa_handler 将在后台加载默认集合的现有索引（其他集合在首次使用时加载）...")
+    threading.Thread(target=get_vector_db, name="index-warmup", daemon=True).start()
+    if UPLOAD_WATCH_ENABLED:
+        start_upload_watcher()
+    if ARCHIVE_ENABLED:
+        start_archiver()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    stop_upload_watcher()
+    stop_archiver()
+    stop_message_writer()  # 写完组提交队列中的消息
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def read_root():
@@ -78,18 +147,95 @@ async def read_root():
     return {"message": "Welcome to GadgetGuide AI API!"}
 
 @app.post("/ask", response_model=Dict[str, Any])
-async def ask_question_endpoint(query: str = Form(...)):
-    logger.info(f"Received query for /ask endpoint: '{query}'")
+def ask_question_endpoint(request: Request, query: str = Form(...), collection: str = Form(DEFAULT_COLLECTION)):
+    # 同步接口：在线程池中执行，检索与 LLM 调用不会阻塞事件循环
+    logger.info(f"Received query for /ask endpoint: '{query}' (collection: {collection})")
     if not query.strip():
         logger.warning("Empty query received for /ask endpoint.")
         raise HTTPException(status_code=400, detail="查询不能为空。")
-    result = get_final_answer(query)
+    require_collection(collection)
+    with admit_or_429(client_admission_key(request)), profiled_request("ask"):
+        result = get_final_answer(query, collection)
     if result.get("error"):
         logger.error(f"Error in /ask endpoint for query '{query}': {result.get('error')}")
         raise HTTPException(status_code=500, detail=result.get("error", "处理请求时发生未知错误。"))
     logger.info(f"Successfully answered query for /ask endpoint: '{query}'")
     return {"question": query, "answer": result.get("answer", "未能获取到明确的回答。")}
 
+@app.post("/ask/stream")
+def ask_question_stream_endpoint(request: Request, query: str = Form(...), collection: str = Form(DEFAULT_COLLECTION)):
+    """
+    /ask 的流式版本（SSE）：event: token 逐段推送回答，结束时 event: done 给出完整回答，出错时 event: error。
+    """
+    logger.info(f"Received query for /ask/stream endpoint: '{query}' (collection: {collection})")
+    if not query.strip():
+        logger.warning("Empty query received for /ask/stream endpoint.")
+        raise HTTPException(status_code=400, detail="查询不能为空。")
+    require_collection(collection)
+    admission_key = client_admission_key(request)
+
+    def events():
+        parts = []
+        try:
+            # 客户端断开时事件生成器被关闭，随之关闭上游 LLM 流
+            with closing(stream_final_answer(query, collection)) as answer_stream:
+                for delta in answer_stream:
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+        except LLMError as e:
+            logger.error(f"Error in /ask/stream endpoint for query '{query}': {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        except Exception as e:
+            logger.error(f"Unexpected error in /ask/stream endpoint for query '{query}': {e}", exc_info=True)
+            yield sse_event("error", {"detail": "处理请求时发生未知错误。"})
+            return
+        yield sse_event("done", {"question": query, "answer": "".join(parts).strip()})
+
+    return admitted_sse_response(admission_key, events)
+
+@app.post("/ask/batch")
+def ask_batch_endpoint(payload: BatchAskRequest, current_user: models.User = Depends(get_current_user)):
+    """
+    批量问答（需登录）：问题统一嵌入、批量检索，LLM 调用有界并发；
+    每完成一个问题推送一次 event: result（含问题下标），全部完成后 event: done。
+    """
+    if len(payload.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"单次最多提交 {BATCH_MAX_QUERIES} 个问题。")
+    if any(not query.strip() for query in payload.queries):
+        raise HTTPException(status_code=400, detail="查询不能为空。")
+    require_collection(payload.collection)
+    logger.info(f"Received {len(payload.queries)} queries for /ask/batch from user {current_user.id}")
+
+    # 整个批次只占用一个准入名额，批内 LLM 并发不能由客户端放大：上限为 BATCH_LLM_CONCURRENCY
+    concurrency = min(payload.concurrency or BATCH_LLM_CONCURRENCY, BATCH_LLM_CONCURRENCY)
+
+    def events():
+        failed = 0
+        # 客户端断开时事件生成器被关闭，随之关闭批量问答生成器（取消尚未开始的 LLM 调用）
+        with closing(answer_batch(payload.queries, concurrency, payload.collection)) as results:
+            for index, result in results:
+                failed += "error" in result
+                yield sse_event("result", {"index": index, "question": payload.queries[index], **result})
+        yield sse_event("done", {"total": len(payload.queries), "failed": failed})
+
+    return admitted_sse_response(f"user:{current_user.id}", events)
+
+@app.post("/retrieve_context", response_model=Dict[str, Any])
+def retrieve_context_endpoint(payload: RetrieveRequest):
+    """（调试用）仅返回检索到的上下文片段，可按来源文件 / 页码 / 产品限定范围。"""
+    if not payload.query.strip():
+        raise HTTPException(status_code=400, detail="查询不能为空。")
+    require_collection(payload.collection)
+    result = retrieve_context(
+        payload.query, k=payload.k, threshold=payload.threshold,
+        source_files=payload.source_files, pages=payload.pages, products=payload.products,
+        collection=payload.collection,
+    )
+    if result.get("error"):
+        raise HTTPException(status_code=500, detail=result["error"])
+    return {"query": payload.query, "retrieved_chunks": result["retrieved_chunks"]}
+
 @app.post("/upload-documents/", response_model=Dict[str, Any])
 async def upload_documents_endpoint(files: List[UploadFile] = File(...)):
     logger.info(f"Received {len(files)} file(s) for /upload-documents endpoint.")
@@ -113,6 +259,8 @@ async def upload_documents_endpoint(files: List[UploadFile] = File(...)):
             processed_files_info.append({"filename": file.filename, "status": "上传失败", "error": str(e)})
         finally:
             file.file.close()
+    # 同名文件被原地覆盖时目录 mtime 不变，须显式使上传文件列表的 ETag 失效
+    etags.uploads_changed(DEFAULT_COLLECTION)
 
     if not files_to_index:
         logger.warning("所有文件都未能成功保存以进行处理。")
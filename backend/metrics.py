@@ -0,0 +1,188 @@
+# backend/metrics.py
+# 进程内指标：计数器 / 仪表 / 直方图，按 Prometheus 文本格式导出；stage_timer 记录各阶段耗时
+
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("gadgetguide_ai.metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+def _label_key(labelnames: Sequence[str], labels: dict) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: Sequence[str], key: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def _render_samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各桶计数..., 总次数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            data = self._values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += 1
+            data[-1] += value
+
+    def _render_samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, data in items:
+            for i, bound in enumerate(self.buckets):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {data[i]}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {data[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {data[-1]}")
+        return lines
+
+
+def render_prometheus() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# === 业务指标 ===
+STAGE_DURATION = Histogram(
+    "gadgetguide_stage_duration_seconds",
+    "各处理阶段耗时（嵌入、FAISS 检索、LLM、数据库写入、索引构建等）",
+    ["stage"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "gadgetguide_http_request_duration_seconds",
+    "HTTP 请求总耗时",
+    ["method", "route", "status"],
+)
+CACHE_EVENTS = Counter(
+    "gadgetguide_cache_events_total",
+    "缓存 / 请求合并命中情况",
+    ["cache", "result"],
+)
+FREE_GENERATION_FALLBACKS = Counter(
+    "gadgetguide_free_generation_fallbacks_total",
+    "知识库无可用片段、回退为 AI 自由生成的次数",
+)
+LLM_ERRORS = Counter(
+    "gadgetguide_llm_errors_total",
+    "LLM 调用失败次数",
+)
+ADMISSION_REJECTIONS = Counter(
+    "gadgetguide_admission_rejections_total",
+    "准入控制拒绝次数",
+    ["reason"],
+)
+INDEX_VECTORS = Gauge(
+    "gadgetguide_index_vectors",
+    "已加载的 FAISS 索引向量数（按集合）",
+    ["collection"],
+)
+MESSAGE_COMMIT_BATCH = Histogram(
+    "gadgetguide_message_commit_batch_size",
+    "聊天消息组提交：每次提交写入的消息数",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+
+
+# === 请求级耗时明细（用于 Server-Timing 响应头） ===
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+def start_request_spans() -> List[Tuple[str, float]]:
+    spans: List[Tuple[str, float]] = []
+    _request_spans.set(spans)
+    return spans
+
+
+def format_server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    merged: Dict[str, float] = {}
+    for stage, seconds in list(spans):
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in merged.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """记录一个处理阶段的耗时：写入直方图，并附加到当前请求的耗时明细中。"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
@@ -0,0 +1,132 @@
+# backend/product_catalog.py
+# 产品目录：建索引时从文档元数据收集产品名，生成别名后用 Aho-Corasick 自动机对问题做一次线性扫描，
+# 识别问题中提到的目录内产品（用于对比问题路由）
+
+import os
+import re
+import json
+import logging
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("gadgetguide_ai.product_catalog")
+
+PRODUCT_CATALOG_FILE = "product_catalog.json"  # 位于各集合的索引目录中
+
+# 中文与英文 / 数字之间的空格可有可无（“华为 Mate 60” / “华为Mate 60”），统一去掉
+_CJK_SPACE_PATTERN = re.compile(r"\s+(?=[^\x00-\x7f])|(?<=[^\x00-\x7f])\s+")
+
+
+def _normalize(text: str) -> str:
+    """全角/半角统一、大小写折叠、压缩空白（与 qa_handler.normalize_query 一致），再去掉中文两侧的空格。"""
+    return _CJK_SPACE_PATTERN.sub("", " ".join(unicodedata.normalize("NFKC", text).casefold().split()))
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class AhoCorasick:
+    """多模式串匹配自动机：构建 O(模式总长)，匹配 O(文本长度 + 命中数)。"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """产出 (起始下标, 结束下标, 模式串)。"""
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern in self._output[state]:
+                yield i - len(pattern) + 1, i + 1, pattern
+
+
+class ProductCatalog:
+    """产品名 → 别名（规范化形式、去空格形式），匹配结果按在问题中出现的顺序返回规范产品名。"""
+
+    def __init__(self, products: Iterable[str]):
+        self.products = sorted({p.strip() for p in products if p and p.strip()})
+        self._aliases: Dict[str, str] = {}
+        for product in self.products:
+            normalized = _normalize(product)
+            for alias in (normalized, normalized.replace(" ", ""), normalized.replace("-", " ")):
+                if len(alias) >= 2:
+                    self._aliases.setdefault(alias, product)
+        self._matcher = AhoCorasick(self._aliases)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def find(self, query: str) -> List[str]:
+        """问题中出现的目录产品（去重、按出现顺序）；重叠命中取最长者，英文数字命中须在词边界上。"""
+        text = _normalize(query)
+        candidates = []
+        for start, end, alias in self._matcher.iter_matches(text):
+            if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                continue
+            if end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                continue
+            candidates.append((start, -(end - start), end, alias))
+        found, covered_until = [], -1
+        for start, _, end, alias in sorted(candidates):
+            if start < covered_until:
+                continue
+            covered_until = end
+            product = self._aliases[alias]
+            if product not in found:
+                found.append(product)
+        return found
+
+
+def load_catalog_products(index_path: str) -> Optional[List[str]]:
+    """读取目录文件；文件不存在（旧索引）或损坏时返回 None。"""
+    try:
+        with open(os.path.join(index_path, PRODUCT_CATALOG_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)["products"]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"读取产品目录失败: {e}")
+        return None
+
+
+def save_catalog(products: Iterable[str], index_path: str):
+    """保存目录文件（建索引时由索引中全部片段的产品元数据生成，整体覆盖）。"""
+    names = sorted({p for p in products if p})
+    with open(os.path.join(index_path, PRODUCT_CATALOG_FILE), "w", encoding="utf-8") as f:
+        json.dump({"products": names}, f, ensure_ascii=False, indent=2)
+    logger.info(f"产品目录已保存，共 {len(names)} 个产品。")
@@ -0,0 +1,399 @@
+# backend/profiling.py
+# 在线性能剖析（管理员按需开启，见 /admin/profile 与 /admin/memory/*）：
+# - 采样剖析：后台线程每隔 interval 读取一次目标线程的 Python 调用栈并计数，输出折叠栈文本
+#   （"帧;帧;帧 次数"，可直接交给 flamegraph.pl / speedscope / inferno 生成火焰图）。
+#   目标可以是接下来 N 个 /ask 或 send_message 请求（只采样处理这些请求的线程），也可以是一段时间窗口。
+# - 内存快照：各集合的 FAISS 索引、docstore、片段查找表 / 产品目录、语义答案缓存的占用，
+#   以及 tracemalloc 开启后按代码位置统计的 Python 内存分配（含相对开启时的增量）。
+# 未开启剖析时没有采样线程，请求处理只多一次全局变量判断；tracemalloc 只在管理员开启期间追踪。
+
+import sys
+import time
+import threading
+import tracemalloc
+import logging
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Optional
+
+from .config import PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_SECONDS, PROFILE_MAX_STACK_DEPTH
+
+logger = logging.getLogger("gadgetguide_ai.profiling")
+
+PROFILED_ROUTES = ("ask", "send_message")
+
+
+class ProfileBusy(RuntimeError):
+    pass
+
+
+# ==== 采样剖析 ====
+
+_frame_labels: dict = {}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    label = _frame_labels.get(code)
+    if label is None:
+        module = frame.f_globals.get("__name__") or code.co_filename
+        qualname = getattr(code, "co_qualname", code.co_name)
+        label = f"{module}:{qualname}".replace(";", ":").replace(" ", "_")
+        _frame_labels[code] = label
+    return label
+
+
+def _collapse(frame, max_depth: int) -> str:
+    """调用栈 → 折叠栈（从最外层到当前帧，以分号连接）。"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class ProfileSession:
+    """
+    一次采样剖析。route 为 ask / send_message / any（任一被剖析的接口）时只采样正在处理这些请求的线程，
+    requests 个请求完成后结束；route 为 all 时采样进程内全部线程（含事件循环线程），只能按时间窗口结束。
+    """
+
+    def __init__(self, session_id: int, route: str, requests: Optional[int], seconds: float, interval: float):
+        self.id = session_id
+        self.route = route
+        self.requests = requests
+        self.seconds = seconds
+        self.interval = interval
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.sampling_seconds = 0.0
+        self._deadline = time.monotonic() + seconds
+        self._lock = threading.Lock()
+        self._claimed = 0
+        self.completed = 0
+        self._threads: dict[int, str] = {}  # 线程 id -> 请求路由
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def claim(self, route: str) -> bool:
+        """请求开始时调用：该请求需要被采样则占用一个名额并返回 True。"""
+        with self._lock:
+            if self.finished or self.route == "all" or self.route not in ("any", route):
+                return False
+            if self.requests is not None and self._claimed >= self.requests:
+                return False
+            self._claimed += 1
+            return True
+
+    def enter(self, thread_id: int, route: str):
+        with self._lock:
+            self._threads[thread_id] = route
+
+    def exit(self, thread_id: int):
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            self.completed += 1
+            done = self.requests is not None and self.completed >= self.requests
+        if done:
+            self.finish()
+
+    def finish(self):
+        if not self._done.is_set():
+            self.finished_at = time.time()
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _sample(self, own_thread: int):
+        started = time.perf_counter()
+        if self.route == "all":
+            names = {t.ident: t.name for t in threading.enumerate()}
+            targets = None
+        else:
+            with self._lock:
+                targets = dict(self._threads)
+            if not targets:
+                return
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            if targets is None:
+                root = f"thread:{names.get(thread_id, thread_id)}".replace(";", ":").replace(" ", "_")
+            elif thread_id in targets:
+                root = f"route:{targets[thread_id]}"
+            else:
+                continue
+            self.samples[f"{root};{_collapse(frame, PROFILE_MAX_STACK_DEPTH)}"] += 1
+            self.sample_count += 1
+        self.sampling_seconds += time.perf_counter() - started
+
+    def run(self):
+        """采样线程主循环：直到请求数达到、时间窗口结束或被停止。"""
+        own_thread = threading.get_ident()
+        while not self._done.is_set():
+            if time.monotonic() >= self._deadline:
+                self.finish()
+                break
+            self._sample(own_thread)
+            self._done.wait(self.interval)
+        with self._lock:
+            self._threads.clear()
+        logger.info(f"采样剖析 #{self.id} 结束：{self.completed} 个请求，{self.sample_count} 个样本。")
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def status(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "id": self.id,
+            "route": self.route,
+            "requests": self.requests,
+            "completed_requests": self.completed,
+            "seconds": self.seconds,
+            "interval_ms": round(self.interval * 1000, 3),
+            "finished": self.finished,
+            "started_at": int(self.started_at),
+            "elapsed_seconds": round(elapsed, 3),
+            "samples": self.sample_count,
+            "distinct_stacks": len(self.samples),
+            # 采样本身的耗时占比（采样期间持有 GIL，可据此估计对请求的影响）
+            "sampling_overhead": round(self.sampling_seconds / elapsed, 4) if elapsed > 0 else 0.0,
+        }
+
+
+_session: Optional[ProfileSession] = None  # 进行中的剖析（请求处理路径只读取这个变量）
+_last_session: Optional[ProfileSession] = None
+_session_lock = threading.Lock()
+_next_id = 0
+
+
+def start_profile(route: str, requests: Optional[int] = None, seconds: Optional[float] = None,
+                  interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS) -> ProfileSession:
+    """开始一次采样剖析；已有剖析在进行时抛出 ProfileBusy。"""
+    global _session, _last_session, _next_id
+    if route not in (*PROFILED_ROUTES, "any", "all"):
+        raise ValueError(f"未知的剖析目标: {route}（可选 {', '.join(PROFILED_ROUTES)} / any / all）")
+    if route == "all" and requests is not None:
+        raise ValueError("route=all 只能按时间窗口剖析（请指定 seconds 而不是 requests）")
+    if requests is None and seconds is None:
+        raise ValueError("请指定 requests（接下来 N 个请求）或 seconds（时间窗口）")
+    seconds = min(seconds if seconds is not None else PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+    with _session_lock:
+        if _session is not None and not _session.finished:
+            raise ProfileBusy(f"采样剖析 #{_session.id} 正在进行")
+        _next_id += 1
+        session = ProfileSession(_next_id, route, requests, seconds, max(interval_ms, 0.5) / 1000.0)
+        _session = _last_session = session
+    threading.Thread(target=_run_session, args=(session,), name=f"profiler-{session.id}", daemon=True).start()
+    logger.info(f"采样剖析 #{session.id} 开始：route={route}，requests={requests}，最长 {seconds}s。")
+    return session
+
+
+def _run_session(session: ProfileSession):
+    global _session
+    try:
+        session.run()
+    finally:
+        with _session_lock:
+            if _session is session:
+                _session = None
+
+
+def stop_profile() -> Optional[ProfileSession]:
+    session = _session
+    if session is not None:
+        session.finish()
+    return session
+
+
+def last_profile() -> Optional[ProfileSession]:
+    return _last_session
+
+
+@contextmanager
+def profiled_request(route: str):
+    """包住需要被剖析的请求处理（同步接口，在线程池线程中执行）；未开启剖析时只判断一次全局变量。"""
+    session = _session
+    if session is None or not session.claim(route):
+        yield
+        return
+    thread_id = threading.get_ident()
+    session.enter(thread_id, route)
+    try:
+        yield
+    finally:
+        session.exit(thread_id)
+
+
+# ==== 内存占用 ====
+
+def faiss_index_bytes(index) -> int:
+    """FAISS 索引的向量编码与 id 映射占用（C++ 内存，tracemalloc 统计不到）。"""
+    if index is None:
+        return 0
+    try:
+        size = index.sa_code_size() * index.ntotal
+        if hasattr(index, "id_map"):
+            size += 8 * index.ntotal
+        return size
+    except Exception:
+        import faiss
+        return int(faiss.serialize_index(index).nbytes)
+
+
+_OPAQUE_TYPES = (type, type(sys), type(len), type(_frame_label), type(threading.Lock()), threading.Thread)
+
+
+def deep_sizeof(obj, max_objects: int = 5_000_000) -> int:
+    """对象及其引用的容器 / 实例属性的总大小（估计值，共享对象只计一次；numpy 数组计数据区，FAISS 索引计编码）。"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < max_objects:
+        item = stack.pop()
+        if item is None or id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, _OPAQUE_TYPES):
+            continue
+        if hasattr(item, "sa_code_size") and hasattr(item, "ntotal"):
+            total += faiss_index_bytes(item)
+            continue
+        nbytes = getattr(item, "nbytes", None)
+        if isinstance(nbytes, int) and hasattr(item, "dtype"):
+            total += sys.getsizeof(item) if getattr(item, "base", None) is None else nbytes
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(item, dict):
+            for key, value in list(item.items()):
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(list(item))
+        else:
+            attributes = getattr(item, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(item), "__slots__", ()):
+                value = getattr(item, slot, None)
+                if value is not None:
+                    stack.append(value)
+    return total
+
+
+def _mb(size: int) -> float:
+    return round(size / 2**20, 3)
+
+
+def memory_components() -> dict:
+    """各集合已加载对象的内存占用（MB）。"""
+    from .qa_handler import memory_holders
+
+    collections = {}
+    for collection, holders in memory_holders().items():
+        db = holders["vector_db"]
+        report = {
+            "faiss_index_mb": _mb(faiss_index_bytes(db.index)) if db is not None else 0.0,
+            "vectors": db.index.ntotal if db is not None else 0,
+            "docstore_mb": _mb(deep_sizeof(db.docstore)) if db is not None else 0.0,
+            "docstore_id_map_mb": _mb(deep_sizeof(db.index_to_docstore_id)) if db is not None else 0.0,
+            "chunk_lookup_mb": _mb(deep_sizeof(holders["chunk_lookup"])),
+            "product_catalog_mb": _mb(deep_sizeof(holders["product_catalog"])),
+            "tombstones_mb": _mb(deep_sizeof(holders["dead_ids"])),
+            "answer_cache_mb": _mb(deep_sizeof(holders["answer_cache"])),
+        }
+        report["total_mb"] = round(sum(v for k, v in report.items() if k.endswith("_mb")), 3)
+        collections[collection] = report
+    return collections
+
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def start_tracemalloc(frames: int = 25) -> dict:
+    """开始追踪 Python 内存分配，并记录基线快照（之后的快照附带相对基线的增量）。"""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, frames))
+        _baseline = _take_snapshot()
+        logger.info(f"tracemalloc 已开启（保留 {frames} 帧）。")
+    return tracemalloc_status()
+
+
+def stop_tracemalloc() -> dict:
+    global _baseline
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        logger.info("tracemalloc 已关闭。")
+    _baseline = None
+    return tracemalloc_status()
+
+
+def tracemalloc_status() -> dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+        "traced_mb": _mb(current),
+        "traced_peak_mb": _mb(peak),
+    }
+
+
+def _statistic_entry(stat) -> dict:
+    frame = stat.traceback[-1]
+    return {"location": f"{frame.filename}:{frame.lineno}", "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+
+
+def memory_snapshot(top: int = 20, group_by: str = "lineno") -> dict:
+    """内存快照：进程常驻内存、各集合组件占用；tracemalloc 开启时附带分配最多的代码位置与相对基线的增量。"""
+    from .knowledge_base_processor import current_rss_mb
+
+    rss = current_rss_mb()
+    report = {
+        "rss_mb": round(rss, 3) if rss is not None else None,
+        "collections": memory_components(),
+        "tracemalloc": tracemalloc_status(),
+    }
+    if tracemalloc.is_tracing():
+        snapshot = _take_snapshot()
+        report["top_allocations"] = [_statistic_entry(s) for s in snapshot.statistics(group_by)[:top]]
+        if _baseline is not None:
+            report["growth_since_start"] = [
+                {**_statistic_entry(s), "size_diff_kb": round(s.size_diff / 1024, 1), "count_diff": s.count_diff}
+                for s in snapshot.compare_to(_baseline, group_by)[:top]
+            ]
+    return report
+
+
+def memory_snapshot_collapsed() -> str:
+    """tracemalloc 快照的折叠栈（值为字节数），可生成内存火焰图；未开启 tracemalloc 时返回空字符串。"""
+    if not tracemalloc.is_tracing():
+        return ""
+    lines = []
+    for stat in _take_snapshot().statistics("traceback"):
+        stack = ";".join(f"{frame.filename}:{frame.lineno}".replace(";", ":").replace(" ", "_")
+                         for frame in stat.traceback)
+        lines.append(f"{stack} {stat.size}\n")
+    return "".join(lines)
@@ -1,40 +1,230 @@
 # backend/qa_handler.py
 
-import requests
 import os
 import re
 import logging
+import threading
+import time
+import unicodedata
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Iterator, Optional
 
-from langchain_ollama import OllamaEmbeddings
-from .knowledge_base_processor import load_faiss_index
-from .config import OLLAMA_EMBEDDING_MODEL, DEEPSEEK_API_KEY
+from .knowledge_base_processor import load_faiss_index, load_tombstones
+from .context_packer import pack_context
+from .chunk_metadata import ChunkLookup, render_chunk
+from .product_catalog import ProductCatalog, load_catalog_products
+from .kb_collections import DEFAULT_COLLECTION, IndexLRU, index_disk_bytes, collection_index_path
+from .llm_backend import get_llm_backend, LLMError
+from .metrics import (
+    stage_timer, STAGE_DURATION, CACHE_EVENTS, FREE_GENERATION_FALLBACKS, LLM_ERRORS, INDEX_VECTORS,
+)
+from .answer_cache import SemanticAnswerCache
+from .config import (
+    LLM_API_KEY, BATCH_LLM_CONCURRENCY, COLLECTION_MEMORY_BUDGET_MB,
+    ANSWER_CACHE_ENABLED, ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS,
+)
 
 logger = logging.getLogger("gadgetguide_ai.qa")
 
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
-DEEPSEEK_MODEL_NAME = "deepseek-chat"
+def _record_index_size(collection: str, db):
+    INDEX_VECTORS.set(db.index.ntotal if db is not None else 0, collection=collection)
 
-vector_db = load_faiss_index()
 
+def _load_collection_index(collection: str):
+    with stage_timer("index_load"):
+        db = load_faiss_index(collection)
+        _register_tombstones(collection, db)
+    _record_index_size(collection, db)
+    return db
 
-def reload_vector_db():
-    global vector_db
-    vector_db = load_faiss_index()
+
+# 已删除文件的片段（墓碑）对应的向量 id，随索引对象缓存（弱引用）；检索时在 FAISS 内部排除
+_dead_ids: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _register_tombstones(collection: str, db):
+    if db is None:
+        return
+    tombstones = load_tombstones(collection)
+    if not tombstones:
+        return
+    import numpy as np
+
+    dead = np.fromiter(
+        (position for position, docstore_id in db.index_to_docstore_id.items() if docstore_id in tombstones),
+        dtype=np.int64,
+    )
+    if len(dead):
+        _dead_ids[db] = dead
+
+
+def dead_vector_count(db) -> int:
+    """索引中已删除但尚未压缩的向量数。"""
+    dead = _dead_ids.get(db) if db is not None else None
+    return 0 if dead is None else len(dead)
+
+
+# 各集合的索引在首次使用时（或应用启动后的后台预热中）才加载，导入本模块不会触发 FAISS / LangChain 导入；
+# 同时载入的索引总大小受 COLLECTION_MEMORY_BUDGET_MB 限制，超出后按 LRU 淘汰
+_indexes = IndexLRU(
+    _load_collection_index,
+    index_disk_bytes,
+    int(COLLECTION_MEMORY_BUDGET_MB * 2**20),
+    on_evict=lambda collection: _record_index_size(collection, None),
+)
+# 索引版本号：每次重新加载集合索引后递增，用于区分不同索引下的相同问题（LRU 淘汰后重新载入不改变版本）
+_index_versions: dict[str, int] = {}
+
+
+def index_version(collection: str = DEFAULT_COLLECTION) -> int:
+    return _index_versions.get(collection, 0)
+
+
+def get_vector_db(collection: str = DEFAULT_COLLECTION):
+    """返回集合的索引，首次调用（或被淘汰后再次调用）时加载，并发调用只加载一次。"""
+    return _indexes.get(collection)
+
+
+def reload_vector_db(collection: str = DEFAULT_COLLECTION, content_changed: bool = True):
+    """
+    重新加载集合索引。content_changed=False（如压缩后，可检索内容不变）时不递增索引版本，保留语义缓存。
+    """
+    vector_db = load_faiss_index(collection)
+    _register_tombstones(collection, vector_db)
+    _indexes.put(collection, vector_db)
+    if content_changed:
+        _index_versions[collection] = index_version(collection) + 1
+    _record_index_size(collection, vector_db)
     if vector_db:
-        logger.info("FAISS 索引已在 qa_handler 中重新加载。")
+        logger.info(f"集合 '{collection}' 的 FAISS 索引已在 qa_handler 中重新加载。")
     else:
-        logger.warning("FAISS 索引在 qa_handler 中重新加载失败或索引为空。")
+        logger.warning(f"集合 '{collection}' 的 FAISS 索引在 qa_handler 中重新加载失败或索引为空。")
     return vector_db
 
 
-def retrieve_context(query: str, k: int = 5, threshold: float = 0.65) -> dict:
+def loaded_collections() -> dict:
+    """索引 LRU 的内存占用与已加载集合（管理接口使用）。"""
+    return _indexes.stats()
+
+
+# 片段查找表与产品目录随索引对象缓存（弱引用），索引被淘汰或替换后一并回收
+_chunk_lookups: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_product_catalogs: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_derived_lock = threading.Lock()
+
+
+def get_chunk_lookup(db):
+    """索引的片段查找表（向量 id → 来源文件 / 页码 / 产品），按索引对象缓存，首次按来源过滤时建立。"""
+    lookup = _chunk_lookups.get(db)
+    if lookup is None:
+        with stage_timer("chunk_lookup_build"):
+            lookup = ChunkLookup(db)
+        with _derived_lock:
+            _chunk_lookups[db] = lookup
+    return lookup
+
+
+def get_product_catalog(db, collection: str = DEFAULT_COLLECTION) -> Optional[ProductCatalog]:
+    """索引的产品目录（Aho-Corasick 自动机），按索引对象缓存；旧索引没有目录文件时由片段查找表生成。"""
+    if db is None:
+        return None
+    catalog = _product_catalogs.get(db)
+    if catalog is None:
+        with stage_timer("product_catalog_build"):
+            products = load_catalog_products(collection_index_path(collection))
+            if products is None:
+                products = get_chunk_lookup(db).products
+            catalog = ProductCatalog(products)
+        with _derived_lock:
+            _product_catalogs[db] = catalog
+        logger.info(f"集合 '{collection}' 的产品目录已加载，共 {len(catalog)} 个产品。")
+    return catalog
+
+
+def _search_params(index, selector):
+    """带 IDSelector 的检索参数，保留 IVF 的 nprobe / HNSW 的 efSearch 设置。"""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def _faiss_search(db, vectors, k: int, id_filter=None):
+    """
+    以矩阵形式检索（与 LangChain similarity_search_with_score_by_vector 的打分一致），返回 (scores, indices)。
+    id_filter 为允许的向量 id 数组时，过滤在 FAISS 检索内部完成；已删除（墓碑）的向量总是被排除。
+    """
+    import faiss
+    import numpy as np
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if db._normalize_L2:
+        faiss.normalize_L2(matrix)
+    dead = _dead_ids.get(db)
+    if id_filter is None and dead is None:
+        return db.index.search(matrix, k)
+    if id_filter is not None:
+        if dead is not None:
+            id_filter = np.setdiff1d(id_filter, dead, assume_unique=True)
+        selector = faiss.IDSelectorBatch(id_filter)
+    else:
+        excluded = faiss.IDSelectorBatch(dead)
+        selector = faiss.IDSelectorNot(excluded)
+    return db.index.search(matrix, k, params=_search_params(db.index, selector))
+
+
+def _to_documents(db, scores, indices, threshold: float):
+    results = []
+    for score, idx in zip(scores, indices):
+        if idx == -1 or score < threshold:
+            continue
+        results.append((db.docstore.search(db.index_to_docstore_id[idx]), float(score)))
+    return results
+
+
+def search_with_threshold(db, query_embedding, k: int, threshold: float, id_filter=None):
+    """在给定索引中检索 k 个片段并按分数阈值过滤，返回 [(Document, score)]（检索评估复用同一逻辑）。"""
+    with stage_timer("faiss_search"):
+        scores, indices = _faiss_search(db, [query_embedding], k, id_filter)
+    return _to_documents(db, scores[0], indices[0], threshold)
+
+
+def retrieve_context(
+    query: str,
+    k: int = 5,
+    threshold: float = 0.65,
+    source_files: Optional[list[str]] = None,
+    pages: Optional[list[int]] = None,
+    products: Optional[list[str]] = None,
+    query_embedding=None,
+    collection: str = DEFAULT_COLLECTION,
+) -> dict:
+    """
+    在指定集合中检索上下文；可按来源文件名、页码（从 1 开始）、产品名限定检索范围（在 FAISS 检索内部过滤）。
+    已算好的问题向量可通过 query_embedding 传入，避免重复嵌入。
+    """
+    vector_db = get_vector_db(collection)
     if vector_db is None:
         logger.warning(f"retrieve_context (query: '{query}', k:{k}): 知识库索引未加载。")
         return {"error": "知识库索引未加载，请先处理知识库文档。"}
     try:
         logger.info(f"retrieve_context: 正在为查询 '{query}' 检索上下文 (k={k}, 阈值={threshold})...")
-        results = vector_db.similarity_search_with_score(query, k=k)
-        filtered_chunks = [doc.page_content for doc, score in results if score >= threshold]
+        id_filter = None
+        if source_files is not None or pages is not None or products is not None:
+            id_filter = get_chunk_lookup(vector_db).ids_matching(source_files, pages, products)
+            logger.info(f"retrieve_context: 过滤条件匹配 {len(id_filter)} 个片段")
+            if len(id_filter) == 0:
+                return {"retrieved_chunks": []}
+        if query_embedding is None:
+            with stage_timer("query_embedding"):
+                query_embedding = vector_db._embed_query(query)
+        results = search_with_threshold(vector_db, query_embedding, k, threshold, id_filter)
+        filtered_chunks = [render_chunk(doc) for doc, _ in results]
         logger.info(f"retrieve_context: 过滤后命中 {len(filtered_chunks)} 个片段（分数阈值 {threshold}）")
         return {"retrieved_chunks": filtered_chunks}
     except Exception as e:
@@ -42,27 +232,26 @@ def retrieve_context(query: str, k: int = 5, threshold: float = 0.65) -> dict:
         return {"error": f"检索上下文时出错: {e}"}
 
 
-def extract_comparison_entities_refined(query: str) -> list[str]:
-    """
-    通用化的对比实体提取函数：
-    - 不再仅限于 iPhone，而是适配任意英文/数字/连字符/空格组合的实体
-    - 仍使用关键词判断是否是对比问题
-    """
-    pattern = r"([a-zA-Z0-9\- ]{2,})"
-    comparison_keywords = ["对比", "区别", "升级", "和...相比", "与...比较", "差异", "不同点"]
-    query_lower = query.lower()
-    is_likely_comparison = any(keyword in query for keyword in comparison_keywords) and \
-                           ("和" in query or "与" in query or "跟" in query)
-    if is_likely_comparison:
-        found_entities = re.findall(pattern, query)
-        normalized_entities = sorted(list(set([name.strip() for name in found_entities if len(name.strip()) > 1])))
-        if len(normalized_entities) >= 2:
-            logger.info(f"extract_comparison_entities_refined: 识别到对比实体: {normalized_entities} 从查询: '{query}'")
-            return normalized_entities[:2]  # 只返回前两个实体
-        else:
-            logger.debug(f"extract_comparison_entities_refined: 未能提取到至少两个实体。找到: {normalized_entities}")
-    else:
+COMPARISON_KEYWORDS = ("对比", "区别", "升级", "相比", "比较", "差异", "不同点", "vs")
+
+
+def extract_comparison_entities_refined(query: str, collection: str = DEFAULT_COLLECTION) -> list[str]:
+    """
+    对比实体提取：问题含对比关键词时，用产品目录（建索引时生成）的 Aho-Corasick 自动机一次扫描问题，
+    返回前两个目录内产品（按在问题中出现的顺序）；不足两个时返回空列表，按普通问题检索。
+    """
+    normalized = normalize_query(query)
+    if not any(keyword in normalized for keyword in COMPARISON_KEYWORDS):
         logger.debug(f"extract_comparison_entities_refined: 查询 '{query}' 未被识别为对比性查询。")
+        return []
+    catalog = get_product_catalog(get_vector_db(collection), collection)
+    if not catalog:
+        return []
+    entities = catalog.find(normalized)
+    if len(entities) >= 2:
+        logger.info(f"extract_comparison_entities_refined: 识别到对比实体: {entities[:2]} 从查询: '{query}'")
+        return entities[:2]  # 只返回前两个实体
+    logger.debug(f"extract_comparison_entities_refined: 未能识别到至少两个目录内产品。找到: {entities}")
     return []
 
 
@@ -79,21 +268,22 @@ def chunks_relevant_to_query(chunks: list[str], query: str, min_hits: int = 1) -
     return hits >= min_hits
 
 
-def generate_answer_from_llm(
+FREE_GENERATION_TAG = "【以下为AI自动生成，仅供参考】"
+
+
+def build_answer_prompt(
     original_query: str,
     context_chunks: list[str],
     is_comparison: bool = False,
     allow_free_gen: bool = False
-) -> dict:
+) -> str:
     """
-    调用 DeepSeek API 生成答案。
+    构造发送给 LLM 的提示词（普通 / 流式回答共用）。
     - 提示词根据上下文情况动态调整，增强回答质量。
     """
-    if not DEEPSEEK_API_KEY:
-        logger.error("generate_answer_from_llm: DEEPSEEK_API_KEY 未配置。")
-        return {"error": "AI 服务配置不完整 (API Key缺失)。"}
-
-    context_str = "\n\n---\n\n".join(context_chunks)
+    # 合并重叠片段、去重、按 token 预算裁剪后再拼接
+    with stage_timer("context_packing"):
+        context_str = "\n\n---\n\n".join(pack_context(context_chunks))
 
     # === 优化后的 Prompt Instruction，细化对比 / 普通 / 自由生成场景
     if is_comparison:
@@ -125,85 +315,380 @@ def generate_answer_from_llm(
 
 请给出您的详细、专业的回答：
 """
+    return prompt_template
 
-    logger.debug(f"generate_answer_from_llm: 发送给 LLM 的 Prompt:\n{prompt_template}\n")
 
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": DEEPSEEK_MODEL_NAME,
-        "messages": [{"role": "user", "content": prompt_template}],
-        "max_tokens": 1500,
-        "temperature": 0.3,
-    }
+def generate_answer_from_llm(
+    original_query: str,
+    context_chunks: list[str],
+    is_comparison: bool = False,
+    allow_free_gen: bool = False
+) -> dict:
+    """
+    调用 LLM 服务（默认 DeepSeek，见 llm_backend）生成答案。
+    """
+    if not LLM_API_KEY:
+        logger.error("generate_answer_from_llm: DEEPSEEK_API_KEY / LLM_API_KEY 未配置。")
+        return {"error": "AI 服务配置不完整 (API Key缺失)。"}
+
+    prompt_template = build_answer_prompt(original_query, context_chunks, is_comparison, allow_free_gen)
+
+    logger.debug(f"generate_answer_from_llm: 发送给 LLM 的 Prompt:\n{prompt_template}\n")
 
+    llm = get_llm_backend()
     try:
-        logger.info(f"generate_answer_from_llm: 正在调用 DeepSeek API (模型: {DEEPSEEK_MODEL_NAME})...")
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        response_data = response.json()
-        if response_data.get("choices") and len(response_data["choices"]) > 0:
-            message_content = response_data["choices"][0].get("message", {}).get("content", "")
-            if message_content:
-                logger.info("generate_answer_from_llm: 成功获取到答案。")
-                return {"answer": message_content.strip()}
-            else:
-                logger.warning("generate_answer_from_llm: DeepSeek API 返回了空的答案。")
-                return {"error": "AI 服务返回了空的答案内容。"}
-        else:
-            logger.error(f"generate_answer_from_llm: DeepSeek API 响应格式不符合预期: {response_data}")
-            return {"error": "AI 服务响应格式不正确。"}
-    except requests.exceptions.Timeout:
-        logger.error("generate_answer_from_llm: DeepSeek API 超时。")
-        return {"error": "AI 服务请求超时，请稍后再试。"}
-    except requests.exceptions.RequestException as e:
-        logger.error(f"generate_answer_from_llm: DeepSeek API 请求错误: {e}", exc_info=True)
-        return {"error": f"与 AI 服务通信时发生错误: {e}"}
+        logger.info(f"generate_answer_from_llm: 正在调用 LLM 服务 ({llm.name})...")
+        with stage_timer("llm_completion"):
+            message_content = llm.complete(
+                [{"role": "user", "content": prompt_template}],
+                max_tokens=1500,
+                temperature=0.3,
+            )
+    except LLMError as e:
+        LLM_ERRORS.inc()
+        return {"error": str(e)}
     except Exception as e:
+        LLM_ERRORS.inc()
         logger.error(f"generate_answer_from_llm: 处理 LLM 响应或未知错误: {e}", exc_info=True)
         return {"error": f"处理 AI 服务响应时发生未知错误: {e}"}
 
+    if message_content:
+        logger.info("generate_answer_from_llm: 成功获取到答案。")
+        return {"answer": message_content.strip()}
+    logger.warning("generate_answer_from_llm: LLM 服务返回了空的答案。")
+    return {"error": "AI 服务返回了空的答案内容。"}
 
-def get_final_answer(query: str) -> dict:
+
+class _SingleFlight:
     """
-    核心对话入口：智能判断是否对比问题，是否有可用知识库，智能切换自由生成/基于知识的回答。
+    请求合并：相同 key 的并发调用只真正执行一次，其余调用方等待并共享同一结果。
     """
-    logger.info(f"get_final_answer: 开始处理查询: '{query}'")
-    is_comparison = False
 
-    # 先判断是否是对比问题
-    comparison_entities = extract_comparison_entities_refined(query)
-    context_chunks = []
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+        if not is_leader:
+            CACHE_EVENTS.inc(cache="singleflight", result="hit")
+            logger.info(f"single-flight: 复用进行中的相同请求结果 (key={key!r})")
+            return future.result()
+        CACHE_EVENTS.inc(cache="singleflight", result="miss")
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+_inflight_answers = _SingleFlight()
+
+
+def normalize_query(query: str) -> str:
+    """全角/半角统一、大小写折叠并压缩空白，用于判断两个问题是否相同。"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def get_final_answer(query: str, collection: str = DEFAULT_COLLECTION, use_cache: bool = True) -> dict:
+    """
+    对外问答入口：相同问题（规范化后）在同一索引版本下的并发请求只检索、调用 LLM 一次。
+    use_cache=False 时不查询、不写入语义答案缓存（聊天中拼接了会话历史的提示词，见 _cached_answer）。
+    """
+    key = (normalize_query(query), collection, index_version(collection), use_cache)
+    with stage_timer("get_final_answer"):
+        return dict(_inflight_answers.do(key, _answer_query, query, collection, use_cache))
+
+
+def _retrieval_requests(query: str, collection: str = DEFAULT_COLLECTION) -> tuple[list[tuple[str, int]], bool]:
+    """
+    判断是否对比问题，返回需要检索的 [(检索文本, k)] 与 is_comparison。
+    """
+    comparison_entities = extract_comparison_entities_refined(query, collection)
     if comparison_entities:
-        is_comparison = True
-        temp_context_set = set()
         k_per_entity = 5
-        for entity_name in comparison_entities:
-            entity_context_result = retrieve_context(entity_name, k=k_per_entity)
-            if entity_context_result.get("retrieved_chunks"):
-                for chunk in entity_context_result["retrieved_chunks"]:
-                    temp_context_set.add(chunk)
-        context_chunks = list(temp_context_set)
+        return [(entity_name, k_per_entity) for entity_name in comparison_entities], True
+    return [(query, 10)], False
+
+
+def _merge_context(query: str, retrieved: list[list[str]], is_comparison: bool) -> tuple[list[str], bool]:
+    """
+    合并各次检索的片段（对比问题去重），判断知识块是否可用，返回 (context_chunks, can_rag)。
+    """
+    if is_comparison:
+        # 按排名交替合并各实体的检索结果并去重：pack_context 按列表位置计算相关度与输出顺序，
+        # 顺序须确定，且各实体的高排名片段都排在前面
+        interleaved = (chunks[rank] for rank in range(max(map(len, retrieved), default=0))
+                       for chunks in retrieved if rank < len(chunks))
+        context_chunks = list(dict.fromkeys(interleaved))
     else:
-        context_result = retrieve_context(query, k=10)
-        context_chunks = context_result.get("retrieved_chunks", [])
+        context_chunks = retrieved[0] if retrieved else []
 
     # 如果知识块无用，则走自由生成
-    can_rag = len(context_chunks) > 0 and chunks_relevant_to_query(context_chunks, query)
+    with stage_timer("relevance_check"):
+        can_rag = len(context_chunks) > 0 and chunks_relevant_to_query(context_chunks, query)
+    if not can_rag:
+        FREE_GENERATION_FALLBACKS.inc()
+    return context_chunks, can_rag
+
+
+def _plan_answer(query: str, query_embedding=None, collection: str = DEFAULT_COLLECTION) -> tuple[list[str], bool, bool]:
+    """
+    智能判断是否对比问题并检索知识库，返回 (context_chunks, is_comparison, can_rag)。
+    """
+    requests_to_run, is_comparison = _retrieval_requests(query, collection)
+    retrieved = [
+        retrieve_context(
+            text, k=k, query_embedding=query_embedding if text == query else None, collection=collection,
+        ).get("retrieved_chunks", [])
+        for text, k in requests_to_run
+    ]
+    context_chunks, can_rag = _merge_context(query, retrieved, is_comparison)
+    return context_chunks, is_comparison, can_rag
+
+
+# --- 语义答案缓存 ---
+# 每个集合一个缓存，与该集合的索引版本绑定
+_answer_caches: dict[str, SemanticAnswerCache] = {}
+_answer_caches_lock = threading.Lock()
+
+
+def get_answer_cache(collection: str = DEFAULT_COLLECTION) -> SemanticAnswerCache:
+    with _answer_caches_lock:
+        cache = _answer_caches.get(collection)
+        if cache is None:
+            cache = SemanticAnswerCache(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY)
+            _answer_caches[collection] = cache
+        return cache
+
+
+def answer_cache_stats() -> dict:
+    with _answer_caches_lock:
+        caches = dict(_answer_caches)
+    return {collection: cache.stats() for collection, cache in caches.items()}
+
+
+def clear_answer_caches():
+    with _answer_caches_lock:
+        caches = list(_answer_caches.values())
+    for cache in caches:
+        cache.clear()
+
+
+def memory_holders() -> dict:
+    """各集合当前占用内存的对象（索引、片段查找表、产品目录、答案缓存），供内存快照统计，不触发加载。"""
+    dbs = _indexes.loaded()
+    with _answer_caches_lock:
+        caches = dict(_answer_caches)
+    holders = {}
+    for collection in sorted(set(dbs) | set(caches)):
+        db = dbs.get(collection)
+        holders[collection] = {
+            "vector_db": db,
+            "chunk_lookup": _chunk_lookups.get(db) if db is not None else None,
+            "product_catalog": _product_catalogs.get(db) if db is not None else None,
+            "answer_cache": caches.get(collection),
+            "dead_ids": _dead_ids.get(db) if db is not None else None,
+        }
+    return holders
+
+
+def _cached_answer(query: str, collection: str = DEFAULT_COLLECTION) -> tuple[Optional[str], Optional[tuple]]:
+    """
+    嵌入问题并查询语义缓存，返回 (缓存答案或 None, 写回缓存所需的 (集合, 向量, 索引版本, 产品))。
+    缓存关闭、索引未加载或嵌入失败时返回 (None, None)，照常检索（检索会再次报告错误）。
+    缓存在用户之间共享，只用于单独的问题（/ask）：聊天提示词包含会话历史，仅末尾追问不同的两段提示词
+    也可能超过相似度阈值，命中会返回与追问不符、且依赖他人会话历史的答案。
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+    db = get_vector_db(collection)
+    if db is None:
+        return None, None
+    version = index_version(collection)
+    try:
+        with stage_timer("query_embedding"):
+            query_embedding = db._embed_query(query)
+    except Exception as e:
+        logger.warning(f"语义缓存：问题嵌入失败，跳过缓存: {e}")
+        return None, None
+    catalog = get_product_catalog(db, collection)
+    scope = frozenset(catalog.find(query)) if catalog else frozenset()
+    with stage_timer("answer_cache_lookup"):
+        answer = get_answer_cache(collection).lookup(query_embedding, version, scope)
+    CACHE_EVENTS.inc(cache="semantic_answer", result="hit" if answer is not None else "miss")
+    return answer, (collection, query_embedding, version, scope)
+
+
+def _remember_answer(query: str, cache_key: Optional[tuple], answer: str):
+    if cache_key is not None and answer.strip():
+        collection, query_embedding, version, scope = cache_key
+        get_answer_cache(collection).store(query, query_embedding, answer, version, scope)
+
+
+def _answer_query(query: str, collection: str = DEFAULT_COLLECTION, use_cache: bool = True) -> dict:
+    """
+    核心对话入口：先查语义缓存；未命中时智能判断是否对比问题，是否有可用知识库，智能切换自由生成/基于知识的回答。
+    """
+    logger.info(f"get_final_answer: 开始处理查询: '{query}'")
+    cached, cache_key = _cached_answer(query, collection) if use_cache else (None, None)
+    if cached is not None:
+        return {"answer": cached}
+    result = _generate_planned_answer(query, *_plan_answer(query, cache_key[1] if cache_key else None, collection))
+    if "answer" in result:
+        _remember_answer(query, cache_key, result["answer"])
+    return result
+
+
+def _generate_planned_answer(query: str, context_chunks: list[str], is_comparison: bool, can_rag: bool) -> dict:
     if not can_rag:
         logger.info("get_final_answer: 知识块无用，直接让AI自由发挥并加标注。")
         llm_result = generate_answer_from_llm(query, [], is_comparison=is_comparison, allow_free_gen=True)
         if "error" in llm_result:
             return {"error": llm_result["error"]}
         answer = llm_result.get("answer", "")
-        if not answer.strip().startswith("【以下为AI自动生成，仅供参考】"):
-            answer = "【以下为AI自动生成，仅供参考】" + answer
+        if not answer.strip().startswith(FREE_GENERATION_TAG):
+            answer = FREE_GENERATION_TAG + answer
         return {"answer": answer}
 
     # 有可用知识块则优先使用
     llm_result = generate_answer_from_llm(query, context_chunks, is_comparison=is_comparison)
     if "error" in llm_result:
         return {"error": llm_result["error"]}
-    return {"answer": llm_result.get("answer", "【以下为AI自动生成，仅供参考】AI 未能生成有效的回答。")}
+    return {"answer": llm_result.get("answer", f"{FREE_GENERATION_TAG}AI 未能生成有效的回答。")}
+
+
+def _batch_retrieve(texts: list[str], ks: list[int], threshold: float = 0.65,
+                    collection: str = DEFAULT_COLLECTION) -> list[list[str]]:
+    """
+    批量检索：一次请求嵌入全部文本，再以矩阵形式一次完成 FAISS 检索（按最大 k 检索后各自截断）。
+    过滤规则与 retrieve_context 相同；索引未加载或出错时各项均返回空列表。
+    """
+    db = get_vector_db(collection)
+    if db is None or not texts:
+        if db is None:
+            logger.warning(f"_batch_retrieve: 知识库索引未加载（{len(texts)} 条检索）。")
+        return [[] for _ in texts]
+    try:
+        with stage_timer("batch_embedding"):
+            vectors = db._embed_documents(texts)
+        with stage_timer("faiss_batch_search"):
+            scores, indices = _faiss_search(db, vectors, max(ks))
+    except Exception as e:
+        logger.error(f"_batch_retrieve: 批量检索出错 ({len(texts)} 条): {e}", exc_info=True)
+        return [[] for _ in texts]
+
+    return [
+        [render_chunk(doc) for doc, _ in _to_documents(db, row_scores[:k], row_indices[:k], threshold)]
+        for row_scores, row_indices, k in zip(scores, indices, ks)
+    ]
+
+
+def answer_batch(queries: list[str], concurrency: int = BATCH_LLM_CONCURRENCY,
+                 collection: str = DEFAULT_COLLECTION) -> Iterator[tuple[int, dict]]:
+    """
+    批量问答：所有检索文本一次性嵌入并批量检索，随后以至多 concurrency 个并发调用 LLM，
+    按完成顺序产出 (问题下标, 结果)。规范化后相同的问题只回答一次。
+    """
+    positions: dict = {}
+    for i, query in enumerate(queries):
+        positions.setdefault(normalize_query(query), []).append(i)
+    unique_queries = [queries[idx[0]] for idx in positions.values()]
+    logger.info(f"answer_batch: {len(queries)} 个问题（去重后 {len(unique_queries)} 个），LLM 并发 {concurrency}")
+
+    plans = [_retrieval_requests(query, collection) for query in unique_queries]
+    flat = [(n, text, k) for n, (requests_to_run, _) in enumerate(plans) for text, k in requests_to_run]
+    retrieved = _batch_retrieve([text for _, text, _ in flat], [k for _, _, k in flat], collection=collection)
+    per_query: list[list[list[str]]] = [[] for _ in unique_queries]
+    for (n, _, _), chunks in zip(flat, retrieved):
+        per_query[n].append(chunks)
+
+    def _answer(n: int) -> dict:
+        query = unique_queries[n]
+        is_comparison = plans[n][1]
+        context_chunks, can_rag = _merge_context(query, per_query[n], is_comparison)
+        return _generate_planned_answer(query, context_chunks, is_comparison, can_rag)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="qa-batch")
+    futures = {executor.submit(_answer, n): n for n in range(len(unique_queries))}
+    try:
+        for future in as_completed(futures):
+            n = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"answer_batch: 问题 '{unique_queries[n]}' 处理失败: {e}", exc_info=True)
+                result = {"error": f"处理请求时发生未知错误: {e}"}
+            for i in positions[normalize_query(unique_queries[n])]:
+                yield i, dict(result)
+    finally:
+        # 调用方提前停止迭代（如客户端断开）时，取消尚未开始的 LLM 调用；
+        # 不等待已在进行的调用（其结果直接丢弃），关闭生成器的线程不会被阻塞
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_final_answer(query: str, collection: str = DEFAULT_COLLECTION, use_cache: bool = True) -> Iterator[str]:
+    """
+    流式问答入口：检索与提示词构造同 get_final_answer，随后逐段产出 LLM 输出（不参与请求合并）；
+    命中语义缓存时一次性产出缓存答案（use_cache=False 时不使用缓存）。
+    失败时抛出 LLMError；调用方关闭生成器即中止上游生成。
+    """
+    if not LLM_API_KEY:
+        logger.error("stream_final_answer: DEEPSEEK_API_KEY / LLM_API_KEY 未配置。")
+        raise LLMError("AI 服务配置不完整 (API Key缺失)。")
+    logger.info(f"stream_final_answer: 开始处理查询: '{query}'")
+    cached, cache_key = _cached_answer(query, collection) if use_cache else (None, None)
+    if cached is not None:
+        yield cached
+        return
+    context_chunks, is_comparison, can_rag = _plan_answer(query, cache_key[1] if cache_key else None, collection)
+    answer_parts = []
+    if can_rag:
+        prompt_template = build_answer_prompt(query, context_chunks, is_comparison=is_comparison)
+    else:
+        logger.info("stream_final_answer: 知识块无用，直接让AI自由发挥并加标注。")
+        prompt_template = build_answer_prompt(query, [], is_comparison=is_comparison, allow_free_gen=True)
+        answer_parts.append(FREE_GENERATION_TAG)
+        yield FREE_GENERATION_TAG
+
+    llm = get_llm_backend()
+    started = time.perf_counter()
+    # 自由生成时模型通常会自行输出标注，先缓冲开头几个字符以去掉重复的标注
+    head, head_done, first_token = "", can_rag, True
+    try:
+        for delta in llm.stream([{"role": "user", "content": prompt_template}], max_tokens=1500, temperature=0.3):
+            if first_token:
+                STAGE_DURATION.observe(time.perf_counter() - started, stage="llm_first_token")
+                first_token = False
+            if not head_done:
+                head += delta
+                if len(head.lstrip()) < len(FREE_GENERATION_TAG) and FREE_GENERATION_TAG.startswith(head.lstrip()):
+                    continue
+                delta = head.lstrip()
+                if delta.startswith(FREE_GENERATION_TAG):
+                    delta = delta[len(FREE_GENERATION_TAG):]
+                head_done = True
+                if not delta:
+                    continue
+            answer_parts.append(delta)
+            yield delta
+        if not head_done and head.strip():
+            answer_parts.append(head)
+            yield head
+        # 只缓存完整生成的答案（客户端中途断开时生成器在 yield 处退出，不会执行到这里）
+        _remember_answer(query, cache_key, "".join(answer_parts))
+    except LLMError:
+        LLM_ERRORS.inc()
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, stage="llm_stream")
@@ -1 +1,21 @@
-# Pydantic 模型 (可选，用于数据校验)
\ No newline at end of file
+# Pydantic 模型 (可选，用于数据校验)
+
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class BatchAskRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1, le=32)  # 缺省及上限均为 BATCH_LLM_CONCURRENCY（服务端限制）
+    collection: str = "default"                            # 知识库集合名
+
+
+class RetrieveRequest(BaseModel):
+    query: str
+    k: int = Field(5, ge=1, le=50)
+    threshold: float = 0.65
+    # 以下过滤条件在 FAISS 检索内部生效；同一条件内多个取值为“或”，不同条件之间为“且”
+    source_files: Optional[List[str]] = None
+    pages: Optional[List[int]] = None       # 从 1 开始
+    products: Optional[List[str]] = None
+    collection: str = "default"
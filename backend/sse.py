@@ -0,0 +1,94 @@
+# backend/sse.py
+# Server-Sent Events：事件格式化，以及在准入控制下返回流式响应
+
+import json
+import threading
+import logging
+from contextlib import ExitStack
+from typing import Callable, Iterator
+
+import anyio
+from fastapi.responses import StreamingResponse
+
+from .admission import admit_or_429
+
+logger = logging.getLogger("gadgetguide_ai.sse")
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 关闭 Nginx 等反向代理的响应缓冲
+}
+
+_DONE = object()
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class _AdmittedEventStream(StreamingResponse):
+    """
+    同步事件生成器的流式响应。Starlette 在客户端断开后只是停止迭代同步生成器、并不关闭它，
+    准入名额、上游 LLM 流与数据库会话要等到垃圾回收才释放；这里改为：
+    - 与推送并行监听 http.disconnect，断开后立即停止推送并归还准入名额；
+    - 随后在线程池中关闭生成器（生成器内的 GeneratorExit / finally 处理保存部分回复、关闭上游连接等）。
+    生成器正阻塞在某次 next()（如等待 LLM 的下一段输出）时，关闭在该次 next() 返回后进行。
+    """
+
+    def __init__(self, events: Iterator[str], on_close: Callable[[], None]):
+        self._events = events
+        self._on_close = on_close
+        self._lock = threading.Lock()  # next() 与 close() 不能在两个线程中同时执行
+        super().__init__(self._iterate(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    def _next(self):
+        with self._lock:
+            return next(self._events, _DONE)
+
+    def _close_events(self):
+        with self._lock:
+            self._events.close()
+
+    async def _iterate(self):
+        # SSE 注释行：让响应头与首个字节立即发出
+        yield ": connected\n\n"
+        while True:
+            # 断开时不等待正在执行的 next()，以便立即归还准入名额
+            chunk = await anyio.to_thread.run_sync(self._next, abandon_on_cancel=True)
+            if chunk is _DONE:
+                break
+            yield chunk
+
+    async def __call__(self, scope, receive, send):
+        try:
+            async with anyio.create_task_group() as task_group:
+                async def stream():
+                    await self.stream_response(send)
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(stream)
+                await self.listen_for_disconnect(receive)
+                task_group.cancel_scope.cancel()
+        except OSError:
+            logger.info("SSE 客户端已断开。")
+        finally:
+            self._on_close()
+            with anyio.CancelScope(shield=True):
+                try:
+                    await anyio.to_thread.run_sync(self._close_events)
+                except Exception as e:
+                    logger.error(f"关闭 SSE 事件生成器出错: {e}", exc_info=True)
+
+
+def admitted_sse_response(user_key: str, make_events: Callable[[], Iterator[str]]) -> StreamingResponse:
+    """
+    先同步申请准入名额（被拒绝时在此处抛出 429，响应尚未开始），
+    名额一直持有到事件流结束或客户端断开为止（断开时立即归还，并关闭事件生成器）。
+    """
+    admission = ExitStack()
+    admission.enter_context(admit_or_429(user_key))
+    try:
+        return _AdmittedEventStream(make_events(), on_close=admission.close)
+    except BaseException:
+        admission.close()
+        raise
@@ -0,0 +1,226 @@
+# backend/upload_watcher.py
+# 上传目录监视（UPLOAD_WATCH_ENABLED=1 时随应用启动）：后台线程定期扫描各集合的上传目录，
+# 把同步工具直接放入 / 修改 / 删除的文件增量应用到索引，无需调用 /admin/refresh-index。
+# 目录在 UPLOAD_WATCH_DEBOUNCE_SECONDS 秒内不再变化后才应用这一批变化，避免文件写到一半就入库。
+# 轮询（而非 inotify）同样适用于网络盘 / 挂载卷上的同步目录。
+
+import os
+import json
+import time
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .knowledge_base_processor import (
+    WATCHED_FILES_NAME, create_index_from_files, load_processed_files, tombstone_source_file,
+)
+from .qa_handler import get_vector_db, reload_vector_db
+from .index_compaction import maybe_compact_in_background
+from . import etags
+from .kb_collections import collection_upload_folder, collection_index_path, list_collections, index_write_lock
+from .config import UPLOAD_WATCH_INTERVAL_SECONDS, UPLOAD_WATCH_DEBOUNCE_SECONDS, UPLOAD_WATCH_RETRY_SECONDS
+
+logger = logging.getLogger("gadgetguide_ai.upload_watcher")
+
+_SUPPORTED_SUFFIXES = (".txt", ".pdf")
+
+
+@dataclass
+class FolderDelta:
+    added: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+def scan_upload_folder(collection: str) -> dict[str, list]:
+    """集合上传目录中可索引文件的 {文件名: [大小, 修改时间(ns)]}。"""
+    files = {}
+    try:
+        entries = list(os.scandir(collection_upload_folder(collection)))
+    except FileNotFoundError:
+        return files
+    for entry in entries:
+        if entry.name.lower().endswith(_SUPPORTED_SUFFIXES):
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+            except FileNotFoundError:
+                continue  # 扫描期间被删除
+    return files
+
+
+def _load_snapshot(collection: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(collection_index_path(collection), WATCHED_FILES_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"读取集合 '{collection}' 的监视记录失败: {e}")
+        return None
+
+
+def _save_snapshot(collection: str, snapshot: dict):
+    with index_write_lock(collection):
+        with open(os.path.join(collection_index_path(collection), WATCHED_FILES_NAME), "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+
+
+def diff_upload_folder(current: dict, snapshot: dict, processed: set) -> FolderDelta:
+    """
+    对比目录现状与上次处理时的记录：
+    - 未入库且与上次记录不同的文件为新增（入库失败的文件不写入记录，之后的扫描会重试）；
+    - 已入库且大小 / 修改时间与记录不同的文件为修改；没有记录的已入库文件（经 API 上传）只记录基线；
+    - 已入库但目录中已不存在的文件为删除。
+    """
+    delta = FolderDelta()
+    for name, stat in sorted(current.items()):
+        if name not in processed:
+            if snapshot.get(name) != stat:
+                delta.added.append(name)
+        elif name in snapshot and snapshot[name] != stat:
+            delta.changed.append(name)
+    delta.removed = sorted(name for name in processed if name not in current)
+    return delta
+
+
+def apply_folder_delta(collection: str, delta: FolderDelta) -> dict:
+    """修改 / 删除的文件先把旧片段记为墓碑，新增 / 修改的文件再增量入库，最后重新加载一次索引。"""
+    tombstoned = 0
+    if delta.changed or delta.removed:
+        vector_db = get_vector_db(collection)
+        for name in delta.changed + delta.removed:
+            tombstoned += tombstone_source_file(vector_db, name, collection)
+    to_index = delta.added + delta.changed
+    indexed = bool(to_index) and create_index_from_files(to_index, collection)
+    # 修改的文件已撤下旧片段并移出已处理列表，入库失败时须留待重试，否则在再次修改前一直缺失
+    processed = load_processed_files(collection) if to_index else set()
+    failed = [name for name in to_index if name not in processed]
+    if indexed or tombstoned:
+        reload_vector_db(collection)
+    compacting = bool(tombstoned) and maybe_compact_in_background(collection)
+    return {
+        "collection": collection,
+        "added": delta.added,
+        "changed": delta.changed,
+        "removed": delta.removed,
+        "indexed": indexed,
+        "failed": failed,
+        "tombstoned_chunks": tombstoned,
+        "compaction_started": compacting,
+        "applied_at": int(time.time()),
+    }
+
+
+class UploadFolderWatcher:
+    """
+    按固定间隔扫描所有集合的上传目录；每个集合的一批变化在目录静默 debounce 秒后应用。
+    入库失败的文件（如嵌入服务暂时不可用）不推进记录，目录不再变化时每 retry 秒重试一次。
+    """
+
+    def __init__(self, interval: float = UPLOAD_WATCH_INTERVAL_SECONDS,
+                 debounce: float = UPLOAD_WATCH_DEBOUNCE_SECONDS, retry: float = UPLOAD_WATCH_RETRY_SECONDS):
+        self.interval = interval
+        self.debounce = debounce
+        self.retry = retry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_scan: dict[str, dict] = {}
+        self._last_change: dict[str, float] = {}
+        self._settled: dict[str, dict] = {}  # 已确认与记录一致的目录状态，避免静默期间重复对比
+        self._retry_at: dict[str, tuple[dict, float]] = {}  # 有文件入库失败时的目录状态与下次重试时间
+        self.last_results: dict[str, dict] = {}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="upload-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"上传目录监视已启动（扫描间隔 {self.interval}s，静默 {self.debounce}s 后应用变化）。")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            for collection in list_collections():
+                try:
+                    self.poll(collection)
+                except Exception as e:
+                    logger.error(f"扫描集合 '{collection}' 的上传目录失败: {e}", exc_info=True)
+            self._stop.wait(self.interval)
+
+    def poll(self, collection: str, now: Optional[float] = None) -> Optional[dict]:
+        """扫描一次集合上传目录；目录已静默且有未处理的变化时应用并返回结果。"""
+        now = time.monotonic() if now is None else now
+        current = scan_upload_folder(collection)
+        if current != self._last_scan.get(collection):
+            self._last_scan[collection] = current
+            self._last_change[collection] = now
+        if current == self._settled.get(collection) or now - self._last_change[collection] < self.debounce:
+            return None
+        failed_state, retry_at = self._retry_at.get(collection, (None, 0.0))
+        if current == failed_state and now < retry_at:
+            return None
+
+        snapshot = _load_snapshot(collection)
+        delta = diff_upload_folder(current, snapshot or {}, load_processed_files(collection))
+        result = None
+        failed = []
+        if delta:
+            etags.uploads_changed(collection)
+            logger.info(f"集合 '{collection}' 上传目录有变化：新增 {delta.added}，修改 {delta.changed}，删除 {delta.removed}")
+            result = apply_folder_delta(collection, delta)
+            self.last_results[collection] = result
+            failed = result["failed"]
+        # 只为入库成功（或无需入库）的文件推进记录，失败的文件在之后的扫描中仍被视为新增
+        recorded = {name: stat for name, stat in current.items() if name not in failed}
+        if snapshot != recorded:
+            _save_snapshot(collection, recorded)
+        if failed:
+            logger.warning(f"集合 '{collection}' 中 {failed} 入库失败，{self.retry:g}s 后重试。")
+            self._retry_at[collection] = (current, now + self.retry)
+        else:
+            self._retry_at.pop(collection, None)
+            self._settled[collection] = current
+        return result
+
+    def status(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_seconds": self.interval,
+            "debounce_seconds": self.debounce,
+            "last_results": dict(self.last_results),
+        }
+
+
+_watcher: Optional[UploadFolderWatcher] = None
+
+
+def start_upload_watcher() -> UploadFolderWatcher:
+    global _watcher
+    if _watcher is None:
+        _watcher = UploadFolderWatcher()
+        _watcher.start()
+    return _watcher
+
+
+def stop_upload_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
+
+
+def upload_watcher_status() -> dict:
+    if _watcher is None:
+        return {"running": False, "last_results": {}}
+    return _watcher.status()